@@ -1,7 +1,16 @@
 #!/usr/bin/python3
 """__init__ magic method for models directory"""
-from models.engine.file_storage import FileStorage
+from os import getenv
 
 
-storage = FileStorage()
+if getenv("HBNB_TYPE_STORAGE") == "db":
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage()
+elif getenv("HBNB_TYPE_STORAGE") == "mmap":
+    from models.engine.mmap_storage import MmapStorage
+    storage = MmapStorage()
+else:
+    from models.engine.file_storage import FileStorage
+    storage = FileStorage()
+    storage.lazy = getenv("HBNB_LAZY_RELOAD") == "1"
 storage.reload()
@@ -4,10 +4,18 @@ import models
 from uuid import uuid4
 from datetime import datetime
 
+# The model classes by name, filled in as BaseModel subclasses are defined.
+classes = {}
+
 
 class BaseModel:
     """Represents the BaseModel of the HBnB project."""
 
+    def __init_subclass__(cls, **kwargs):
+        """Register a new model class in classes under its name."""
+        super().__init_subclass__(**kwargs)
+        classes[cls.__name__] = cls
+
     def __init__(self, *args, **kwargs):
         """Initialize a new BaseModel.
 
@@ -28,6 +36,11 @@ class BaseModel:
         else:
             models.storage.new(self)
 
+    def __setattr__(self, name, value):
+        """Set an attribute and flag the instance as changed in storage."""
+        super().__setattr__(name, value)
+        models.storage.touch(self)
+
     def save(self):
         """Update updated_at with the current datetime."""
         self.updated_at = datetime.today()
@@ -49,3 +62,51 @@ class BaseModel:
         """Return the print/str representation of the BaseModel instance."""
         clname = self.__class__.__name__
         return "[{}] ({}) {}".format(clname, self.id, self.__dict__)
+
+
+classes["BaseModel"] = BaseModel
+
+
+def foreign_key(cls, parent):
+    """Return the attribute of cls holding the id of a parent instance.
+
+    Args:
+        cls (type): The class of the children.
+        parent (str): The class name of the parent.
+
+    Raises:
+        ValueError: If cls has no foreign key to parent.
+    """
+    for attr, target in getattr(cls, "__foreign_keys__", {}).items():
+        if target == parent:
+            return attr
+    raise ValueError("{} has no foreign key to {}"
+                     .format(cls.__name__, parent))
+
+
+def dependents(storage, obj):
+    """Return the stored instances to delete along with obj.
+
+    The class names listed in the __cascade__ of a model are those whose
+    instances referring to it are deleted with it, and so on down.
+
+    Args:
+        storage (object): The storage engine holding obj.
+        obj (BaseModel): The instance to delete.
+
+    Returns:
+        The list of dependent instances, each of them once.
+    """
+    root = "{}.{}".format(type(obj).__name__, obj.id)
+    found = {root: obj}
+    stack = [obj]
+    while stack:
+        parent = stack.pop()
+        for cls in getattr(type(parent), "__cascade__", ()):
+            for child in storage.children(parent, cls):
+                key = "{}.{}".format(cls, child.id)
+                if key not in found:
+                    found[key] = child
+                    stack.append(child)
+    del found[root]
+    return list(found.values())
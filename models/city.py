@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """Defines the City class."""
+import models
 from models.base_model import BaseModel
 
 
@@ -9,7 +10,19 @@ class City(BaseModel):
     Attributes:
         state_id (str): The state id.
         name (str): The name of the city.
+        __foreign_keys__ (dict): The class name referred to by each
+            foreign key attribute, indexed by the storage.
+        __cascade__ (tuple): The classes whose instances referring to the
+            city are deleted with it.
     """
 
     state_id = ""
     name = ""
+
+    __foreign_keys__ = {"state_id": "State"}
+    __cascade__ = ("Place",)
+
+    @property
+    def places(self):
+        """list: The stored places of the city."""
+        return models.storage.children(self, "Place")
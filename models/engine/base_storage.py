@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+"""Defines the BaseStorage class, the mixin shared by storage engines."""
+import asyncio
+import contextlib
+import functools
+import threading
+from models.base_model import dependents
+
+
+class BaseStorage:
+    """Represent the behavior shared by the storage engines.
+
+    An engine provides delete(), children(), flush() and reload(), and
+    gets save(), batch() and destroy() built on them, along with asave()
+    and areload(), their asyncio counterparts. An engine whose lock is not
+    a threading.RLock replaces _lock after calling __init__() and
+    overrides _locked().
+
+    Attributes:
+        _lock (threading.RLock): The lock guarding the state of the engine.
+        _batch_depth (int): The number of batch() blocks entered.
+    """
+
+    def __init__(self):
+        """Initialize the lock and the batch depth of the engine."""
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+
+    def _locked(self):
+        """Return a context manager holding _lock for writing."""
+        return self._lock
+
+    def destroy(self, obj):
+        """Delete obj and its dependent instances, then save once.
+
+        The dependent instances are found by following the __cascade__ of
+        the models, such as the cities of a state and their places.
+        """
+        with self.batch(), self._locked():
+            for child in dependents(self, obj):
+                self.delete(child)
+            self.delete(obj)
+
+    def save(self):
+        """Write the changes made since the last save.
+
+        Inside a batch() block the write is deferred to the end of it.
+        """
+        if self._batch_depth > 0:
+            return
+        self.flush()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Defer every save() made in the block to one save on exit.
+
+        Blocks can be nested; only the outermost one saves.
+        """
+        with self._locked():
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._locked():
+                self._batch_depth -= 1
+                outermost = self._batch_depth == 0
+            if outermost:
+                self.save()
+
+    async def asave(self):
+        """Run save() in the default executor of the running event loop."""
+        await asyncio.get_running_loop().run_in_executor(None, self.save)
+
+    async def areload(self, *, classes=None):
+        """Run reload() in the default executor of the running event loop.
+
+        Args:
+            classes (iterable): The classes or class names to reload.
+                All of them are reloaded if None.
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.reload, classes=classes))
@@ -0,0 +1,372 @@
+#!/usr/bin/python3
+"""Defines the serialization codecs used by FileStorage.
+
+A codec turns the dictionary of an object into a fragment of bytes and
+lays fragments out in snapshot files and journal records. Fragments are
+cached by the storage, so a codec never has to encode an unchanged object
+twice.
+
+Snapshot files can also be compressed with gzip, bz2 or lzma; they are
+then written and read through the streaming file objects of those modules.
+"""
+import bz2
+import codecs as textcodecs
+import functools
+import gzip
+import json
+import lzma
+import marshal
+import os
+import pickle
+import struct
+
+CHUNK_SIZE = 1 << 16
+
+
+class JSONCodec:
+    """Represent the JSON codec, the default human readable format.
+
+    A snapshot is a single JSON object mapping each key to its dictionary
+    and a journal holds one JSON record per line.
+
+    Attributes:
+        name (str): The name of the codec.
+        extension (str): The file extension of the codec.
+    """
+
+    name = "json"
+    extension = ".json"
+
+    def encode(self, o):
+        """Return the fragment of the dictionary o."""
+        return json.dumps(o).encode()
+
+    def write_snapshot(self, f, entries):
+        """Write the (key, fragment) pairs of entries to the file f.
+
+        The snapshot is written in chunks of about CHUNK_SIZE bytes.
+        """
+        chunk = [b"{"]
+        size = 1
+        sep = b""
+        for key, frag in entries:
+            piece = sep + json.dumps(key).encode() + b": " + frag
+            chunk.append(piece)
+            size += len(piece)
+            sep = b", "
+            if size >= CHUNK_SIZE:
+                f.write(b"".join(chunk))
+                chunk = []
+                size = 0
+        chunk.append(b"}")
+        f.write(b"".join(chunk))
+
+    def read_snapshot(self, f):
+        """Yield the (key, dictionary) pairs of the snapshot file f.
+
+        The file is read in chunks and each pair is decoded as soon as it
+        is complete, so the whole document is never held in memory.
+
+        Raises:
+            ValueError: If the file is not a JSON object.
+        """
+        stream = JSONStream(f)
+        stream.take("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.take(":")
+            yield key, stream.value()
+            if stream.peek() == "}":
+                return
+            stream.take(",")
+
+    def record(self, op, key, frag=None):
+        """Return the journal record of an operation.
+
+        Args:
+            op (str): The operation, "put" or "delete".
+            key (str): The key of the object.
+            frag (bytes): The fragment of the object put.
+        """
+        if frag is None:
+            return '{{"op": "{}", "key": {}}}\n'.format(
+                op, json.dumps(key)).encode()
+        return '{{"op": "{}", "key": {}, "value": '.format(
+            op, json.dumps(key)).encode() + frag + b"}\n"
+
+    def read_records(self, f):
+        """Yield the (op, key, dictionary) records of the journal file f.
+
+        Reading stops at the first record torn by an interrupted write,
+        leaving f positioned at its start.
+        """
+        while True:
+            line = f.readline()
+            if len(line) == 0:
+                return
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("torn record")
+                record = json.loads(line)
+            except ValueError:
+                f.seek(-len(line), 1)
+                return
+            yield record["op"], record["key"], record.get("value")
+
+
+class JSONStream:
+    """Represent a JSON text read from a binary file chunk by chunk.
+
+    Attributes:
+        buf (str): The decoded text not consumed yet, from index pos.
+        pos (int): The index of the next character to read in buf.
+        eof (bool): Whether the end of the file was reached.
+    """
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, f):
+        """Initialize a new JSONStream.
+
+        Args:
+            f (file): The binary file to read.
+        """
+        self.f = f
+        self.text = textcodecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self, size=None):
+        """Read up to size more bytes, dropping the consumed text."""
+        chunk = self.f.read(size or CHUNK_SIZE)
+        self.eof = len(chunk) == 0
+        self.buf = self.buf[self.pos:] + self.text.decode(chunk, self.eof)
+        self.pos = 0
+
+    def peek(self):
+        """Return the next non-blank character, or "" at the end."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ""
+            self.more()
+
+    def take(self, char):
+        """Consume the next non-blank character, which must be char.
+
+        Raises:
+            JSONDecodeError: If the next character is not char.
+        """
+        if self.peek() != char:
+            raise json.JSONDecodeError("Expecting '{}'".format(char),
+                                       self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decode and consume the next JSON value.
+
+        Raises:
+            JSONDecodeError: If the text is not a valid JSON value.
+        """
+        self.peek()
+        size = CHUNK_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+            else:
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            self.more(size)
+            size *= 2
+
+
+class BinaryCodec:
+    """Represent the base of the length-prefixed binary codecs.
+
+    Snapshots and journals share one layout: a sequence of frames made of
+    a header packing the operation, the key length and the fragment length,
+    followed by the key and the fragment. Subclasses set dumps and loads,
+    the functions turning a dictionary into bytes and back.
+    """
+
+    header = struct.Struct("<cHI")
+    ops = {"put": b"p", "delete": b"d"}
+
+    def encode(self, o):
+        """Return the fragment of the dictionary o."""
+        return self.dumps(o)
+
+    def record(self, op, key, frag=None):
+        """Return the frame of an operation.
+
+        Args:
+            op (str): The operation, "put" or "delete".
+            key (str): The key of the object.
+            frag (bytes): The fragment of the object put.
+        """
+        key = key.encode()
+        frag = frag or b""
+        return self.header.pack(self.ops[op], len(key), len(frag)) + \
+            key + frag
+
+    def write_snapshot(self, f, entries):
+        """Write the (key, fragment) pairs of entries to the file f.
+
+        The snapshot is written in chunks of about CHUNK_SIZE bytes.
+        """
+        chunk = []
+        size = 0
+        for key, frag in entries:
+            frame = self.record("put", key, frag)
+            chunk.append(frame)
+            size += len(frame)
+            if size >= CHUNK_SIZE:
+                f.write(b"".join(chunk))
+                chunk = []
+                size = 0
+        f.write(b"".join(chunk))
+
+    def read_records(self, f):
+        """Yield the (op, key, dictionary) frames of the file f.
+
+        Reading stops at the first frame torn by an interrupted write,
+        leaving f positioned at its start.
+        """
+        names = {v: k for k, v in self.ops.items()}
+        while True:
+            head = f.read(self.header.size)
+            if len(head) < self.header.size:
+                f.seek(-len(head), 1)
+                return
+            op, klen, flen = self.header.unpack(head)
+            body = f.read(klen + flen)
+            if len(body) < klen + flen or op not in names:
+                f.seek(-len(head) - len(body), 1)
+                return
+            value = self.loads(body[klen:]) if flen > 0 else None
+            yield names[op], body[:klen].decode(), value
+
+    def read_snapshot(self, f):
+        """Yield the (key, dictionary) pairs of the snapshot file f."""
+        for op, key, value in self.read_records(f):
+            yield key, value
+
+
+class MarshalCodec(BinaryCodec):
+    """Represent the compact binary codec built on marshal.
+
+    It is the fastest codec but its format is tied to the Python version.
+    """
+
+    name = "marshal"
+    extension = ".marshal"
+    dumps = staticmethod(marshal.dumps)
+    loads = staticmethod(marshal.loads)
+
+
+class PickleCodec(BinaryCodec):
+    """Represent the binary codec built on pickle.
+
+    Only load pickle files from a trusted source.
+    """
+
+    name = "pickle"
+    extension = ".pickle"
+    dumps = staticmethod(functools.partial(pickle.dumps,
+                                           protocol=pickle.HIGHEST_PROTOCOL))
+    loads = staticmethod(pickle.loads)
+
+
+codecs = {c.name: c for c in (JSONCodec(), MarshalCodec(), PickleCodec())}
+extensions = {
+    ".json": "json",
+    ".marshal": "marshal",
+    ".bin": "marshal",
+    ".pickle": "pickle",
+    ".pkl": "pickle"
+}
+compressions = {
+    "gzip": ".gz",
+    "bz2": ".bz2",
+    "lzma": ".xz"
+}
+compression_extensions = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "lzma",
+    ".lzma": "lzma"
+}
+
+
+def get_codec(name=None, path=""):
+    """Return a codec by name, or from the extension of path.
+
+    A compression extension at the end of path is skipped, so that
+    file.json.gz is read with the JSON codec.
+
+    Args:
+        name (str): The name of the codec, if set explicitly.
+        path (str): The file path to guess the codec from.
+
+    Raises:
+        ValueError: If name is not a known codec.
+    """
+    if name is None:
+        root, ext = os.path.splitext(path)
+        if ext in compression_extensions:
+            ext = os.path.splitext(root)[1]
+        name = extensions.get(ext, "json")
+    if name not in codecs:
+        raise ValueError("unknown codec {}".format(name))
+    return codecs[name]
+
+
+def get_compression(name=None, path=""):
+    """Return a compression by name, or from the extension of path.
+
+    Args:
+        name (str): The name of the compression, if set explicitly.
+        path (str): The file path to guess the compression from.
+
+    Returns:
+        The name of the compression, or None for plain files.
+
+    Raises:
+        ValueError: If name is not a known compression.
+    """
+    if name is None:
+        return compression_extensions.get(os.path.splitext(path)[1])
+    if name not in compressions:
+        raise ValueError("unknown compression {}".format(name))
+    return name
+
+
+def open_file(path, mode, compression=None, level=None):
+    """Open a binary file, streaming it through a compression if any.
+
+    Args:
+        path (str): The path of the file.
+        mode (str): The binary mode to open the file in.
+        compression (str): The name of the compression, or None.
+        level (int): The compression level, None for the default one.
+    """
+    if compression is None:
+        return open(path, mode)
+    if "r" in mode or level is None:
+        kwargs = {}
+    elif compression == "lzma":
+        kwargs = {"preset": level}
+    else:
+        kwargs = {"compresslevel": level}
+    opener = {"gzip": gzip.open, "bz2": bz2.open, "lzma": lzma.open}
+    return opener[compression](path, mode, **kwargs)
@@ -0,0 +1,261 @@
+#!/usr/bin/python3
+"""Defines the DBStorage class."""
+import json
+import sqlite3
+from os import getenv
+from models.base_model import BaseModel
+from models.base_model import classes
+from models.base_model import foreign_key
+from models.user import User
+from models.state import State
+from models.city import City
+from models.place import Place
+from models.amenity import Amenity
+from models.review import Review
+from models.engine.base_storage import BaseStorage
+
+
+class DBStorage(BaseStorage):
+    """Represent a storage engine backed by an SQLite database.
+
+    Each object is a row of the objects table, keyed by <class name>.<id>,
+    so save() only writes the rows of the objects created, changed or
+    deleted since the last save, and get() and count() are answered by
+    indexed queries without loading the other objects. The foreign keys
+    declared in the __foreign_keys__ of the models are indexed as well,
+    for children().
+
+    Rows are turned into instances on first access and kept in an identity
+    map, so the same object is returned until the next reload().
+
+    Attributes:
+        __db_path (str): The path of the SQLite database file.
+        __conn (sqlite3.Connection): The connection to the database.
+        __objects (dict): The instances built from the database.
+    """
+
+    def __init__(self):
+        """Initialize a new DBStorage.
+
+        The database path is read from HBNB_DB_PATH (default: file.db).
+        """
+        super().__init__()
+        self.__db_path = getenv("HBNB_DB_PATH", "file.db")
+        self.__conn = sqlite3.connect(self.__db_path,
+                                      check_same_thread=False)
+        self.__conn.execute("CREATE TABLE IF NOT EXISTS objects ("
+                            "key TEXT PRIMARY KEY, "
+                            "cls TEXT NOT NULL, "
+                            "data TEXT NOT NULL)")
+        self.__conn.execute("CREATE INDEX IF NOT EXISTS objects_cls "
+                            "ON objects (cls)")
+        keys = {attr for model in classes.values()
+                for attr in getattr(model, "__foreign_keys__", {})}
+        for attr in sorted(keys):
+            self.__conn.execute("CREATE INDEX IF NOT EXISTS objects_{0} "
+                                "ON objects (cls, json_extract(data, "
+                                "'$.{0}'))".format(attr))
+        self.__conn.commit()
+        self.__objects = {}
+        self.__dirty = set()
+        self.__deleted = set()
+
+    def __build(self, key, data):
+        """Build the instance of the row data and keep it under key."""
+        o = json.loads(data)
+        cls_name = o.pop("__class__")
+        obj = classes[cls_name](**o)
+        self.__objects[key] = obj
+        return obj
+
+    def __exists(self, key):
+        """Return True if key has a row in the database."""
+        cur = self.__conn.execute("SELECT 1 FROM objects WHERE key = ?",
+                                  (key,))
+        return cur.fetchone() is not None
+
+    def all(self, cls=None):
+        """Return the dictionary of every stored instance, or those of cls.
+
+        Args:
+            cls (type or str): The class, or class name, of the instances
+                to return. All of them are returned if None.
+        """
+        if cls is not None and type(cls) is not str:
+            cls = cls.__name__
+        with self._lock:
+            if cls is None:
+                cur = self.__conn.execute("SELECT key, data FROM objects")
+            else:
+                cur = self.__conn.execute(
+                    "SELECT key, data FROM objects WHERE cls = ?", (cls,))
+            objs = {}
+            for key, data in cur:
+                if key in self.__objects:
+                    objs[key] = self.__objects[key]
+                elif key not in self.__deleted:
+                    objs[key] = self.__build(key, data)
+            if cls is None:
+                return self.__objects
+            for key in self.__dirty:
+                if key.startswith(cls + "."):
+                    objs[key] = self.__objects[key]
+            return objs
+
+    def objects(self, cls=None):
+        """Return a copy of all(cls), safe to iterate from any thread.
+
+        Unlike all(), which returns the live dictionary when cls is None,
+        the copy is not changed by the objects created or deleted
+        meanwhile by other threads.
+
+        Args:
+            cls (type or str): The class, or class name, of the objects to
+                return. All of them are returned if None.
+        """
+        with self._lock:
+            return dict(self.all(cls))
+
+    def get(self, cls, id):
+        """Return the stored instance of cls with the given id.
+
+        Args:
+            cls (type or str): The class, or class name, of the instance.
+            id (str): The id of the instance.
+
+        Returns:
+            The instance, or None if it is not stored.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        key = "{}.{}".format(cls, id)
+        with self._lock:
+            if key in self.__objects:
+                return self.__objects[key]
+            if key in self.__deleted:
+                return None
+            row = self.__conn.execute(
+                "SELECT data FROM objects WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            return self.__build(key, row[0])
+
+    def count(self, cls=None):
+        """Return the number of stored instances of cls (None for all).
+
+        Args:
+            cls (type or str): The class, or class name, to count.
+        """
+        if cls is not None and type(cls) is not str:
+            cls = cls.__name__
+        with self._lock:
+            if cls is None:
+                cur = self.__conn.execute("SELECT COUNT(*) FROM objects")
+            else:
+                cur = self.__conn.execute(
+                    "SELECT COUNT(*) FROM objects WHERE cls = ?", (cls,))
+            count = cur.fetchone()[0]
+            prefix = "" if cls is None else cls + "."
+            for key in self.__dirty:
+                if key.startswith(prefix) and not self.__exists(key):
+                    count += 1
+            for key in self.__deleted:
+                if key.startswith(prefix) and self.__exists(key):
+                    count -= 1
+            return count
+
+    def children(self, parent, cls):
+        """Return the stored instances of cls referring to parent.
+
+        Args:
+            parent (BaseModel): The parent instance.
+            cls (type or str): The class, or class name, of the children.
+
+        Raises:
+            ValueError: If cls has no foreign key to the class of parent.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        attr = foreign_key(classes[cls], type(parent).__name__)
+        with self._lock:
+            cur = self.__conn.execute(
+                "SELECT key, data FROM objects WHERE cls = ? AND "
+                "json_extract(data, '$.{}') = ?".format(attr),
+                (cls, parent.id))
+            objs = {}
+            for key, data in cur:
+                if key in self.__dirty or key in self.__deleted:
+                    continue
+                objs[key] = self.__objects.get(key) or self.__build(key, data)
+            for key in self.__dirty:
+                obj = self.__objects.get(key)
+                if key.startswith(cls + ".") and \
+                        getattr(obj, attr) == parent.id:
+                    objs[key] = obj
+            return list(objs.values())
+
+    def new(self, obj):
+        """Add obj to the storage, to be written on the next save."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        with self._lock:
+            self.__objects[key] = obj
+            self.__dirty.add(key)
+            self.__deleted.discard(key)
+
+    def touch(self, obj):
+        """Flag obj as changed since the last save, if it is stored."""
+        key = "{}.{}".format(obj.__class__.__name__, getattr(obj, "id", None))
+        with self._lock:
+            if self.__objects.get(key) is obj:
+                self.__dirty.add(key)
+
+    def delete(self, obj):
+        """Delete obj from the storage, if it is stored."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        with self._lock:
+            if self.__objects.get(key) is obj:
+                del self.__objects[key]
+                self.__dirty.discard(key)
+                self.__deleted.add(key)
+
+    def flush(self):
+        """Write the changed and deleted rows in a single transaction."""
+        with self._lock:
+            rows = []
+            for key in self.__dirty:
+                obj = self.__objects.get(key)
+                if obj is not None:
+                    rows.append((key, obj.__class__.__name__,
+                                 json.dumps(obj.to_dict())))
+            with self.__conn:
+                self.__conn.executemany(
+                    "INSERT OR REPLACE INTO objects (key, cls, data) "
+                    "VALUES (?, ?, ?)", rows)
+                self.__conn.executemany(
+                    "DELETE FROM objects WHERE key = ?",
+                    [(key,) for key in self.__deleted])
+            self.__dirty = set()
+            self.__deleted = set()
+
+    def reload(self, *, classes=None):
+        """Drop the instances built so far so they are read again.
+
+        Objects changed and not saved yet are kept.
+
+        Args:
+            classes (iterable): The classes or class names to reload.
+                All of them are reloaded if None.
+        """
+        if classes is not None:
+            classes = {c if type(c) is str else c.__name__ for c in classes}
+        with self._lock:
+            for key in list(self.__objects):
+                if key in self.__dirty:
+                    continue
+                if classes is None or key.split(".", 1)[0] in classes:
+                    del self.__objects[key]
+
+    def close(self):
+        """Close the connection to the database."""
+        with self._lock:
+            self.__conn.close()
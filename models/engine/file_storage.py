@@ -1,49 +1,1355 @@
 #!/usr/bin/python3
 """Defines the FileStorage class."""
-import json
+import atexit
+import contextlib
+import copy
+import os
+import threading
 from models.base_model import BaseModel
+from models.base_model import classes
+from models.base_model import foreign_key
 from models.user import User
 from models.state import State
 from models.city import City
 from models.place import Place
 from models.amenity import Amenity
 from models.review import Review
+from models.engine.base_storage import BaseStorage
+from models.engine.codec import compressions
+from models.engine.codec import get_codec
+from models.engine.codec import get_compression
+from models.engine.codec import open_file
+from models.engine.index import SetIndex
+from models.engine.index import SortedIndex
+from models.engine.index import kinds
+from models.engine.lock import RWLock
+from models.engine.query import Query
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
-class FileStorage:
+
+class FileStorage(BaseStorage):
     """Represent an abstracted storage engine.
 
+    Changes are tracked per key so that save() only re-serializes the
+    objects that were created or changed since the last save; every other
+    object reuses the fragment cached when it was last written. Fragments
+    and files are laid out by a codec (see models.engine.codec) chosen by
+    name or from the extension of __file_path. Snapshots are streamed
+    through gzip, bz2 or lzma when a compression is set or when
+    __file_path ends with .gz, .bz2 or .xz; journals are never compressed.
+
+    When shard_dir is set, each class is persisted in its own file,
+    <shard_dir>/<class name><codec extension>, and save() only rewrites
+    the files of the classes that changed.
+
+    In journal mode, save() appends one record per changed or deleted key
+    to a log next to the file instead of rewriting it. Once the log grows
+    past journal_limit bytes it is folded back into a fresh snapshot by a
+    background thread, which reads the snapshot and the log from disk;
+    later saves go on appending to a new log meanwhile.
+
+    In write-behind mode, save() only marks the storage as pending and a
+    timer thread flushes it at most once every flush_interval seconds,
+    coalescing all the saves made in between. flush() writes right away and
+    pending saves are flushed when the interpreter exits.
+
+    In lazy mode, reload() keeps the records read from disk as plain dicts
+    and only builds an instance when it is first looked up through get() or
+    all(); count() never builds any.
+
+    refresh() applies the changes other processes made to the files: files
+    whose inode, size and modification time are unchanged are skipped and
+    only the records appended to a journal since it was last read are.
+
+    Where fcntl is available, each snapshot file has a lock file next to
+    it, <file>.lock. Files are read under a shared lock and written under
+    an exclusive one, which save() holds while it merges the changes
+    other processes made to the file since it was last read and writes
+    the result; objects changed here and not saved yet win over the ones
+    on disk. Only the files being written are locked, so processes
+    writing different classes in shard mode do not wait for each other.
+
+    Within a process, the storage is guarded by a reader/writer lock:
+    all(), get(), count() and the queries run concurrently under the
+    read lock, while new(), touch(), delete() and reload() take the
+    write lock. save() only holds the write lock while it takes the
+    entries of a file and flags them as saved, and writes the file once
+    it is released; saves are serialized with one another. all() returns
+    __objects itself, which other threads may change while it is
+    iterated; objects() returns a copy made under the read lock.
+
+    Inside a batch() block save() does nothing; a single save is made when
+    the outermost block exits.
+
+    asave() and areload() run save() and reload() in the default executor
+    of the running event loop, and queries can be iterated with async for,
+    so that an asyncio program does not block on the files meanwhile.
+
+    Changes made in place to the list and dict attributes of an object,
+    such as appending to Place.amenity_ids, are noticed on save and by
+    the queries as long as the object was handed out by the storage, by
+    new(), get(), all(), objects() or a query, since the last save: a
+    copy of those attributes is kept for such objects only, until the
+    next save. Other changes must go through __setattr__ or obj.save().
+
+    The keys are also kept in one bucket per class, so that all(cls) and
+    count(cls) only look at the objects of that class.
+
+    Indexes, created with create_index() or declared in the __indexes__
+    (hash), __range_indexes__ (sorted) and __set_indexes__ (set, for
+    list attributes) tuples of a model class, map
+    attribute values to keys and are kept up to date by new(), touch(),
+    delete() and reload(), so that lookup() and query() do not scan the
+    objects. The foreign keys of a model, declared in __foreign_keys__,
+    are hash indexed too, so that children() finds the instances
+    referring to a parent without scanning the objects of their class.
+    A model can also declare the (latitude, longitude) pair of
+    attributes of its __spatial_index__, a grid searched by near() and
+    within(), and the text attributes of its __text_index__, an inverted
+    index searched by search(). A declared index is only built the first
+    time a query, children(), near(), within() or search() needs it.
+
     Attributes:
         __file_path (str): The name of the file to save objects to.
         __objects (dict): A dictionary of instantiated objects.
+        codec (str): The name of the codec, None to use the extension.
+        compression (str): The name of the compression, None to use the
+            extension.
+        compression_level (int): The compression level, None for the
+            default one.
+        shard_dir (str): The directory of the per-class files, if any.
+        lazy (bool): Whether reload() defers building the instances.
+        journal (bool): Whether save() appends to the journal.
+        journal_limit (int): The journal size that triggers a compaction.
+        write_behind (bool): Whether save() defers to the flush thread.
+        flush_interval (float): The minimum delay between two flushes.
+        _lock (RWLock): The reader/writer lock guarding the storage.
     """
     __file_path = "file.json"
     __objects = {}
 
-    def all(self):
-        """Return the dictionary __objects."""
-        return FileStorage.__objects
+    def __init__(self):
+        """Initialize the change tracking state of the storage."""
+        super().__init__()
+        self.codec = None
+        self.compression = None
+        self.compression_level = None
+        self.shard_dir = None
+        self.lazy = False
+        self.journal = False
+        self.journal_limit = 1 << 20
+        self.write_behind = False
+        self.flush_interval = 1.0
+        self._lock = RWLock()
+        self.__saving = threading.RLock()
+        self.__pending = False
+        self.__flusher = None
+        self.__exit_hook = False
+        self.__tracked = None
+        self.__stale = False
+        self.__dirty = set()
+        self.__deleted = set()
+        self.__fragments = {}
+        self.__lent = {}
+        self.__encoder = None
+        self.__compression = None
+        self.__raw = {}
+        self.__buckets = {}
+        self.__size = 0
+        self.__indexes = {}
+        self.__compactors = []
+        self.__seen = {}
+        self.__offsets = {}
+
+    def __read(self, fn, ready=None):
+        """Return fn() called under the read lock, if possible.
+
+        fn is called under the write lock instead, after syncing, if
+        __objects was replaced or ready() returns False, that is when fn
+        would have to change the state of the storage.
+
+        Args:
+            fn (callable): The function reading the storage.
+            ready (callable): Returns True if fn only reads.
+        """
+        with self._lock.read():
+            if self.__synced() and (ready is None or ready()):
+                return fn()
+        with self._lock.write():
+            self.__sync()
+            return fn()
+
+    def __synced(self):
+        """Return True if the buckets hold the keys of __objects."""
+        return self.__tracked is FileStorage.__objects and \
+            self.__size == len(FileStorage.__objects) + len(self.__raw)
+
+    def __sync(self):
+        """Drop the change tracking state if __objects was replaced.
+
+        If keys were added to or deleted from __objects directly, as in
+        del storage.all()[key], the buckets and indexes are updated and
+        the keys flagged as changed or deleted instead.
+        """
+        if self.__tracked is not FileStorage.__objects:
+            self.__stale = self.__tracked is not None
+            self.__tracked = FileStorage.__objects
+            self.__dirty = set()
+            self.__deleted = set()
+            self.__fragments = {}
+            self.__lent = {}
+            self.__raw = {}
+            self.__buckets = {}
+            self.__size = 0
+            for indexes in self.__indexes.values():
+                for index in indexes.values():
+                    index.clear()
+            for key, obj in FileStorage.__objects.items():
+                self.__add_key(key, obj)
+        elif not self.__synced():
+            for bucket in list(self.__buckets.values()):
+                for key in list(bucket):
+                    if key not in FileStorage.__objects and \
+                            key not in self.__raw:
+                        self.__remove_key(key)
+                        self.__fragments.pop(key, None)
+                        self.__lent.pop(key, None)
+                        self.__dirty.discard(key)
+                        self.__deleted.add(key)
+            for key, obj in FileStorage.__objects.items():
+                if key not in self.__buckets.get(key.split(".", 1)[0], {}):
+                    self.__add_key(key, obj)
+                    self.__dirty.add(key)
+                    self.__deleted.discard(key)
+
+    def __add_key(self, key, record):
+        """Add key to the bucket and the indexes of its class.
+
+        Args:
+            key (str): The key of the object.
+            record (object): The instance, or its raw dictionary.
+        """
+        cls = key.split(".", 1)[0]
+        bucket = self.__buckets.setdefault(cls, {})
+        if key not in bucket:
+            bucket[key] = None
+            self.__size += 1
+        for index in self.__indexes.get(cls, {}).values():
+            index.add(key, record)
+
+    def __remove_key(self, key):
+        """Remove key from the bucket and the indexes of its class."""
+        cls = key.split(".", 1)[0]
+        if key in self.__buckets.get(cls, {}):
+            del self.__buckets[cls][key]
+            self.__size -= 1
+        for index in self.__indexes.get(cls, {}).values():
+            index.remove(key)
+
+    def __record(self, key):
+        """Return the instance or the raw dictionary stored under key."""
+        if key in self.__raw:
+            return self.__raw[key]
+        return FileStorage.__objects[key]
+
+    @staticmethod
+    def __declared(cls):
+        """Return the kind of the index declared on each attribute of cls."""
+        model = classes.get(cls)
+        declared = dict.fromkeys(getattr(model, "__foreign_keys__", {}),
+                                 "hash")
+        declared.update(dict.fromkeys(getattr(model, "__indexes__", ()),
+                                      "hash"))
+        declared.update(dict.fromkeys(getattr(model, "__range_indexes__", ()),
+                                      "sorted"))
+        declared.update(dict.fromkeys(getattr(model, "__set_indexes__", ()),
+                                      "set"))
+        if hasattr(model, "__spatial_index__"):
+            declared[model.__spatial_index__] = "grid"
+        if hasattr(model, "__text_index__"):
+            declared[model.__text_index__] = "text"
+        return declared
+
+    def __built(self, cls, attrs):
+        """Return True if the indexes of cls on attrs exist and are current.
+
+        They are not current if an object of cls handed out was changed in
+        place since.
+        """
+        declared = self.__declared(cls)
+        indexes = self.__indexes.get(cls, {})
+        if len(indexes) > 0 and any(self.__moved(key)
+                                    for key in list(self.__lent)
+                                    if key.split(".", 1)[0] == cls):
+            return False
+        return all(attr in indexes for attr in attrs if attr in declared)
+
+    def __class_indexes(self, cls, attrs=()):
+        """Return the indexes of cls, building the declared ones on attrs.
+
+        Declared indexes are only built on first use, so that reload()
+        does not fill the indexes no query asks for. The objects of cls
+        changed in place are indexed anew first.
+        """
+        if len(self.__indexes.get(cls, {})) > 0:
+            self.__changed(cls)
+        declared = self.__declared(cls)
+        for attr in attrs:
+            if attr in declared and \
+                    attr not in self.__indexes.get(cls, {}):
+                self.__build_index(cls, attr, declared[attr])
+        return self.__indexes.get(cls, {})
+
+    def __build_index(self, cls, attr, kind):
+        """Create the index of attr on cls from the stored objects.
+
+        attr is a tuple of attribute names for a grid or a text index.
+        """
+        model = classes.get(cls)
+        if kind == "grid":
+            default = (None, None)
+        elif type(attr) is tuple:
+            default = tuple(getattr(model, a, None) for a in attr)
+        else:
+            default = getattr(model, attr, None)
+        index = kinds[kind](attr, default)
+        for key in self.__buckets.get(cls, {}):
+            index.add(key, self.__record(key))
+        self.__indexes.setdefault(cls, {})[attr] = index
+        return index
+
+    def __materialize(self, key):
+        """Build the instance of the raw record stored under key."""
+        o = self.__raw.pop(key)
+        cls_name = o.pop("__class__")
+        obj = classes[cls_name](**o)
+        FileStorage.__objects[key] = obj
+        for index in self.__indexes.get(cls_name, {}).values():
+            index.add(key, obj)
+        return obj
+
+    def all(self, cls=None):
+        """Return the dictionary __objects, or the objects of cls.
+
+        Args:
+            cls (type or str): The class, or class name, of the objects to
+                return. All of them are returned if None.
+
+        Returns:
+            __objects itself if cls is None, a new dictionary otherwise.
+        """
+        if cls is not None and type(cls) is not str:
+            cls = cls.__name__
+        return self.__read(lambda: self.__all(cls),
+                           lambda: len(self.__raw) == 0)
+
+    def objects(self, cls=None):
+        """Return a copy of all(cls), safe to iterate from any thread.
+
+        Unlike all(), which returns the live dictionary when cls is None,
+        the copy is not changed by the objects created or deleted
+        meanwhile by other threads.
+
+        Args:
+            cls (type or str): The class, or class name, of the objects to
+                return. All of them are returned if None.
+        """
+        if cls is not None and type(cls) is not str:
+            cls = cls.__name__
+        return self.__read(lambda: dict(self.__all(cls)),
+                           lambda: len(self.__raw) == 0)
+
+    def __all(self, cls):
+        """Return the objects of cls, all of them if None, building them."""
+        if cls is None:
+            for key in list(self.__raw):
+                self.__materialize(key)
+            for key, obj in FileStorage.__objects.items():
+                self.__lend(key, obj)
+            return FileStorage.__objects
+        objs = {}
+        for key in self.__buckets.get(cls, {}):
+            if key in self.__raw:
+                objs[key] = self.__materialize(key)
+            else:
+                objs[key] = FileStorage.__objects[key]
+            self.__lend(key, objs[key])
+        return objs
+
+    def get(self, cls, id):
+        """Return the stored instance of cls with the given id.
+
+        Args:
+            cls (type or str): The class, or class name, of the instance.
+            id (str): The id of the instance.
+
+        Returns:
+            The instance, or None if it is not stored.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        key = "{}.{}".format(cls, id)
+        return self.__read(lambda: self.__get(key),
+                           lambda: key not in self.__raw)
+
+    def __get(self, key):
+        """Return the object stored under key, building it, or None."""
+        if key in self.__raw:
+            obj = self.__materialize(key)
+        else:
+            obj = FileStorage.__objects.get(key)
+        if obj is not None:
+            self.__lend(key, obj)
+        return obj
+
+    def count(self, cls=None):
+        """Return the number of stored instances of cls (None for all).
+
+        Args:
+            cls (type or str): The class, or class name, to count.
+        """
+        if cls is not None and type(cls) is not str:
+            cls = cls.__name__
+        return self.__read(lambda: self.__count(cls))
+
+    def __count(self, cls):
+        """Return the number of objects of cls, all of them if None."""
+        if cls is None:
+            return len(FileStorage.__objects) + len(self.__raw)
+        return len(self.__buckets.get(cls, {}))
+
+    def create_index(self, cls, attr, kind="hash"):
+        """Create an index on the attribute attr of cls.
+
+        The index is built from the objects already stored. An attribute
+        has a single index: a sorted index replaces a hash index, and
+        creating an index that exists, or a hash index on an attribute
+        with a sorted index, does nothing.
+
+        Args:
+            cls (type or str): The class, or class name, to index.
+            attr (str): The name of the attribute to index, the
+                (latitude, longitude) pair of names of a grid index, or the
+                tuple of names of a text index.
+            kind (str): "hash" for equality conditions, "sorted" for range
+                conditions too, "set" for the __contains and __all
+                conditions on a list, "grid" for near() and within(),
+                "text" for search().
+
+        Raises:
+            ValueError: If kind is not a known kind of index, or attr does
+                not suit it.
+        """
+        if kind not in kinds:
+            raise ValueError("unknown index kind {}".format(kind))
+        if (type(attr) is tuple) != (kind in ("grid", "text")) or \
+                kind == "grid" and len(attr) != 2:
+            raise ValueError("invalid attributes {!r} for a {} index"
+                             .format(attr, kind))
+        if type(cls) is not str:
+            cls = cls.__name__
+        with self._lock.write():
+            self.__sync()
+            index = self.__indexes.get(cls, {}).get(attr)
+            if type(index) is not kinds[kind] and \
+                    type(index) is not SortedIndex:
+                self.__build_index(cls, attr, kind)
+
+    def lookup(self, cls, **kwargs):
+        """Return the stored instances of cls whose attributes match kwargs.
+
+        Args:
+            cls (type or str): The class, or class name, of the instances.
+            **kwargs (dict): The attribute/value pairs to match.
+
+        Returns:
+            The list of matching instances.
+        """
+        return list(self.query(cls).where(**kwargs))
+
+    def children(self, parent, cls):
+        """Return the stored instances of cls referring to parent.
+
+        Args:
+            parent (BaseModel): The parent instance.
+            cls (type or str): The class, or class name, of the children.
+
+        Raises:
+            ValueError: If cls has no foreign key to the class of parent.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        attr = foreign_key(classes[cls], type(parent).__name__)
+        return self.lookup(cls, **{attr: parent.id})
+
+    def query(self, cls):
+        """Return a Query over the stored instances of cls.
+
+        Args:
+            cls (type or str): The class, or class name, to query.
+        """
+        return Query(self, cls)
+
+    def candidates(self, cls, conditions=()):
+        """Return the stored records of cls that may match conditions.
+
+        The most selective index among the equality and membership
+        conditions, the range conditions on a sorted index and the
+        __contains and __all conditions on a set index, narrows the
+        records down; the class bucket is scanned if none of them is
+        indexed. The records returned still have to be checked against
+        every condition.
+
+        Args:
+            cls (str): The class name of the records.
+            conditions (iterable): The (attribute, operator, value)
+                conditions of the query.
+
+        Returns:
+            A list of (key, record) pairs, where record is the instance or
+            its raw dictionary if it was not built yet.
+        """
+        attrs = [attr for attr, op, value in conditions]
+        return self.__read(lambda: self.__candidates(cls, conditions),
+                           lambda: self.__built(cls, attrs))
+
+    def __candidates(self, cls, conditions):
+        """Return the records of cls that may match conditions."""
+        indexes = self.__class_indexes(
+            cls, [attr for attr, op, value in conditions])
+        keys = self.__buckets.get(cls, {})
+        ranges = {}
+        elements = {}
+        for attr, op, value in conditions:
+            index = indexes.get(attr)
+            if type(index) is SetIndex:
+                if op not in ("contains", "all"):
+                    continue
+                items = [value] if op == "contains" else value
+                try:
+                    items = elements.get(attr, []) + list(items)
+                except TypeError:
+                    continue
+                if len(items) == 0 or \
+                        not all(index.accepts(v) for v in items):
+                    continue
+                elements[attr] = items
+                found = index.find_all(items)
+            elif index is None or op not in ("eq", "in") and \
+                    type(index) is not SortedIndex:
+                continue
+            elif op == "in":
+                try:
+                    if not all(index.accepts(v) for v in value):
+                        continue
+                except TypeError:
+                    continue
+                found = {}
+                for v in value:
+                    found.update(dict.fromkeys(index.find(v)))
+            elif not index.accepts(value):
+                continue
+            elif op == "eq":
+                found = index.find(value)
+            elif op in ("gt", "ge", "lt", "le"):
+                low, low_inclusive, high, high_inclusive = \
+                    ranges.get(attr, (None, True, None, True))
+                inclusive = op in ("ge", "le")
+                if op in ("gt", "ge"):
+                    if low is None or value > low or \
+                            value == low and not inclusive:
+                        low, low_inclusive = value, inclusive
+                elif high is None or value < high or \
+                        value == high and not inclusive:
+                    high, high_inclusive = value, inclusive
+                ranges[attr] = (low, low_inclusive, high, high_inclusive)
+                found = index.range(low, high, low_inclusive,
+                                    high_inclusive)
+            else:
+                continue
+            if len(found) < len(keys):
+                keys = found
+        return [(key, self.__record(key)) for key in keys]
+
+    def __declared_of(self, cls, kind):
+        """Return the attributes of cls declaring an index of kind."""
+        return [attr for attr, k in self.__declared(cls).items() if k == kind]
+
+    def __index_of_kind(self, cls, kind):
+        """Return the first index of cls of the given kind.
+
+        Raises:
+            ValueError: If cls has no index of that kind.
+        """
+        indexes = self.__class_indexes(cls, self.__declared_of(cls, kind))
+        for index in indexes.values():
+            if type(index) is kinds[kind]:
+                return index
+        raise ValueError("{} has no {}".format(cls, kinds[kind].__name__))
+
+    def near(self, cls, lat, lon, km):
+        """Return the stored instances of cls within km of a point.
+
+        Args:
+            cls (type or str): The class, or class name, of the instances.
+            lat (float): The latitude of the center.
+            lon (float): The longitude of the center.
+            km (float): The radius, in kilometers.
+
+        Returns:
+            The list of instances, nearest first.
+
+        Raises:
+            ValueError: If cls has no spatial index.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        attrs = self.__declared_of(cls, "grid")
+        found = self.__read(lambda: self.__index_of_kind(
+            cls, "grid").near(lat, lon, km), lambda: self.__built(cls, attrs))
+        return [self.get(cls, key.split(".", 1)[1]) for d, key in found]
+
+    def within(self, cls, south, west, north, east):
+        """Return the stored instances of cls inside a bounding box.
+
+        The box crosses the antimeridian when west is greater than east.
+
+        Args:
+            cls (type or str): The class, or class name, of the instances.
+            south (float): The minimum latitude.
+            west (float): The western longitude.
+            north (float): The maximum latitude.
+            east (float): The eastern longitude.
+
+        Raises:
+            ValueError: If cls has no spatial index.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        attrs = self.__declared_of(cls, "grid")
+        found = self.__read(lambda: self.__index_of_kind(
+            cls, "grid").box(south, west, north, east),
+            lambda: self.__built(cls, attrs))
+        return [self.get(cls, key.split(".", 1)[1]) for key in found]
+
+    def search(self, cls, text, limit=None):
+        """Return the stored instances of cls matching a text search.
+
+        Args:
+            cls (type or str): The class, or class name, of the instances.
+            text (str): The words to search for; words between double
+                quotes must appear as a phrase.
+            limit (int): The maximum number of results, None for all.
+
+        Returns:
+            The list of matching instances, most relevant first.
+
+        Raises:
+            ValueError: If cls has no text index.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        attrs = self.__declared_of(cls, "text")
+        found = self.__read(lambda: self.__index_of_kind(
+            cls, "text").search(text), lambda: self.__built(cls, attrs))
+        return [self.get(cls, key.split(".", 1)[1])
+                for score, key in found[:limit]]
 
     def new(self, obj):
         """Set in __objects obj with key <obj_class_name>.id"""
         ocname = obj.__class__.__name__
-        FileStorage.__objects["{}.{}".format(ocname, obj.id)] = obj
+        key = "{}.{}".format(ocname, obj.id)
+        with self._lock.write():
+            self.__sync()
+            FileStorage.__objects[key] = obj
+            self.__raw.pop(key, None)
+            self.__add_key(key, obj)
+            self.__fragments.pop(key, None)
+            self.__lent.pop(key, None)
+            self.__lend(key, obj)
+            self.__dirty.add(key)
+            self.__deleted.discard(key)
 
-    def save(self):
-        """Serialize __objects to the JSON file __file_path."""
+    def touch(self, obj):
+        """Flag obj as changed since the last save, if it is stored."""
+        key = "{}.{}".format(obj.__class__.__name__, getattr(obj, "id", None))
+        if FileStorage.__objects.get(key) is not obj:
+            return
+        with self._lock.write():
+            self.__sync()
+            if FileStorage.__objects.get(key) is obj:
+                self.__fragments.pop(key, None)
+                self.__lent.pop(key, None)
+                self.__lend(key, obj)
+                self.__dirty.add(key)
+                for index in self.__indexes.get(key.split(".", 1)[0],
+                                                {}).values():
+                    index.add(key, obj)
+
+    def delete(self, obj):
+        """Delete obj from __objects, if it is stored."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        with self._lock.write():
+            self.__sync()
+            if FileStorage.__objects.get(key) is obj:
+                del FileStorage.__objects[key]
+                self.__remove_key(key)
+                self.__fragments.pop(key, None)
+                self.__lent.pop(key, None)
+                self.__dirty.discard(key)
+                self.__deleted.add(key)
+
+    def __codec(self):
+        """Select the codec and compression, dropping stale fragments."""
+        codec = get_codec(self.codec, FileStorage.__file_path)
+        if codec is not self.__encoder:
+            self.__encoder = codec
+            self.__fragments = {}
+        self.__compression = get_compression(self.compression,
+                                             FileStorage.__file_path)
+
+    def __segment(self, key):
+        """Return the segment key is persisted in: its class, or None."""
+        if self.shard_dir is None:
+            return None
+        return key.split(".", 1)[0]
+
+    def __path(self, segment):
+        """Return the path of the snapshot file of segment."""
+        if segment is None:
+            return FileStorage.__file_path
+        return os.path.join(self.shard_dir, segment + self.__extension())
+
+    def __extension(self):
+        """Return the extension of the per-class files."""
+        return self.__encoder.extension + \
+            compressions.get(self.__compression, "")
+
+    def __segments(self):
+        """Return every segment held in memory or on disk."""
+        if self.shard_dir is None:
+            return {None}
+        segments = {cls for cls, keys in self.__buckets.items() if keys}
+        try:
+            for name in os.listdir(self.shard_dir):
+                segment, ext, suffix = name.partition(self.__extension())
+                if ext and suffix in ("", ".journal", ".journal.old"):
+                    segments.add(segment)
+        except FileNotFoundError:
+            pass
+        return segments
+
+    def __lend(self, key, obj):
+        """Copy the list and dict attributes of obj, handed out under key.
+
+        Nothing is kept for an object without such attributes, or one
+        already handed out since the last save.
+        """
+        if key in self.__lent:
+            return
+        copied = {k: copy.deepcopy(v) for k, v in obj.__dict__.items()
+                  if type(v) in (list, dict)}
+        if len(copied) > 0:
+            self.__lent[key] = copied
+
+    def __moved(self, key):
+        """Return True if the object under key was changed in place."""
+        obj = FileStorage.__objects.get(key)
+        return obj is not None and \
+            any(obj.__dict__.get(k) != v
+                for k, v in self.__lent[key].items())
+
+    def __changed(self, cls=None):
+        """Flag the objects handed out and changed in place since lent.
+
+        Those are the changes not made through __setattr__, such as
+        appending to a list attribute; the objects are indexed anew.
+
+        Args:
+            cls (str): The class name of the objects to check, None for
+                all of them.
+        """
+        for key in list(self.__lent):
+            if cls is not None and key.split(".", 1)[0] != cls:
+                continue
+            if self.__moved(key):
+                obj = FileStorage.__objects[key]
+                self.__fragments.pop(key, None)
+                self.__dirty.add(key)
+                del self.__lent[key]
+                self.__lend(key, obj)
+                for index in self.__indexes.get(key.split(".", 1)[0],
+                                                {}).values():
+                    index.add(key, obj)
+
+    def __fragment(self, key, obj):
+        """Return the encoded obj, serializing it only if changed."""
+        frag = self.__fragments.get(key)
+        if frag is None:
+            frag = self.__encoder.encode(obj.to_dict())
+            self.__fragments[key] = frag
+        return frag
+
+    def __entries(self, segments):
+        """Return the (key, fragment) entries of the given segments.
+
+        Args:
+            segments (set): The segments to serialize.
+
+        Returns:
+            A dict mapping each segment to the list of its entries.
+        """
+        entries = {}
+        for segment in segments:
+            if segment is None:
+                keys = list(FileStorage.__objects) + list(self.__raw)
+            else:
+                keys = self.__buckets.get(segment, {})
+            entries[segment] = []
+            for key in keys:
+                if key in self.__raw:
+                    frag = self.__fragments.get(key)
+                    if frag is None:
+                        frag = self.__encoder.encode(self.__raw[key])
+                        self.__fragments[key] = frag
+                else:
+                    frag = self.__fragment(key, FileStorage.__objects[key])
+                entries[segment].append((key, frag))
+        return entries
+
+    @staticmethod
+    def __stat(path):
+        """Return the (inode, size, mtime) signature of path, or None."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def __remember(self, *paths):
+        """Record the current signature of paths as read or written."""
+        for path in paths:
+            self.__seen[path] = self.__stat(path)
+            if self.__seen[path] is None:
+                self.__offsets.pop(path, None)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def __locked(path, exclusive=False):
+        """Hold a lock on the lock file of the snapshot file at path.
+
+        Nothing is locked if fcntl is not available, or if a shared lock
+        is asked for and there is nothing to read, or the lock file can not
+        be created; reading a storage that was never saved leaves no lock
+        file behind.
+
+        Args:
+            path (str): The path of the snapshot file.
+            exclusive (bool): Whether to lock for writing, not reading.
+        """
+        if fcntl is None or not exclusive and not any(
+                os.path.exists(p) for p in (path, path + ".journal",
+                                            path + ".journal.old")):
+            yield
+            return
+        try:
+            f = open(path + ".lock", "ab")
+        except OSError:
+            if exclusive:
+                raise
+            yield
+            return
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __write_snapshot(self, codec, compression, path, entries, obsolete):
+        """Atomically write entries to the snapshot file at path.
+
+        Args:
+            codec (object): The codec to lay the snapshot out with.
+            compression (str): The compression to stream through, if any.
+            path (str): The path of the snapshot file.
+            entries (list): The (key, fragment) entries to write.
+            obsolete (list): Journal paths folded into the snapshot,
+                removed once it is in place.
+        """
+        tmp = path + ".tmp"
+        with open_file(tmp, "wb", compression,
+                       self.compression_level) as f:
+            codec.write_snapshot(f, entries)
+        os.replace(tmp, path)
+        for journal in obsolete:
+            try:
+                os.remove(journal)
+            except FileNotFoundError:
+                pass
+
+    def __rewrite(self, segments, merge=True):
+        """Rewrite the snapshots of segments and drop their journals.
+
+        The entries of a segment are taken under the write lock, and its
+        changes flagged as saved; the file is written once the lock is
+        released, so the objects can be used in the meantime.
+
+        Args:
+            segments (set): The segments to rewrite.
+            merge (bool): Whether to apply the changes made to the files
+                by other processes first.
+        """
+        if self.shard_dir is not None:
+            os.makedirs(self.shard_dir, exist_ok=True)
+        for segment in segments:
+            path = self.__path(segment)
+            journal = path + ".journal"
+            with self.__locked(path, True):
+                with self._lock.write():
+                    if merge:
+                        self.__refresh(segment)
+                    entries = self.__entries({segment})[segment]
+                    self.__saved(segment)
+                self.__write_snapshot(self.__encoder, self.__compression,
+                                      path, entries,
+                                      [journal + ".old", journal])
+                self.__remember(path, journal + ".old", journal)
+
+    def __saved(self, segment):
+        """Flag the changes to the objects of segment as saved."""
+        if segment is None:
+            self.__dirty, self.__deleted = set(), set()
+            return
+        self.__dirty = {k for k in self.__dirty
+                        if self.__segment(k) != segment}
+        self.__deleted = {k for k in self.__deleted
+                          if self.__segment(k) != segment}
+
+    def __journal_records(self, dirty, deleted):
+        """Return the journal records of the changed and deleted keys.
+
+        Args:
+            dirty (set): The keys created or changed since the last save.
+            deleted (set): The keys deleted since the last save.
+
+        Returns:
+            A dict mapping each segment to the list of its records.
+        """
         odict = FileStorage.__objects
-        objdict = {obj: odict[obj].to_dict() for obj in odict.keys()}
-        with open(FileStorage.__file_path, "w") as f:
-            json.dump(objdict, f)
+        records = {}
+        codec = self.__encoder
+        for key in dirty:
+            if key in odict:
+                records.setdefault(self.__segment(key), []).append(
+                    codec.record("put", key, self.__fragment(key, odict[key])))
+        for key in deleted:
+            records.setdefault(self.__segment(key), []).append(
+                codec.record("delete", key))
+        return records
+
+    def __append_journal(self, records):
+        """Append records to the journals of their segments.
+
+        Args:
+            records (dict): The list of records of each segment.
+
+        Returns:
+            The list of segments whose journal outgrew journal_limit.
+        """
+        if self.shard_dir is not None and len(records) > 0:
+            os.makedirs(self.shard_dir, exist_ok=True)
+        full = []
+        for segment, lines in records.items():
+            path = self.__path(segment)
+            journal = path + ".journal"
+            with self.__locked(path, True):
+                known = self.__stat(journal) == self.__seen.get(journal)
+                with open(journal, "ab") as f:
+                    f.write(b"".join(lines))
+                    size = f.tell()
+                if known:
+                    self.__remember(journal)
+                    self.__offsets[journal] = size
+            if size >= self.journal_limit:
+                full.append(segment)
+        return full
+
+    def __start_compaction(self, segment):
+        """Fold the journal of segment into a new snapshot in background.
 
-    def reload(self):
-        """Deserialize the JSON file __file_path to __objects, if it exists."""
+        The journal is first moved aside so that saves made while the
+        snapshot is written go to a fresh journal. Nothing is started if
+        a compaction of segment is still running.
+        """
+        path = self.__path(segment)
+        journal = path + ".journal"
+        old = journal + ".old"
+        if any(p == path for compactor, p, known, done in self.__compactors):
+            return
+        with self.__locked(path, True):
+            if not os.path.exists(journal):
+                return
+            known = all(self.__stat(p) == self.__seen.get(p)
+                        for p in (path, journal, old))
+            if os.path.exists(old):
+                with open(journal, "rb") as src, open(old, "ab") as dst:
+                    dst.write(src.read())
+                os.remove(journal)
+            else:
+                os.replace(journal, old)
+            self.__remember(journal)
+            sig = self.__stat(old)
+        done = []
+        compactor = threading.Thread(target=self.__compact_journal,
+                                     args=(self.__encoder,
+                                           self.__compression,
+                                           self.compression_level, path,
+                                           sig, done))
+        compactor.start()
+        self.__compactors.append((compactor, path, known, done))
+
+    @staticmethod
+    def __compact_journal(codec, compression, level, path, sig, done):
+        """Write the snapshot folding the moved-aside journal of path.
+
+        The snapshot and the journal are read from disk, so that the
+        objects in memory are not locked meanwhile. Nothing is written if
+        another process changed either file since the journal was moved
+        aside.
+
+        Args:
+            codec (object): The codec to lay the snapshot out with.
+            compression (str): The compression to stream through, if any.
+            level (int): The compression level, None for the default one.
+            path (str): The path of the snapshot file.
+            sig (tuple): The signature of the journal when moved aside.
+            done (list): Receives the signature of the new snapshot.
+        """
+        old = path + ".journal.old"
+        tmp = old + ".tmp"
+        base = FileStorage.__stat(path)
+        records = {}
         try:
-            with open(FileStorage.__file_path) as f:
-                objdict = json.load(f)
-                for o in objdict.values():
-                    cls_name = o["__class__"]
-                    del o["__class__"]
-                    self.new(eval(cls_name)(**o))
+            with open_file(path, "rb", compression) as f:
+                records.update(codec.read_snapshot(f))
         except FileNotFoundError:
+            pass
+        with open(old, "rb") as f:
+            for op, key, o in codec.read_records(f):
+                if op == "delete":
+                    records.pop(key, None)
+                else:
+                    records[key] = o
+        with open_file(tmp, "wb", compression, level) as f:
+            codec.write_snapshot(f, ((key, codec.encode(o))
+                                     for key, o in records.items()))
+        with FileStorage.__locked(path, True):
+            if FileStorage.__stat(old) != sig or \
+                    FileStorage.__stat(path) != base:
+                os.remove(tmp)
+                return
+            os.replace(tmp, path)
+            os.remove(old)
+            done.append(FileStorage.__stat(path))
+
+    def __wait_compaction(self, block=True):
+        """Block until the running background compactions have finished.
+
+        The new snapshot of a compaction is recorded as read if the
+        journal it folded held nothing but what was already read.
+
+        Args:
+            block (bool): Whether to wait for them, or only to collect the
+                finished ones.
+        """
+        for item in list(self.__compactors):
+            compactor, path, known, done = item
+            if not block and compactor.is_alive():
+                continue
+            compactor.join()
+            self.__compactors.remove(item)
+            if len(done) > 0 and known:
+                old = path + ".journal.old"
+                self.__seen[path] = done[0]
+                self.__seen[old] = None
+                self.__offsets.pop(old, None)
+
+    def compact(self):
+        """Fold every journal into a new snapshot right away."""
+        with self.__saving:
+            self.__wait_compaction()
+            with self._lock.write():
+                self.__sync()
+                self.__codec()
+                segments = self.__segments()
+                stale, self.__stale = self.__stale, False
+            self.__rewrite(segments, not stale)
+
+    def save(self):
+        """Serialize __objects to the file __file_path.
+
+        In write-behind mode the write is left to the flush timer.
+        """
+        if self._batch_depth > 0:
             return
+        if not self.write_behind:
+            self.flush()
+            return
+        with self._lock.write():
+            self.__pending = True
+            if not self.__exit_hook:
+                atexit.register(self.__flush_pending)
+                self.__exit_hook = True
+            if self.__flusher is None:
+                self.__flusher = threading.Timer(self.flush_interval,
+                                                 self.__flush_pending)
+                self.__flusher.daemon = True
+                self.__flusher.start()
+
+    def _locked(self):
+        """Return the write lock of the storage, held by batch() too."""
+        return self._lock.write()
+
+    def flush(self):
+        """Write the changes made since the last flush right away.
+
+        Only the objects flagged as changed, or handed out and changed in
+        place, are converted with to_dict(); the others are written from
+        their cached fragment. Only the
+        files of the classes that changed are written; in journal mode only
+        the changed and deleted keys are, to the journals.
+        """
+        with self.__saving:
+            self.__wait_compaction(not self.journal)
+            with self._lock.write():
+                self.__sync()
+                if self.__flusher is not None:
+                    self.__flusher.cancel()
+                    self.__flusher = None
+                self.__pending = False
+                self.__codec()
+                self.__changed()
+                self.__lent = {}
+                dirty, deleted = self.__dirty, self.__deleted
+                records = None
+                if self.journal:
+                    records = self.__journal_records(dirty, deleted)
+                    self.__dirty, self.__deleted = set(), set()
+                else:
+                    stale, self.__stale = self.__stale, False
+                    if stale:
+                        segments = self.__segments()
+                    elif self.shard_dir is None:
+                        segments = {None}
+                    else:
+                        segments = {self.__segment(k)
+                                    for k in dirty | deleted}
+            if records is not None:
+                for segment in self.__append_journal(records):
+                    self.__start_compaction(segment)
+                return
+            self.__rewrite(segments, not stale)
+
+    def __flush_pending(self):
+        """Flush the saves deferred since the last flush, if any."""
+        with self._lock.write():
+            if self.__flusher is threading.current_thread():
+                self.__flusher = None
+            pending = self.__pending
+        if pending:
+            self.flush()
+
+    def __wanted(self, key, classes):
+        """Return True if key belongs to one of classes (None for all)."""
+        return classes is None or key.split(".", 1)[0] in classes
+
+    def __put(self, key, o):
+        """Store the record o read from disk under key.
+
+        An instance already stored under key is updated in place, so that
+        the references to it held elsewhere stay those of the storage.
+        """
+        self.__fragments.pop(key, None)
+        lent = self.__lent.pop(key, None) is not None
+        self.__dirty.discard(key)
+        self.__deleted.discard(key)
+        obj = FileStorage.__objects.get(key)
+        if obj is None and self.lazy:
+            self.__raw[key] = o
+            self.__add_key(key, o)
+            return
+        self.__raw.pop(key, None)
+        cls_name = o.pop("__class__")
+        if obj is None:
+            obj = classes[cls_name](**o)
+            FileStorage.__objects[key] = obj
+        else:
+            attrs = classes[cls_name](**o).__dict__
+            obj.__dict__.clear()
+            obj.__dict__.update(attrs)
+            if lent:
+                self.__lend(key, obj)
+        self.__add_key(key, obj)
+
+    def __drop(self, key):
+        """Remove the object deleted on disk under key."""
+        FileStorage.__objects.pop(key, None)
+        self.__raw.pop(key, None)
+        self.__remove_key(key)
+        self.__fragments.pop(key, None)
+        self.__lent.pop(key, None)
+
+    def __holds(self, key, o):
+        """Return True if the record o is what is stored under key."""
+        if key in self.__raw:
+            return self.__raw[key] == o
+        obj = FileStorage.__objects.get(key)
+        return obj is not None and obj.to_dict() == o
+
+    def __apply(self, records, classes, merge, seen):
+        """Apply the (op, key, dictionary) records read from disk.
+
+        Args:
+            records (iterable): The records to apply.
+            classes (set): The class names to apply, None for all.
+            merge (bool): Whether to leave the keys changed or deleted
+                here and not saved yet untouched.
+            seen (set): Updated with the keys put and not deleted since.
+        """
+        for op, key, o in records:
+            if not self.__wanted(key, classes):
+                continue
+            if merge and (key in self.__dirty or key in self.__deleted or
+                          op == "put" and self.__holds(key, o)):
+                seen.add(key)
+                continue
+            if op == "delete":
+                self.__drop(key)
+                seen.discard(key)
+            else:
+                self.__put(key, o)
+                seen.add(key)
+
+    def __replay(self, path, classes, merge, seen, offset=0):
+        """Apply the records of the journal at path from offset on."""
+        sig = self.__stat(path)
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                self.__apply(self.__encoder.read_records(f),
+                             classes, merge, seen)
+                self.__offsets[path] = f.tell()
+        except FileNotFoundError:
+            pass
+        self.__seen[path] = sig
+
+    def __load(self, path, classes, merge=False):
+        """Load the snapshot at path and its journals into __objects.
+
+        Returns:
+            The set of keys loaded.
+        """
+        seen = set()
+        sig = self.__stat(path)
+        try:
+            with open_file(path, "rb", self.__compression) as f:
+                records = (("put", key, o)
+                           for key, o in self.__encoder.read_snapshot(f))
+                self.__apply(records, classes, merge, seen)
+        except FileNotFoundError:
+            pass
+        self.__seen[path] = sig
+        self.__replay(path + ".journal.old", classes, merge, seen)
+        self.__replay(path + ".journal", classes, merge, seen)
+        return seen
+
+    def __refresh_segment(self, segment):
+        """Reload segment, dropping the keys no longer on disk."""
+        seen = self.__load(self.__path(segment), None, True)
+        if segment is None:
+            keys = list(FileStorage.__objects) + list(self.__raw)
+        else:
+            keys = list(self.__buckets.get(segment, {}))
+        for key in keys:
+            if key not in seen and key not in self.__dirty:
+                self.__drop(key)
+
+    def refresh(self):
+        """Apply the changes made to the files since they were last read.
+
+        Objects changed or deleted here and not saved yet are left
+        untouched.
+
+        Returns:
+            True if anything had changed on disk, False otherwise.
+        """
+        with self.__saving:
+            self.__wait_compaction()
+            with self._lock.write():
+                self.__sync()
+                self.__codec()
+                changed = False
+                for segment in self.__segments():
+                    with self.__locked(self.__path(segment)):
+                        changed = self.__refresh(segment) or changed
+                return changed
+
+    def __refresh(self, segment):
+        """Apply the changes made to the files of segment since last read.
+
+        The objects of segment changed in place here are flagged first, so
+        that they are not overwritten.
+
+        Returns:
+            True if anything had changed on disk, False otherwise.
+        """
+        self.__changed(segment)
+        path = self.__path(segment)
+        journal = path + ".journal"
+        old = journal + ".old"
+        sig = self.__stat(journal)
+        offset = self.__offsets.get(journal, 0)
+        if (self.__stat(path) != self.__seen.get(path) or
+                self.__stat(old) != self.__seen.get(old)):
+            self.__refresh_segment(segment)
+        elif sig == self.__seen.get(journal):
+            return False
+        elif (sig is None or sig[1] < offset or
+              self.__seen.get(journal) is not None and
+              sig[0] != self.__seen[journal][0]):
+            self.__refresh_segment(segment)
+        else:
+            self.__replay(journal, None, True, set(), offset)
+        return True
+
+    def reload(self, *, classes=None):
+        """Deserialize the file __file_path to __objects, if it exists.
+
+        Any journal left next to the file is replayed on top of it.
+
+        Args:
+            classes (iterable): The classes or class names to load.
+                All of them are loaded if None.
+        """
+        if classes is not None:
+            classes = {c if type(c) is str else c.__name__ for c in classes}
+        with self.__saving:
+            self.__wait_compaction()
+            with self._lock.write():
+                self.__sync()
+                self.__codec()
+                if self.shard_dir is None:
+                    segments = [None]
+                elif classes is None:
+                    segments = self.__segments()
+                else:
+                    segments = classes
+                for segment in segments:
+                    path = self.__path(segment)
+                    with self.__locked(path):
+                        self.__load(path, classes)
@@ -0,0 +1,604 @@
+#!/usr/bin/python3
+"""Defines the secondary indexes used by FileStorage.
+
+An index maps the values of one attribute of a model class to the keys of
+the objects holding them. It is fed with instances or, in lazy mode, with
+the raw dictionaries read from disk, so nothing has to be built to index
+a record.
+
+Hash indexes answer equality conditions; sorted indexes also answer range
+conditions with two binary searches. Set indexes cover list attributes
+and answer the conditions on the elements a record holds. Grid indexes
+cover a pair of latitude and longitude attributes and answer radius and
+bounding box searches. Text indexes cover text attributes and answer
+ranked term and phrase searches.
+"""
+import math
+import re
+from bisect import bisect_left
+from bisect import bisect_right
+from datetime import datetime
+
+EARTH_RADIUS = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def value_of(record, attr, default=None):
+    """Return the value of attr in record, an instance or a dictionary.
+
+    The dates of a dictionary are parsed, so that they compare with the
+    dates of instances.
+
+    Args:
+        record (object): The instance, or its dictionary.
+        attr (str): The name of the attribute.
+        default (any): The value of records that do not set attr.
+    """
+    if type(record) is not dict:
+        return getattr(record, attr, default)
+    value = record.get(attr, default)
+    if attr in ("created_at", "updated_at") and type(value) is str:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f")
+    return value
+
+
+def hashable(value):
+    """Return True if value can be used as a dictionary key."""
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class HashIndex:
+    """Represent a hash index on one attribute of a model class.
+
+    Records whose value is not hashable, such as a list, are left out of
+    the index.
+
+    Attributes:
+        attr (str): The name of the indexed attribute.
+        default (any): The value of records that do not set attr, usually
+            the class attribute of the model.
+    """
+
+    def __init__(self, attr, default=None):
+        """Initialize a new HashIndex.
+
+        Args:
+            attr (str): The name of the indexed attribute.
+            default (any): The value of records that do not set attr.
+        """
+        self.attr = attr
+        self.default = default
+        self.__keys = {}
+        self.__values = {}
+
+    def __len__(self):
+        """Return the number of indexed keys."""
+        return len(self.__values)
+
+    def value(self, record):
+        """Return the indexed value of record."""
+        return value_of(record, self.attr, self.default)
+
+    def accepts(self, value):
+        """Return True if value can be looked up in the index."""
+        return hashable(value)
+
+    def add(self, key, record):
+        """Index record under key, replacing its previous value if any."""
+        value = self.value(record)
+        if key in self.__values:
+            old = self.__values[key]
+            if type(old) is type(value) and old == value:
+                return
+            self.remove(key)
+        if self.accepts(value):
+            self.__values[key] = value
+            self.__keys.setdefault(value, {})[key] = None
+
+    def remove(self, key):
+        """Remove key from the index, if it is indexed."""
+        if key not in self.__values:
+            return
+        value = self.__values.pop(key)
+        keys = self.__keys[value]
+        del keys[key]
+        if len(keys) == 0:
+            del self.__keys[value]
+
+    def clear(self):
+        """Remove every key from the index."""
+        self.__keys = {}
+        self.__values = {}
+
+    def find(self, value):
+        """Return the keys of the records whose value equals value.
+
+        Raises:
+            TypeError: If value is not hashable.
+        """
+        return list(self.__keys.get(value, ()))
+
+
+class SortedIndex:
+    """Represent a sorted index on one attribute of a model class.
+
+    The values are kept in a sorted array next to the keys holding them,
+    so a range of values is found with two binary searches and read in
+    O(log n + k). Only the values of the type of default are indexed, all
+    numbers if it is a number; the others can not match a comparison.
+
+    Attributes:
+        attr (str): The name of the indexed attribute.
+        default (any): The value of records that do not set attr.
+        types (tuple): The types of the indexed values.
+    """
+
+    def __init__(self, attr, default=None):
+        """Initialize a new SortedIndex.
+
+        Args:
+            attr (str): The name of the indexed attribute.
+            default (any): The value of records that do not set attr.
+        """
+        self.attr = attr
+        self.default = default
+        if type(default) is str:
+            self.types = (str,)
+        else:
+            self.types = (int, float, bool)
+        self.__sorted = []
+        self.__sorted_keys = []
+        self.__values = {}
+
+    def __len__(self):
+        """Return the number of indexed keys."""
+        return len(self.__values)
+
+    def value(self, record):
+        """Return the indexed value of record."""
+        return value_of(record, self.attr, self.default)
+
+    def accepts(self, value):
+        """Return True if value can be compared with the indexed values."""
+        return type(value) in self.types
+
+    def add(self, key, record):
+        """Index record under key, replacing its previous value if any."""
+        value = self.value(record)
+        if key in self.__values:
+            old = self.__values[key]
+            if type(old) is type(value) and old == value:
+                return
+            self.remove(key)
+        if self.accepts(value):
+            i = bisect_right(self.__sorted, value)
+            self.__sorted.insert(i, value)
+            self.__sorted_keys.insert(i, key)
+            self.__values[key] = value
+
+    def remove(self, key):
+        """Remove key from the index, if it is indexed."""
+        if key not in self.__values:
+            return
+        value = self.__values.pop(key)
+        i = bisect_left(self.__sorted, value)
+        while self.__sorted_keys[i] != key:
+            i += 1
+        del self.__sorted[i]
+        del self.__sorted_keys[i]
+
+    def clear(self):
+        """Remove every key from the index."""
+        self.__sorted = []
+        self.__sorted_keys = []
+        self.__values = {}
+
+    def find(self, value):
+        """Return the keys of the records whose value equals value."""
+        return self.range(value, value)
+
+    def range(self, low=None, high=None, low_inclusive=True,
+              high_inclusive=True):
+        """Return the keys of the records whose value is in a range.
+
+        The keys are returned in the order of their values.
+
+        Args:
+            low (any): The lower bound, None for no bound.
+            high (any): The upper bound, None for no bound.
+            low_inclusive (bool): Whether low itself is in the range.
+            high_inclusive (bool): Whether high itself is in the range.
+        """
+        i, j = 0, len(self.__sorted)
+        if low is not None:
+            bisect = bisect_left if low_inclusive else bisect_right
+            i = bisect(self.__sorted, low)
+        if high is not None:
+            bisect = bisect_right if high_inclusive else bisect_left
+            j = bisect(self.__sorted, high)
+        return self.__sorted_keys[i:j]
+
+
+class SetIndex:
+    """Represent an index on the elements of a list attribute.
+
+    Each element maps to the keys of the records whose list holds it, so
+    the records holding every element of a set are found by intersecting
+    the key sets of its elements, smallest first. Records whose value is
+    not a list, tuple or set are left out, and so are unhashable elements.
+
+    Attributes:
+        attr (str): The name of the indexed attribute.
+        default (any): The value of records that do not set attr.
+    """
+
+    def __init__(self, attr, default=None):
+        """Initialize a new SetIndex.
+
+        Args:
+            attr (str): The name of the indexed attribute.
+            default (any): The value of records that do not set attr.
+        """
+        self.attr = attr
+        self.default = default
+        self.__keys = {}
+        self.__values = {}
+
+    def __len__(self):
+        """Return the number of indexed keys."""
+        return len(self.__values)
+
+    def value(self, record):
+        """Return the indexed value of record."""
+        return value_of(record, self.attr, self.default)
+
+    def accepts(self, value):
+        """Return True if value can be looked up in the index."""
+        return hashable(value)
+
+    def add(self, key, record):
+        """Index record under key, replacing its previous value if any."""
+        value = self.value(record)
+        if type(value) not in (list, tuple, set, frozenset):
+            self.remove(key)
+            return
+        elements = frozenset(v for v in value if hashable(v))
+        if self.__values.get(key) == elements:
+            return
+        self.remove(key)
+        self.__values[key] = elements
+        for element in elements:
+            self.__keys.setdefault(element, {})[key] = None
+
+    def remove(self, key):
+        """Remove key from the index, if it is indexed."""
+        for element in self.__values.pop(key, ()):
+            keys = self.__keys[element]
+            del keys[key]
+            if len(keys) == 0:
+                del self.__keys[element]
+
+    def clear(self):
+        """Remove every key from the index."""
+        self.__keys = {}
+        self.__values = {}
+
+    def find(self, value):
+        """Return the keys of the records whose list holds value."""
+        return list(self.__keys.get(value, ()))
+
+    def find_all(self, values):
+        """Return the keys of the records whose list holds every value.
+
+        The keys are returned in the order of the smallest key set.
+
+        Args:
+            values (iterable): The elements to look for, at least one.
+        """
+        sets = sorted((self.__keys.get(v, {}) for v in set(values)),
+                      key=len)
+        return [key for key in sets[0]
+                if all(key in keys for keys in sets[1:])]
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """Return the great-circle distance in km between two points."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * \
+        math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """Represent a grid index on a latitude and a longitude attribute.
+
+    The points are bucketed in cells of cell_size degrees, so that a
+    search only checks the points of the cells overlapping its bounding
+    box. Records whose coordinates are not numbers are left out, as are
+    the instances that do not set them, whatever their class defaults.
+
+    Attributes:
+        attr (tuple): The names of the latitude and longitude attributes.
+        default (tuple): The values of records that do not set them.
+        cell_size (float): The side of a cell, in degrees.
+    """
+
+    cell_size = 0.1
+
+    def __init__(self, attr, default=(None, None)):
+        """Initialize a new GridIndex.
+
+        Args:
+            attr (tuple): The names of the latitude and longitude
+                attributes.
+            default (tuple): The values of records that do not set them.
+        """
+        self.attr = attr
+        self.default = default
+        self.__cells = {}
+        self.__points = {}
+
+    def __len__(self):
+        """Return the number of indexed keys."""
+        return len(self.__points)
+
+    def value(self, record):
+        """Return the (latitude, longitude) point of record."""
+        if type(record) is not dict:
+            record = vars(record)
+        return tuple(value_of(record, a, d)
+                     for a, d in zip(self.attr, self.default))
+
+    def accepts(self, value):
+        """Return True if value is a (latitude, longitude) point."""
+        return all(type(v) in (int, float) for v in value)
+
+    def __cell(self, lat, lon):
+        """Return the cell of a point."""
+        return (math.floor(lat / self.cell_size),
+                math.floor(lon / self.cell_size))
+
+    def add(self, key, record):
+        """Index record under key, replacing its previous point if any."""
+        point = self.value(record)
+        if key in self.__points:
+            if self.__points[key] == point:
+                return
+            self.remove(key)
+        if self.accepts(point):
+            self.__points[key] = point
+            self.__cells.setdefault(self.__cell(*point), {})[key] = None
+
+    def remove(self, key):
+        """Remove key from the index, if it is indexed."""
+        if key not in self.__points:
+            return
+        cell = self.__cell(*self.__points.pop(key))
+        keys = self.__cells[cell]
+        del keys[key]
+        if len(keys) == 0:
+            del self.__cells[cell]
+
+    def clear(self):
+        """Remove every key from the index."""
+        self.__cells = {}
+        self.__points = {}
+
+    def __candidates(self, south, west, north, east):
+        """Yield the (key, point) pairs of the cells overlapping a box."""
+        (i0, j0), (i1, j1) = self.__cell(south, west), self.__cell(north, east)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.__cells):
+            cells = (keys for (i, j), keys in self.__cells.items()
+                     if i0 <= i <= i1 and j0 <= j <= j1)
+        else:
+            cells = (self.__cells[(i, j)]
+                     for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)
+                     if (i, j) in self.__cells)
+        for keys in cells:
+            for key in keys:
+                yield key, self.__points[key]
+
+    def box(self, south, west, north, east):
+        """Return the keys of the points inside a bounding box.
+
+        The box crosses the antimeridian when west is greater than east.
+
+        Args:
+            south (float): The minimum latitude.
+            west (float): The western longitude.
+            north (float): The maximum latitude.
+            east (float): The eastern longitude.
+        """
+        if west > east:
+            return self.box(south, west, north, 180) + \
+                self.box(south, -180, north, east)
+        return [key for key, (lat, lon) in
+                self.__candidates(south, west, north, east)
+                if south <= lat <= north and west <= lon <= east]
+
+    def near(self, lat, lon, km):
+        """Return the points within km of a point, nearest first.
+
+        Args:
+            lat (float): The latitude of the center.
+            lon (float): The longitude of the center.
+            km (float): The radius, in kilometers.
+
+        Returns:
+            A list of (distance in km, key) pairs.
+        """
+        dlat = km / KM_PER_DEGREE
+        south, north = max(lat - dlat, -90), min(lat + dlat, 90)
+        cos = math.cos(math.radians(max(abs(south), abs(north))))
+        if cos * 180 * KM_PER_DEGREE <= km:
+            boxes = [(-180, 180)]
+        else:
+            dlon = km / (KM_PER_DEGREE * cos)
+            west, east = lon - dlon, lon + dlon
+            if west < -180:
+                boxes = [(west + 360, 180), (-180, east)]
+            elif east > 180:
+                boxes = [(west, 180), (-180, east - 360)]
+            else:
+                boxes = [(west, east)]
+        found = []
+        for west, east in boxes:
+            for key, point in self.__candidates(south, west, north, east):
+                d = distance(lat, lon, *point)
+                if d <= km:
+                    found.append((d, key))
+        found.sort()
+        return found
+
+
+def tokenize(text):
+    """Return the lowercase words of text."""
+    return re.findall(r"\w+", text.lower())
+
+
+class TextIndex:
+    """Represent an inverted full-text index on text attributes.
+
+    Each word maps to its posting list: the keys of the records using it
+    and the positions it appears at in their text. Searches are ranked
+    with BM25; a phrase between double quotes only matches records where
+    its words follow each other.
+
+    Attributes:
+        attr (tuple): The names of the indexed attributes.
+        default (tuple): The values of records that do not set them.
+        k1 (float): The BM25 term frequency saturation.
+        b (float): The BM25 length normalization.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, attr, default=()):
+        """Initialize a new TextIndex.
+
+        Args:
+            attr (tuple): The names of the indexed attributes.
+            default (tuple): The values of records that do not set them.
+        """
+        self.attr = attr
+        self.default = default or (None,) * len(attr)
+        self.__postings = {}
+        self.__texts = {}
+        self.__terms = {}
+        self.__lengths = {}
+        self.__total = 0
+
+    def __len__(self):
+        """Return the number of indexed keys."""
+        return len(self.__texts)
+
+    def value(self, record):
+        """Return the tuple of the indexed texts of record."""
+        return tuple(value_of(record, a, d)
+                     for a, d in zip(self.attr, self.default))
+
+    def add(self, key, record):
+        """Index the texts of record under key, replacing the old ones."""
+        texts = self.value(record)
+        if key in self.__texts:
+            if self.__texts[key] == texts:
+                return
+            self.remove(key)
+        self.__texts[key] = texts
+        terms = {}
+        position = 0
+        for text in texts:
+            if type(text) is not str:
+                continue
+            for word in tokenize(text):
+                terms.setdefault(word, []).append(position)
+                position += 1
+            position += 1
+        for word, positions in terms.items():
+            self.__postings.setdefault(word, {})[key] = positions
+        self.__terms[key] = list(terms)
+        self.__lengths[key] = sum(len(p) for p in terms.values())
+        self.__total += self.__lengths[key]
+
+    def remove(self, key):
+        """Remove key from the index, if it is indexed."""
+        if key not in self.__texts:
+            return
+        del self.__texts[key]
+        for word in self.__terms.pop(key):
+            postings = self.__postings[word]
+            del postings[key]
+            if len(postings) == 0:
+                del self.__postings[word]
+        self.__total -= self.__lengths.pop(key)
+
+    def clear(self):
+        """Remove every key from the index."""
+        self.__postings = {}
+        self.__texts = {}
+        self.__terms = {}
+        self.__lengths = {}
+        self.__total = 0
+
+    def __has_phrase(self, key, words):
+        """Return True if words follow each other in the text of key."""
+        positions = [set(self.__postings[w][key]) for w in words[1:]]
+        return any(all(p + i + 1 in ps for i, ps in enumerate(positions))
+                   for p in self.__postings[words[0]][key])
+
+    def search(self, text):
+        """Return the records matching the words and phrases of text.
+
+        A record matches if it contains one of the words and every
+        phrase; phrases are written between double quotes.
+
+        Args:
+            text (str): The words and phrases to search for.
+
+        Returns:
+            A list of (score, key) pairs, best first.
+        """
+        phrases = [tokenize(p) for p in re.findall(r'"([^"]*)"', text)]
+        phrases = [p for p in phrases if len(p) > 0]
+        words = set(tokenize(re.sub(r'"[^"]*"', " ", text)))
+        for phrase in phrases:
+            words.update(phrase)
+        if any(w not in self.__postings for p in phrases for w in p):
+            return []
+        if len(phrases) > 0:
+            keys = set.intersection(*(set(self.__postings[w])
+                                      for p in phrases for w in p))
+            keys = {k for k in keys
+                    if all(self.__has_phrase(k, p) for p in phrases)}
+        else:
+            keys = None
+        count = len(self.__texts)
+        average = self.__total / count if count else 0
+        scores = {}
+        for word in words:
+            postings = self.__postings.get(word, {})
+            idf = math.log(1 + (count - len(postings) + 0.5) /
+                           (len(postings) + 0.5))
+            for key, positions in postings.items():
+                if keys is not None and key not in keys:
+                    continue
+                tf = len(positions)
+                norm = 1 - self.b + self.b * self.__lengths[key] / average
+                scores[key] = scores.get(key, 0) + \
+                    idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        return sorted(((score, key) for key, score in scores.items()),
+                      key=lambda item: -item[0])
+
+
+kinds = {
+    "hash": HashIndex,
+    "sorted": SortedIndex,
+    "set": SetIndex,
+    "grid": GridIndex,
+    "text": TextIndex
+}
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+"""Defines the RWLock class, the reader/writer lock of FileStorage."""
+import contextlib
+import threading
+
+
+class RWLock:
+    """Represent a reader/writer lock.
+
+    Any number of threads can hold the read lock at once, while the write
+    lock is held by a single thread and excludes the readers. Threads
+    waiting for the write lock go before the threads asking for the read
+    lock afterwards, so that a steady flow of readers can not starve the
+    writers.
+
+    Both locks are reentrant: a thread holding the read lock can take it
+    again, and a thread holding the write lock can take either lock again.
+    A thread holding only the read lock can not take the write lock.
+    """
+
+    def __init__(self):
+        """Initialize a new RWLock, free."""
+        self.__cond = threading.Condition(threading.Lock())
+        self.__readers = {}
+        self.__writer = None
+        self.__writes = 0
+        self.__waiting = 0
+
+    def acquire_read(self):
+        """Block until the read lock is held by the current thread."""
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer != me and me not in self.__readers:
+                while self.__writer is not None or self.__waiting > 0:
+                    self.__cond.wait()
+            self.__readers[me] = self.__readers.get(me, 0) + 1
+
+    def release_read(self):
+        """Release the read lock held by the current thread.
+
+        Raises:
+            RuntimeError: If the current thread does not hold it.
+        """
+        me = threading.get_ident()
+        with self.__cond:
+            if me not in self.__readers:
+                raise RuntimeError("read lock not held")
+            self.__readers[me] -= 1
+            if self.__readers[me] == 0:
+                del self.__readers[me]
+                if len(self.__readers) == 0:
+                    self.__cond.notify_all()
+
+    def acquire_write(self):
+        """Block until the write lock is held by the current thread.
+
+        Raises:
+            RuntimeError: If the current thread holds only the read lock.
+        """
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer == me:
+                self.__writes += 1
+                return
+            if me in self.__readers:
+                raise RuntimeError("can not upgrade a read lock")
+            self.__waiting += 1
+            try:
+                while self.__writer is not None or len(self.__readers) > 0:
+                    self.__cond.wait()
+            finally:
+                self.__waiting -= 1
+            self.__writer = me
+            self.__writes = 1
+
+    def release_write(self):
+        """Release the write lock held by the current thread.
+
+        Raises:
+            RuntimeError: If the current thread does not hold it.
+        """
+        with self.__cond:
+            if self.__writer != threading.get_ident():
+                raise RuntimeError("write lock not held")
+            self.__writes -= 1
+            if self.__writes == 0:
+                self.__writer = None
+                self.__cond.notify_all()
+
+    @contextlib.contextmanager
+    def read(self):
+        """Hold the read lock for the duration of a with block."""
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def write(self):
+        """Hold the write lock for the duration of a with block."""
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
@@ -0,0 +1,388 @@
+#!/usr/bin/python3
+"""Defines the MmapStorage class."""
+import json
+import mmap
+import os
+import struct
+from os import getenv
+from models.base_model import BaseModel
+from models.base_model import classes
+from models.base_model import foreign_key
+from models.user import User
+from models.state import State
+from models.city import City
+from models.place import Place
+from models.amenity import Amenity
+from models.review import Review
+from models.engine.base_storage import BaseStorage
+from models.engine.index import HashIndex
+
+MAGIC = b"HBNM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIQ12x")
+SLOT = struct.Struct("<B7x64sQII")
+FREE = 0
+LIVE = 1
+
+
+class MmapStorage(BaseStorage):
+    """Represent a storage engine backed by a memory-mapped record file.
+
+    The file starts with a header and a table of fixed-size slots, one per
+    record, followed by the payload area. A slot holds the key of its
+    object and the offset, length and reserved size of its JSON payload.
+
+    Only the slot table is scanned when the file is opened; the payload of
+    an object is read straight from the mapping the first time it is looked
+    up. save() rewrites a changed object in place when its payload still
+    fits in the space reserved for it, and appends it otherwise. Processes
+    mapping the same file share its pages through the page cache.
+
+    The foreign keys of the records of a class are read once, the first
+    time children() asks for them, and kept in hash indexes updated on
+    save, so that children() only builds the instances it returns.
+
+    Attributes:
+        __path (str): The path of the record file.
+        __mm (mmap.mmap): The mapping of the record file.
+        __slots (dict): The slot index of each stored key.
+        __objects (dict): The instances built from the file.
+        __references (dict): The index of each (class name, foreign key)
+            pair asked for by children().
+    """
+
+    capacity = 256
+    reserve = 1 << 16
+
+    def __init__(self):
+        """Initialize a new MmapStorage.
+
+        The file path is read from HBNB_MMAP_PATH (default: file.mmap).
+        """
+        super().__init__()
+        self.__path = getenv("HBNB_MMAP_PATH", "file.mmap")
+        self.__file = None
+        self.__mm = None
+        self.__objects = {}
+        self.__dirty = set()
+        self.__deleted = set()
+        self.__open()
+
+    def __open(self):
+        """Map the record file, creating it if needed, and scan its slots.
+
+        Raises:
+            ValueError: If the file is not a record file.
+        """
+        self.__unmap()
+        if not os.path.isfile(self.__path) or \
+                os.path.getsize(self.__path) == 0:
+            self.__create(self.__path, self.capacity, [])
+        writable = os.access(self.__path, os.W_OK)
+        self.__file = open(self.__path, "r+b" if writable else "rb")
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self.__mm = mmap.mmap(self.__file.fileno(), 0, access=access)
+        magic, version, _, self.__capacity, self.__end = \
+            HEADER.unpack_from(self.__mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.__unmap()
+            raise ValueError("{} is not a record file".format(self.__path))
+        self.__slots = {}
+        self.__free = []
+        self.__references = {}
+        for i in range(self.__capacity):
+            status, key = SLOT.unpack_from(self.__mm, self.__slot(i))[:2]
+            if status == LIVE:
+                self.__slots[key.rstrip(b"\0").decode()] = i
+            else:
+                self.__free.append(i)
+        self.__free.reverse()
+
+    def __unmap(self):
+        """Close the mapping and the record file, if open."""
+        if self.__mm is not None:
+            self.__mm.close()
+            self.__file.close()
+            self.__mm = None
+            self.__file = None
+
+    @staticmethod
+    def __slot(i):
+        """Return the file offset of slot i."""
+        return HEADER.size + i * SLOT.size
+
+    @classmethod
+    def __create(cls, path, capacity, records):
+        """Write a record file holding records, then move it to path.
+
+        Args:
+            path (str): The path of the file.
+            capacity (int): The number of slots of the file.
+            records (list): The (key, payload) pairs to store.
+        """
+        end = HEADER.size + capacity * SLOT.size
+        table = []
+        for key, payload in records:
+            table.append(SLOT.pack(LIVE, key.encode(), end, len(payload),
+                                   len(payload)))
+            end += len(payload)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, capacity, end))
+            f.write(b"".join(table))
+            f.write(bytes((capacity - len(records)) * SLOT.size))
+            f.write(b"".join(payload for key, payload in records))
+            f.truncate(end + cls.reserve)
+        os.replace(tmp, path)
+
+    def __read(self, key):
+        """Return the dictionary stored under key in the file."""
+        off, length = SLOT.unpack_from(self.__mm,
+                                       self.__slot(self.__slots[key]))[2:4]
+        return json.loads(self.__mm[off:off + length])
+
+    def __build(self, key):
+        """Build the instance stored under key and keep it."""
+        o = self.__read(key)
+        cls_name = o.pop("__class__")
+        obj = classes[cls_name](**o)
+        self.__objects[key] = obj
+        return obj
+
+    def all(self, cls=None):
+        """Return the dictionary of every stored instance, or those of cls.
+
+        Args:
+            cls (type or str): The class, or class name, of the instances
+                to return. All of them are returned if None.
+        """
+        if cls is not None and type(cls) is not str:
+            cls = cls.__name__
+        prefix = "" if cls is None else cls + "."
+        with self._lock:
+            objs = {}
+            for key in self.__slots:
+                if not key.startswith(prefix) or key in self.__deleted:
+                    continue
+                objs[key] = self.__objects.get(key) or self.__build(key)
+            if cls is None:
+                return self.__objects
+            for key in self.__dirty:
+                if key.startswith(prefix):
+                    objs[key] = self.__objects[key]
+            return objs
+
+    def objects(self, cls=None):
+        """Return a copy of all(cls), safe to iterate from any thread.
+
+        Unlike all(), which returns the live dictionary when cls is None,
+        the copy is not changed by the objects created or deleted
+        meanwhile by other threads.
+
+        Args:
+            cls (type or str): The class, or class name, of the objects to
+                return. All of them are returned if None.
+        """
+        with self._lock:
+            return dict(self.all(cls))
+
+    def get(self, cls, id):
+        """Return the stored instance of cls with the given id.
+
+        Args:
+            cls (type or str): The class, or class name, of the instance.
+            id (str): The id of the instance.
+
+        Returns:
+            The instance, or None if it is not stored.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        key = "{}.{}".format(cls, id)
+        with self._lock:
+            if key in self.__objects:
+                return self.__objects[key]
+            if key in self.__deleted or key not in self.__slots:
+                return None
+            return self.__build(key)
+
+    def count(self, cls=None):
+        """Return the number of stored instances of cls (None for all).
+
+        Args:
+            cls (type or str): The class, or class name, to count.
+        """
+        if cls is not None and type(cls) is not str:
+            cls = cls.__name__
+        prefix = "" if cls is None else cls + "."
+        with self._lock:
+            keys = set(self.__slots) - self.__deleted
+            keys.update(k for k in self.__dirty if k in self.__objects)
+            return sum(1 for key in keys if key.startswith(prefix))
+
+    def children(self, parent, cls):
+        """Return the stored instances of cls referring to parent.
+
+        Args:
+            parent (BaseModel): The parent instance.
+            cls (type or str): The class, or class name, of the children.
+
+        Raises:
+            ValueError: If cls has no foreign key to the class of parent.
+        """
+        if type(cls) is not str:
+            cls = cls.__name__
+        attr = foreign_key(classes[cls], type(parent).__name__)
+        with self._lock:
+            keys = dict.fromkeys(self.__index(cls, attr).find(parent.id))
+            keys.update(dict.fromkeys(k for k in self.__dirty
+                                      if k.startswith(cls + ".")))
+            found = []
+            for key in keys:
+                obj = self.get(cls, key.split(".", 1)[1])
+                if obj is not None and getattr(obj, attr) == parent.id:
+                    found.append(obj)
+            return found
+
+    def __index(self, cls, attr):
+        """Return the index of the saved values of attr in the cls records.
+
+        The index is built from the file the first time it is asked for,
+        reading the payload of the records of cls only.
+        """
+        index = self.__references.get((cls, attr))
+        if index is None:
+            index = HashIndex(attr, getattr(classes[cls], attr, None))
+            for key in self.__slots:
+                if key.startswith(cls + "."):
+                    index.add(key, self.__read(key))
+            self.__references[(cls, attr)] = index
+        return index
+
+    def new(self, obj):
+        """Add obj to the storage, to be written on the next save.
+
+        Raises:
+            ValueError: If the key of obj does not fit in a slot.
+        """
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        if len(key.encode()) > 64:
+            raise ValueError("key too long: {}".format(key))
+        with self._lock:
+            self.__objects[key] = obj
+            self.__dirty.add(key)
+            self.__deleted.discard(key)
+
+    def touch(self, obj):
+        """Flag obj as changed since the last save, if it is stored."""
+        key = "{}.{}".format(obj.__class__.__name__, getattr(obj, "id", None))
+        with self._lock:
+            if self.__objects.get(key) is obj:
+                self.__dirty.add(key)
+
+    def delete(self, obj):
+        """Delete obj from the storage, if it is stored."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        with self._lock:
+            if self.__objects.get(key) is obj:
+                del self.__objects[key]
+                self.__dirty.discard(key)
+                self.__deleted.add(key)
+
+    def __grow(self, size):
+        """Extend the record file to at least size bytes and remap it."""
+        size = max(size, len(self.__mm) * 2)
+        self.__mm.close()
+        self.__file.truncate(size)
+        self.__mm = mmap.mmap(self.__file.fileno(), 0)
+
+    def __write(self, key, payload):
+        """Write the payload of key, in place if it fits its slot."""
+        if key in self.__slots:
+            i = self.__slots[key]
+            off, length, reserved = SLOT.unpack_from(self.__mm,
+                                                     self.__slot(i))[2:]
+            if len(payload) <= reserved:
+                self.__mm[off:off + len(payload)] = payload
+                SLOT.pack_into(self.__mm, self.__slot(i), LIVE, key.encode(),
+                               off, len(payload), reserved)
+                return
+        else:
+            i = self.__free.pop()
+            self.__slots[key] = i
+        reserved = len(payload) + len(payload) // 4
+        off = self.__end
+        if off + reserved > len(self.__mm):
+            self.__grow(off + reserved)
+        self.__mm[off:off + len(payload)] = payload
+        self.__end = off + reserved
+        SLOT.pack_into(self.__mm, self.__slot(i), LIVE, key.encode(),
+                       off, len(payload), reserved)
+        HEADER.pack_into(self.__mm, 0, MAGIC, VERSION, 0, self.__capacity,
+                         self.__end)
+
+    def flush(self):
+        """Write the changed records and free the deleted ones."""
+        with self._lock:
+            for key in self.__deleted:
+                i = self.__slots.pop(key, None)
+                if i is not None:
+                    self.__mm[self.__slot(i)] = FREE
+                    self.__free.append(i)
+            new = sum(1 for k in self.__dirty if k not in self.__slots)
+            if new > len(self.__free):
+                self.compact(max(self.__capacity * 2,
+                                 len(self.__slots) + new))
+            for key in self.__dirty:
+                obj = self.__objects.get(key)
+                if obj is not None:
+                    self.__write(key, json.dumps(obj.to_dict()).encode())
+            for (cls, attr), index in self.__references.items():
+                for key in self.__deleted:
+                    index.remove(key)
+                for key in self.__dirty:
+                    if key.startswith(cls + ".") and key in self.__objects:
+                        index.add(key, self.__objects[key])
+            self.__mm.flush()
+            self.__dirty = set()
+            self.__deleted = set()
+
+    def compact(self, capacity=None):
+        """Rewrite the record file without the space of freed records.
+
+        Args:
+            capacity (int): The number of slots of the new file, by
+                default the current one.
+        """
+        with self._lock:
+            records = []
+            for key, i in self.__slots.items():
+                off, length = SLOT.unpack_from(self.__mm,
+                                               self.__slot(i))[2:4]
+                records.append((key, self.__mm[off:off + length]))
+            self.__create(self.__path, capacity or self.__capacity, records)
+            self.__open()
+
+    def reload(self, *, classes=None):
+        """Map the record file again and drop the instances built so far.
+
+        Objects changed and not saved yet are kept.
+
+        Args:
+            classes (iterable): The classes or class names to reload.
+                All of them are reloaded if None.
+        """
+        if classes is not None:
+            classes = {c if type(c) is str else c.__name__ for c in classes}
+        with self._lock:
+            self.__open()
+            for key in list(self.__objects):
+                if key in self.__dirty:
+                    continue
+                if classes is None or key.split(".", 1)[0] in classes:
+                    del self.__objects[key]
+
+    def close(self):
+        """Close the mapping of the record file."""
+        with self._lock:
+            self.__unmap()
@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+"""Defines the Query class, the predicate query API of FileStorage.
+
+A query is built by chaining where(), order_by() and limit() on
+storage.query(cls); each call returns a new query. Conditions are
+keyword arguments naming an attribute, optionally followed by an
+operator suffix:
+
+    storage.query(Place).where(city_id=city.id, price_by_night__lt=100)
+
+Iterating over a query asks the storage for its candidate records, which
+it narrows down with its indexes, and builds an instance only for the
+records that match. Without order_by() the order of the results depends
+on the index used.
+
+A query can also be iterated with async for, in which case the results
+are looked up chunk_size at a time in the default executor of the running
+event loop, so that the loop is not blocked meanwhile.
+"""
+import asyncio
+import itertools
+import operator
+from models.base_model import classes
+from models.engine.index import value_of
+
+operators = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "in": lambda value, values: value in values,
+    "contains": lambda value, item: item in value,
+    "all": lambda value, items: all(item in value for item in items)
+}
+
+chunk_size = 100
+
+
+def comparable(a, b):
+    """Return True if a and b can be ordered with one another."""
+    try:
+        a < b
+    except TypeError:
+        return False
+    return True
+
+
+def parse_condition(name, value):
+    """Return the (attribute, operator, value) condition of a keyword.
+
+    Args:
+        name (str): The keyword, <attribute> or <attribute>__<operator>.
+        value (any): The value to compare the attribute with.
+
+    Raises:
+        ValueError: If the operator is not known.
+    """
+    attr, sep, op = name.rpartition("__")
+    if sep == "" or attr == "":
+        return name, "eq", value
+    if op not in operators:
+        raise ValueError("unknown operator {}".format(op))
+    return attr, op, value
+
+
+class Query:
+    """Represent a lazy query over the stored instances of a class.
+
+    Attributes:
+        storage (FileStorage): The storage to query.
+        cls (str): The name of the class to query.
+        conditions (tuple): The (attribute, operator, value) conditions.
+        predicates (tuple): The functions the instances must satisfy.
+        order (tuple): The (attribute, descending) sort keys.
+        count (int): The maximum number of results, None for no limit.
+    """
+
+    def __init__(self, storage, cls):
+        """Initialize a new Query returning every instance of cls.
+
+        Args:
+            storage (FileStorage): The storage to query.
+            cls (type or str): The class, or class name, to query.
+        """
+        self.storage = storage
+        self.cls = cls if type(cls) is str else cls.__name__
+        self.conditions = ()
+        self.predicates = ()
+        self.order = ()
+        self.count = None
+
+    def __copy(self, **changes):
+        """Return a copy of the query with changes applied."""
+        query = Query(self.storage, self.cls)
+        query.__dict__.update(self.__dict__)
+        query.__dict__.update(changes)
+        return query
+
+    def where(self, *predicates, **conditions):
+        """Return the query restricted to the matching instances.
+
+        Args:
+            *predicates (callable): Functions taking an instance and
+                returning True if it matches.
+            **conditions (dict): Attribute conditions; the attribute can be
+                suffixed with __ne, __lt, __le, __gt, __ge, __in,
+                __contains or __all (holds every item of a list).
+
+        Raises:
+            ValueError: If a condition has an unknown operator.
+        """
+        parsed = tuple(parse_condition(k, v) for k, v in conditions.items())
+        return self.__copy(conditions=self.conditions + parsed,
+                           predicates=self.predicates + predicates)
+
+    def order_by(self, *attrs):
+        """Return the query sorted by attrs, a leading - to sort descending.
+
+        When the values of an attribute can not all be compared, the
+        records whose value does not compare with the default of the
+        attribute, or with the first value set if it has none, such as an
+        unset value or a number among strings, come last in their order.
+
+        Args:
+            *attrs (str): The attributes to sort by, most significant first.
+        """
+        order = tuple((a.lstrip("-"), a.startswith("-")) for a in attrs)
+        return self.__copy(order=self.order + order)
+
+    def limit(self, count):
+        """Return the query stopped after count results."""
+        return self.__copy(count=count)
+
+    def first(self):
+        """Return the first result of the query, or None."""
+        return next(iter(self.limit(1)), None)
+
+    def __iter__(self):
+        """Yield the matching instances one at a time."""
+        model = classes.get(self.cls)
+
+        def value(record, attr):
+            return value_of(record, attr, getattr(model, attr, None))
+
+        def matches(record):
+            try:
+                return all(operators[op](value(record, attr), v)
+                           for attr, op, v in self.conditions)
+            except TypeError:
+                return False
+
+        records = (item for item in
+                   self.storage.candidates(self.cls, self.conditions)
+                   if matches(item[1]))
+        for attr, descending in reversed(self.order):
+            records = list(records)
+            try:
+                records = sorted(records, reverse=descending,
+                                 key=lambda item: value(item[1], attr))
+            except TypeError:
+                ref = getattr(model, attr, None)
+                if ref is None:
+                    ref = next((value(item[1], attr) for item in records
+                                if value(item[1], attr) is not None), None)
+                rest = [item for item in records
+                        if not comparable(value(item[1], attr), ref)]
+                records = sorted((item for item in records
+                                  if comparable(value(item[1], attr), ref)),
+                                 key=lambda item: value(item[1], attr),
+                                 reverse=descending) + rest
+        if self.count is not None and self.count <= 0:
+            return
+        found = 0
+        for key, record in records:
+            obj = self.storage.get(self.cls, key.split(".", 1)[1])
+            if obj is None or not all(p(obj) for p in self.predicates):
+                continue
+            yield obj
+            found += 1
+            if found == self.count:
+                return
+
+    async def __aiter__(self):
+        """Yield the matching instances, found in the default executor."""
+        loop = asyncio.get_running_loop()
+        results = iter(self)
+        while True:
+            chunk = await loop.run_in_executor(
+                None, lambda: list(itertools.islice(results, chunk_size)))
+            for obj in chunk:
+                yield obj
+            if len(chunk) < chunk_size:
+                return
@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """Defines the Place class."""
+import models
 from models.base_model import BaseModel
 
 
@@ -18,6 +19,18 @@ class Place(BaseModel):
         latitude (float): The latitude of the place.
         longitude (float): The longitude of the place.
         amenity_ids (list): A list of Amenity ids.
+        __foreign_keys__ (dict): The class name referred to by each
+            foreign key attribute, indexed by the storage.
+        __cascade__ (tuple): The classes whose instances referring to the
+            place are deleted with it.
+        __range_indexes__ (tuple): The attributes the storage keeps sorted
+            for range queries.
+        __set_indexes__ (tuple): The list attributes the storage indexes
+            by element.
+        __spatial_index__ (tuple): The coordinates the storage indexes for
+            near() and within().
+        __text_index__ (tuple): The attributes the storage indexes for
+            search().
     """
 
     city_id = ""
@@ -31,3 +44,16 @@ class Place(BaseModel):
     latitude = 0.0
     longitude = 0.0
     amenity_ids = []
+
+    __foreign_keys__ = {"city_id": "City", "user_id": "User"}
+    __cascade__ = ("Review",)
+    __range_indexes__ = ("price_by_night", "number_rooms",
+                         "number_bathrooms", "max_guest")
+    __set_indexes__ = ("amenity_ids",)
+    __spatial_index__ = ("latitude", "longitude")
+    __text_index__ = ("name", "description")
+
+    @property
+    def reviews(self):
+        """list: The stored reviews of the place."""
+        return models.storage.children(self, "Review")
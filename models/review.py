@@ -10,8 +10,15 @@ class Review(BaseModel):
         place_id (str): The Place id.
         user_id (str): The User id.
         text (str): The text of the review.
+        __foreign_keys__ (dict): The class name referred to by each
+            foreign key attribute, indexed by the storage.
+        __text_index__ (tuple): The attributes the storage indexes for
+            search().
     """
 
     place_id = ""
     user_id = ""
     text = ""
+
+    __foreign_keys__ = {"place_id": "Place", "user_id": "User"}
+    __text_index__ = ("text",)
@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """Defines the State class."""
+import models
 from models.base_model import BaseModel
 
 
@@ -8,6 +9,15 @@ class State(BaseModel):
 
     Attributes:
         name (str): The name of the state.
+        __cascade__ (tuple): The classes whose instances referring to the
+            state are deleted with it.
     """
 
     name = ""
+
+    __cascade__ = ("City",)
+
+    @property
+    def cities(self):
+        """list: The stored cities of the state."""
+        return models.storage.children(self, "City")
@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """Defines the User class."""
+import models
 from models.base_model import BaseModel
 
 
@@ -11,9 +12,25 @@ class User(BaseModel):
         password (str): The password of the user.
         first_name (str): The first name of the user.
         last_name (str): The last name of the user.
+        __indexes__ (tuple): The attributes indexed by the storage.
+        __cascade__ (tuple): The classes whose instances referring to the
+            user are deleted with it.
     """
 
     email = ""
     password = ""
     first_name = ""
     last_name = ""
+
+    __indexes__ = ("email",)
+    __cascade__ = ("Place", "Review")
+
+    @property
+    def places(self):
+        """list: The stored places of the user."""
+        return models.storage.children(self, "Place")
+
+    @property
+    def reviews(self):
+        """list: The stored reviews of the user."""
+        return models.storage.children(self, "Review")
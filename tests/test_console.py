@@ -16,6 +16,8 @@ import sys
 import unittest
 from models import storage
 from models.engine.file_storage import FileStorage
+from models.base_model import BaseModel
+from models.base_model import classes
 from console import HBNBCommand
 from io import StringIO
 from unittest.mock import patch
@@ -134,6 +136,10 @@ class TestHBNBCommand_create(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -198,6 +204,15 @@ class TestHBNBCommand_create(unittest.TestCase):
             testKey = "Review.{}".format(output.getvalue().strip())
             self.assertIn(testKey, storage.all().keys())
 
+    def test_create_registered_class(self):
+        class Host(BaseModel):
+            pass
+        self.addCleanup(classes.pop, "Host")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create Host"))
+            testKey = "Host.{}".format(output.getvalue().strip())
+            self.assertIs(Host, type(storage.all()[testKey]))
+
 
 class TestHBNBCommand_show(unittest.TestCase):
     """Unittests for testing show from the HBNB command interpreter"""
@@ -216,6 +231,10 @@ class TestHBNBCommand_show(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -469,6 +488,10 @@ class TestHBNBCommand_destroy(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -705,6 +728,24 @@ class TestHBNBCommand_destroy(unittest.TestCase):
             self.assertFalse(HBNBCommand().onecmd(command))
             self.assertNotIn(obj, storage.all())
 
+    def test_destroy_cascades(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create State")
+            HBNBCommand().onecmd("create City")
+            HBNBCommand().onecmd("create Place")
+            HBNBCommand().onecmd("create Review")
+            stId, cyId, plId, rvId = output.getvalue().split()
+        HBNBCommand().onecmd("update City {} state_id {}".format(cyId, stId))
+        HBNBCommand().onecmd("update Place {} city_id {}".format(plId, cyId))
+        HBNBCommand().onecmd(
+            "update Review {} place_id {}".format(rvId, plId))
+        with patch.object(storage, "save", wraps=storage.save) as save:
+            HBNBCommand().onecmd("State.destroy({})".format(stId))
+        self.assertEqual(1, save.call_count)
+        for key in ("State." + stId, "City." + cyId, "Place." + plId,
+                    "Review." + rvId):
+            self.assertNotIn(key, storage.all())
+
 
 class TestHBNBCommand_all(unittest.TestCase):
     """Unittests for testing all of the HBNB command interpreter."""
@@ -723,6 +764,10 @@ class TestHBNBCommand_all(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -869,6 +914,10 @@ class TestHBNBCommand_update(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -1332,6 +1381,60 @@ class TestHBNBCommand_update(unittest.TestCase):
         test_dict = storage.all()["Place.{}".format(tId)].__dict__
         self.assertEqual(7.2, test_dict["latitude"])
 
+    def test_update_dictionary_is_not_evaluated(self):
+        correct = "** value missing **"
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create BaseModel")
+            testId = output.getvalue().strip()
+        testCmd = "update BaseModel {} ".format(testId)
+        testCmd += "{'attr_name': __import__('os').getcwd()}"
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(testCmd))
+            self.assertEqual(correct, output.getvalue().strip())
+        test_dict = storage.all()["BaseModel.{}".format(testId)].__dict__
+        self.assertNotIn("attr_name", test_dict)
+
+    def test_update_relationship_property(self):
+        correct = "** attribute can't be set **"
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create State")
+            testId = output.getvalue().strip()
+        for testCmd in ["update State {} cities x".format(testId),
+                        "State.update(\"{}\", {{'name': 'a', 'cities': 1}})"
+                        .format(testId)]:
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(testCmd))
+                self.assertEqual(correct, output.getvalue().strip())
+        st = storage.all()["State.{}".format(testId)]
+        self.assertEqual([], st.cities)
+        self.assertNotIn("name", st.__dict__)
+
+    def test_update_dictionary_with_non_string_keys(self):
+        correct = "** attribute name must be a string **"
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create BaseModel")
+            testId = output.getvalue().strip()
+        for testCmd in ["update BaseModel {} {{1: 2}}".format(testId),
+                        "BaseModel.update(\"{}\", {{'a': 1, 2: 3}})"
+                        .format(testId)]:
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(testCmd))
+                self.assertEqual(correct, output.getvalue().strip())
+        test_dict = storage.all()["BaseModel.{}".format(testId)].__dict__
+        self.assertNotIn("a", test_dict)
+
+    def test_update_keeps_range_index(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create Place")
+            testId = output.getvalue().strip()
+        HBNBCommand().onecmd(
+            "update Place {} price_by_night 150".format(testId))
+        query = storage.query("Place").where(price_by_night__ge=100)
+        self.assertIn(testId, [pl.id for pl in query])
+        HBNBCommand().onecmd(
+            "update Place {} price_by_night 50".format(testId))
+        self.assertNotIn(testId, [pl.id for pl in query])
+
     def test_update_valid_dictionary_space_notation(self):
         with patch("sys.stdout", new=StringIO()) as output:
             HBNBCommand().onecmd("create BaseModel")
@@ -1518,6 +1621,10 @@ class TestHBNBCommand_count(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
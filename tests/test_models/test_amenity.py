@@ -100,6 +100,10 @@ class TestAmenity_save(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -5,6 +5,7 @@ Unittest classes:
     TestBaseModel_instantiation
     TestBaseModel_save
     TestBaseModel_to_dict
+    TestBaseModel_registry
 """
 import os
 import models
@@ -12,6 +13,7 @@ import unittest
 from datetime import datetime
 from time import sleep
 from models.base_model import BaseModel
+from models.base_model import classes
 
 
 class TestBaseModel_instantiation(unittest.TestCase):
@@ -102,6 +104,10 @@ class TestBaseModel_save(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -188,5 +194,27 @@ class TestBaseModel_to_dict(unittest.TestCase):
             bm.to_dict(None)
 
 
+class TestBaseModel_registry(unittest.TestCase):
+    """Unittests for testing the registry of model classes."""
+
+    def test_registered_models(self):
+        self.assertIs(BaseModel, classes["BaseModel"])
+        for name in ["User", "State", "City", "Place", "Amenity", "Review"]:
+            self.assertEqual(name, classes[name].__name__)
+            self.assertTrue(issubclass(classes[name], BaseModel))
+
+    def test_subclass_registers(self):
+        class Host(BaseModel):
+            pass
+        self.addCleanup(classes.pop, "Host")
+        self.assertIs(Host, classes["Host"])
+
+    def test_subclass_of_subclass_registers(self):
+        class Guest(classes["User"]):
+            pass
+        self.addCleanup(classes.pop, "Guest")
+        self.assertIs(Guest, classes["Guest"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -5,13 +5,16 @@ Unittest classes:
     TestCity_instantiation
     TestCity_save
     TestCity_to_dict
+    TestCity_relationships
 """
 import os
 import models
 import unittest
 from datetime import datetime
 from time import sleep
+from models.engine.file_storage import FileStorage
 from models.city import City
+from models.place import Place
 
 
 class TestCity_instantiation(unittest.TestCase):
@@ -105,6 +108,10 @@ class TestCity_save(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -191,5 +198,29 @@ class TestCity_to_dict(unittest.TestCase):
             cy.to_dict(None)
 
 
+class TestCity_relationships(unittest.TestCase):
+    """Unittests for testing the relationships of the City class."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_places(self):
+        cy = City()
+        other = City()
+        pl1 = Place()
+        pl1.city_id = cy.id
+        pl2 = Place()
+        pl2.city_id = cy.id
+        Place().city_id = other.id
+        self.assertEqual([pl1, pl2], cy.places)
+        pl2.city_id = other.id
+        self.assertEqual([pl1], cy.places)
+        models.storage.delete(pl1)
+        self.assertEqual([], cy.places)
+
+
 if __name__ == "__main__":
     unittest.main()
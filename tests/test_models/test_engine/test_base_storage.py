@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/base_storage.py.
+
+Unittest classes:
+    TestBaseStorage
+"""
+import asyncio
+import unittest
+from types import SimpleNamespace
+from models.engine.base_storage import BaseStorage
+from models.engine.db_storage import DBStorage
+from models.engine.file_storage import FileStorage
+from models.engine.mmap_storage import MmapStorage
+
+
+class Engine(BaseStorage):
+    """A storage engine counting its flushes and reloads."""
+
+    def __init__(self):
+        super().__init__()
+        self.deleted = []
+        self.flushes = 0
+        self.reloads = []
+
+    def children(self, parent, cls):
+        return []
+
+    def delete(self, obj):
+        self.deleted.append(obj)
+
+    def flush(self):
+        self.flushes += 1
+
+    def reload(self, *, classes=None):
+        self.reloads.append(classes)
+
+
+class TestBaseStorage(unittest.TestCase):
+    """Unittests for testing the BaseStorage mixin."""
+
+    def test_engines(self):
+        for engine in (FileStorage, DBStorage, MmapStorage):
+            self.assertTrue(issubclass(engine, BaseStorage))
+
+    def test_shared_methods(self):
+        for engine in (FileStorage, DBStorage, MmapStorage):
+            self.assertIs(BaseStorage.destroy, engine.destroy)
+            self.assertIs(BaseStorage.batch, engine.batch)
+        self.assertEqual(0, FileStorage()._batch_depth)
+
+    def test_save(self):
+        engine = Engine()
+        engine.save()
+        self.assertEqual(1, engine.flushes)
+
+    def test_batch(self):
+        engine = Engine()
+        with engine.batch():
+            engine.save()
+            with engine.batch():
+                engine.save()
+            self.assertEqual(0, engine.flushes)
+        self.assertEqual(1, engine.flushes)
+
+    def test_destroy(self):
+        engine = Engine()
+        obj = SimpleNamespace(id="1")
+        engine.destroy(obj)
+        self.assertEqual([obj], engine.deleted)
+        self.assertEqual(1, engine.flushes)
+
+    def test_asave_and_areload(self):
+        engine = Engine()
+        asyncio.run(engine.asave())
+        asyncio.run(engine.areload())
+        asyncio.run(engine.areload(classes=["User"]))
+        self.assertEqual(1, engine.flushes)
+        self.assertEqual([None, ["User"]], engine.reloads)
+
+
+if __name__ == "__main__":
+    unittest.main()
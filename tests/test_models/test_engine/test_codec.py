@@ -0,0 +1,185 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/codec.py.
+
+Unittest classes:
+    TestCodec_get_codec
+    TestCodec_roundtrip
+    TestCodec_compression
+    TestCodec_json_stream
+"""
+import gzip
+import io
+import json
+import os
+import unittest
+from unittest.mock import patch
+from models.engine.codec import get_codec
+from models.engine.codec import get_compression
+from models.engine.codec import open_file
+from models.engine.codec import JSONCodec
+from models.engine.codec import MarshalCodec
+from models.engine.codec import PickleCodec
+
+
+class TestCodec_get_codec(unittest.TestCase):
+    """Unittests for testing codec selection."""
+
+    def test_default_is_json(self):
+        self.assertEqual(JSONCodec, type(get_codec()))
+
+    def test_by_name(self):
+        self.assertEqual(MarshalCodec, type(get_codec("marshal")))
+        self.assertEqual(PickleCodec, type(get_codec("pickle")))
+
+    def test_by_extension(self):
+        self.assertEqual(JSONCodec, type(get_codec(path="file.json")))
+        self.assertEqual(MarshalCodec, type(get_codec(path="file.bin")))
+        self.assertEqual(MarshalCodec, type(get_codec(path="file.marshal")))
+        self.assertEqual(PickleCodec, type(get_codec(path="file.pkl")))
+
+    def test_unknown_extension_is_json(self):
+        self.assertEqual(JSONCodec, type(get_codec(path="file.txt")))
+
+    def test_name_wins_over_extension(self):
+        codec = get_codec("pickle", "file.json")
+        self.assertEqual(PickleCodec, type(codec))
+
+    def test_unknown_name(self):
+        with self.assertRaises(ValueError):
+            get_codec("yaml")
+
+    def test_compressed_extension(self):
+        self.assertEqual(JSONCodec, type(get_codec(path="file.json.gz")))
+        self.assertEqual(MarshalCodec,
+                         type(get_codec(path="file.marshal.xz")))
+
+
+class TestCodec_roundtrip(unittest.TestCase):
+    """Unittests for testing snapshots and journals of every codec."""
+
+    o = {"id": "1234", "name": "California", "__class__": "State"}
+
+    def test_snapshot(self):
+        for name in ["json", "marshal", "pickle"]:
+            codec = get_codec(name)
+            f = io.BytesIO()
+            codec.write_snapshot(f, [("State.1234", codec.encode(self.o)),
+                                     ("State.5678", codec.encode({}))])
+            f.seek(0)
+            self.assertEqual([("State.1234", self.o), ("State.5678", {})],
+                             list(codec.read_snapshot(f)))
+
+    def test_records(self):
+        for name in ["json", "marshal", "pickle"]:
+            codec = get_codec(name)
+            f = io.BytesIO(codec.record("put", "State.1234",
+                                        codec.encode(self.o)) +
+                           codec.record("delete", "State.1234"))
+            self.assertEqual([("put", "State.1234", self.o),
+                              ("delete", "State.1234", None)],
+                             list(codec.read_records(f)))
+
+    def test_torn_record(self):
+        for name in ["json", "marshal", "pickle"]:
+            codec = get_codec(name)
+            record = codec.record("put", "State.1234", codec.encode(self.o))
+            f = io.BytesIO(record + record[:-3])
+            self.assertEqual(1, len(list(codec.read_records(f))))
+            self.assertEqual(len(record), f.tell())
+
+    def test_json_snapshot_is_json(self):
+        codec = get_codec("json")
+        f = io.BytesIO()
+        codec.write_snapshot(f, [("State.1234", codec.encode(self.o))])
+        self.assertEqual(b'{"State.1234": {"id": "1234", "name": '
+                         b'"California", "__class__": "State"}}',
+                         f.getvalue())
+
+
+class TestCodec_compression(unittest.TestCase):
+    """Unittests for testing compressed files."""
+
+    @classmethod
+    def tearDown(self):
+        for path in ["test.gz", "test.bz2", "test.xz"]:
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+
+    def test_get_compression_by_name(self):
+        self.assertEqual("gzip", get_compression("gzip"))
+        self.assertEqual("lzma", get_compression("lzma", "file.json.gz"))
+
+    def test_get_compression_by_extension(self):
+        self.assertEqual("gzip", get_compression(path="file.json.gz"))
+        self.assertEqual("bz2", get_compression(path="file.json.bz2"))
+        self.assertEqual("lzma", get_compression(path="file.json.xz"))
+        self.assertIsNone(get_compression(path="file.json"))
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            get_compression("zip")
+
+    def test_roundtrip(self):
+        codec = get_codec("json")
+        o = {"text": "Great place " * 100}
+        for compression, path in [("gzip", "test.gz"), ("bz2", "test.bz2"),
+                                  ("lzma", "test.xz")]:
+            with open_file(path, "wb", compression, 9) as f:
+                codec.write_snapshot(f, [("Review.1", codec.encode(o))])
+            self.assertLess(os.path.getsize(path), len(o["text"]))
+            with open_file(path, "rb", compression) as f:
+                self.assertEqual([("Review.1", o)],
+                                 list(codec.read_snapshot(f)))
+
+    def test_gzip_is_standard(self):
+        with open_file("test.gz", "wb", "gzip") as f:
+            f.write(b"{}")
+        with gzip.open("test.gz", "rb") as f:
+            self.assertEqual(b"{}", f.read())
+
+
+class TestCodec_json_stream(unittest.TestCase):
+    """Unittests for testing the chunked reading of JSON snapshots."""
+
+    objdict = {
+        "State.1": {"id": "1", "name": "S\u00e3o Paulo \u2603"},
+        "Place.2": {"id": "2", "number_rooms": 12345, "latitude": 1.5},
+        "Review.3": {"id": "3", "text": "x" * 50, "tags": [1, [2, {}]]}
+    }
+
+    def read(self, text):
+        f = io.BytesIO(text.encode())
+        return list(get_codec("json").read_snapshot(f))
+
+    def test_small_chunks(self):
+        text = json.dumps(self.objdict)
+        for size in [1, 2, 3, 7, 64]:
+            with patch("models.engine.codec.CHUNK_SIZE", size):
+                self.assertEqual(list(self.objdict.items()), self.read(text))
+
+    def test_indented(self):
+        text = json.dumps(self.objdict, indent=4)
+        with patch("models.engine.codec.CHUNK_SIZE", 5):
+            self.assertEqual(list(self.objdict.items()), self.read(text))
+
+    def test_empty(self):
+        self.assertEqual([], self.read("{}"))
+        self.assertEqual([], self.read(" { \n } "))
+
+    def test_yields_one_record_at_a_time(self):
+        f = io.BytesIO(json.dumps(self.objdict).encode())
+        with patch("models.engine.codec.CHUNK_SIZE", 8):
+            records = get_codec("json").read_snapshot(f)
+            self.assertEqual("State.1", next(records)[0])
+            self.assertLess(f.tell(), len(f.getvalue()))
+
+    def test_invalid(self):
+        for text in ["", "[]", '{"a": 1', '{"a" 1}', '{"a": 1 "b": 2}']:
+            with self.assertRaises(ValueError):
+                self.read(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,309 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/db_storage.py.
+
+Unittest classes:
+    TestDBStorage_instantiation
+    TestDBStorage_methods
+    TestDBStorage_rows
+"""
+import asyncio
+import os
+import models
+import sqlite3
+import unittest
+from unittest.mock import patch
+from models.base_model import BaseModel
+from models.engine.db_storage import DBStorage
+from models.user import User
+from models.state import State
+from models.place import Place
+from models.review import Review
+
+
+class TestDBStorage_instantiation(unittest.TestCase):
+    """Unittests for testing instantiation of the DBStorage class."""
+
+    def tearDown(self):
+        try:
+            os.remove("test.db")
+        except IOError:
+            pass
+
+    def test_DBStorage_instantiation_no_args(self):
+        with patch.dict(os.environ, {"HBNB_DB_PATH": "test.db"}):
+            storage = DBStorage()
+        self.assertEqual(type(storage), DBStorage)
+        storage.close()
+
+    def test_DBStorage_instantiation_with_arg(self):
+        with self.assertRaises(TypeError):
+            DBStorage(None)
+
+    def test_creates_database(self):
+        with patch.dict(os.environ, {"HBNB_DB_PATH": "test.db"}):
+            DBStorage().close()
+        self.assertTrue(os.path.isfile("test.db"))
+
+
+class TestDBStorage_methods(unittest.TestCase):
+    """Unittests for testing methods of the DBStorage class."""
+
+    def setUp(self):
+        with patch.dict(os.environ, {"HBNB_DB_PATH": "test.db"}):
+            self.storage = DBStorage()
+        self.patcher = patch("models.storage", self.storage)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.storage.close()
+        try:
+            os.remove("test.db")
+        except IOError:
+            pass
+
+    def reopen(self):
+        """Return a new DBStorage on the test database."""
+        with patch.dict(os.environ, {"HBNB_DB_PATH": "test.db"}):
+            storage = DBStorage()
+        self.addCleanup(storage.close)
+        return storage
+
+    def test_all(self):
+        self.assertEqual(dict, type(self.storage.all()))
+
+    def test_objects(self):
+        us = User()
+        objs = self.storage.objects()
+        self.assertIsNot(self.storage.all(), objs)
+        self.assertEqual(self.storage.all(), objs)
+        st = State()
+        self.assertNotIn("State." + st.id, objs)
+        self.assertEqual({"User." + us.id: us}, self.storage.objects(User))
+
+    def test_all_with_cls(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        new = State()
+        self.assertEqual({"State." + st.id: st, "State." + new.id: new},
+                         self.storage.all(State))
+        storage = self.reopen()
+        self.assertEqual(["State." + st.id], list(storage.all("State")))
+        self.assertNotIn("User." + us.id, storage._DBStorage__objects)
+
+    def test_new(self):
+        bm = BaseModel()
+        us = User()
+        self.assertIn("BaseModel." + bm.id, self.storage.all().keys())
+        self.assertIn(us, self.storage.all().values())
+
+    def test_new_with_None(self):
+        with self.assertRaises(AttributeError):
+            self.storage.new(None)
+
+    def test_save_and_reload(self):
+        bm = BaseModel()
+        st = State()
+        st.name = "California"
+        self.storage.save()
+        storage = self.reopen()
+        storage.reload()
+        objs = storage.all()
+        self.assertIn("BaseModel." + bm.id, objs)
+        self.assertEqual("California", objs["State." + st.id].name)
+        self.assertEqual(st.to_dict(), objs["State." + st.id].to_dict())
+
+    def test_asave_and_areload(self):
+        st = State()
+        st.name = "California"
+        asyncio.run(self.storage.asave())
+        storage = self.reopen()
+        self.assertEqual("California", storage.get(State, st.id).name)
+        st.name = "Nevada"
+        asyncio.run(self.storage.asave())
+        asyncio.run(storage.areload(classes=[State]))
+        self.assertEqual("Nevada", storage.get(State, st.id).name)
+
+    def test_unsaved_changes_are_not_written(self):
+        st = State()
+        self.storage.save()
+        st.name = "Nevada"
+        storage = self.reopen()
+        self.assertEqual("", storage.get(State, st.id).name)
+
+    def test_reload_drops_clean_instances(self):
+        st = State()
+        self.storage.save()
+        us = User()
+        self.storage.reload()
+        self.assertIsNot(st, self.storage.get(State, st.id))
+        self.assertIs(us, self.storage.get(User, us.id))
+
+    def test_reload_classes(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        self.storage.reload(classes=["State"])
+        self.assertIsNot(st, self.storage.get(State, st.id))
+        self.assertIs(us, self.storage.get(User, us.id))
+
+    def test_get(self):
+        st = State()
+        self.storage.save()
+        self.assertIs(st, self.storage.get(State, st.id))
+        self.assertIs(st, self.storage.get("State", st.id))
+        storage = self.reopen()
+        self.assertEqual(st.id, storage.get("State", st.id).id)
+        self.assertIs(storage.get("State", st.id),
+                      storage.get("State", st.id))
+        self.assertIsNone(storage.get("User", st.id))
+
+    def test_count(self):
+        State()
+        State()
+        User()
+        self.assertEqual(3, self.storage.count())
+        self.assertEqual(2, self.storage.count(State))
+        self.storage.save()
+        self.assertEqual(2, self.reopen().count("State"))
+        self.assertEqual(0, self.storage.count(Place))
+
+    def test_delete(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        self.storage.delete(st)
+        self.assertIsNone(self.storage.get(State, st.id))
+        self.assertNotIn("State." + st.id, self.storage.all())
+        self.assertEqual(1, self.storage.count())
+        self.storage.save()
+        storage = self.reopen()
+        self.assertIsNone(storage.get(State, st.id))
+        self.assertIsNotNone(storage.get(User, us.id))
+
+    def test_delete_unsaved(self):
+        st = State()
+        self.storage.delete(st)
+        self.storage.save()
+        self.assertEqual(0, self.reopen().count())
+
+    def test_batch(self):
+        with self.storage.batch():
+            rv = Review()
+            rv.text = "Great"
+            rv.save()
+            self.assertEqual(0, self.reopen().count())
+        self.assertEqual("Great", self.reopen().get(Review, rv.id).text)
+
+    def test_children(self):
+        pl = Place()
+        rv1 = Review()
+        rv1.place_id = pl.id
+        rv2 = Review()
+        rv2.place_id = pl.id
+        Review()
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual(sorted([rv1.id, rv2.id]), sorted(
+            rv.id for rv in storage.children(pl, Review)))
+        self.assertEqual(2, len(storage._DBStorage__objects))
+
+    def test_children_unsaved(self):
+        pl = Place()
+        rv1 = Review()
+        rv1.place_id = pl.id
+        rv2 = Review()
+        rv2.place_id = pl.id
+        self.storage.save()
+        rv1.place_id = "other"
+        rv3 = Review()
+        rv3.place_id = pl.id
+        self.storage.delete(rv2)
+        self.assertEqual([rv3], self.storage.children(pl, "Review"))
+        with self.assertRaises(ValueError):
+            self.storage.children(State(), Review)
+
+    def test_destroy(self):
+        pl = Place()
+        rv = Review()
+        rv.place_id = pl.id
+        us = User()
+        self.storage.save()
+        with patch.object(DBStorage, "flush",
+                          wraps=self.storage.flush) as flush:
+            self.storage.destroy(pl)
+        self.assertEqual(1, flush.call_count)
+        storage = self.reopen()
+        self.assertEqual(["User." + us.id], list(storage.all()))
+
+    def test_base_model_save(self):
+        bm = BaseModel()
+        bm.save()
+        self.assertIsNotNone(self.reopen().get(BaseModel, bm.id))
+
+
+class TestDBStorage_rows(unittest.TestCase):
+    """Unittests for testing the rows written by DBStorage."""
+
+    def setUp(self):
+        with patch.dict(os.environ, {"HBNB_DB_PATH": "test.db"}):
+            self.storage = DBStorage()
+        self.patcher = patch("models.storage", self.storage)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.storage.close()
+        try:
+            os.remove("test.db")
+        except IOError:
+            pass
+
+    def rows(self):
+        """Return the (key, cls) rows of the test database."""
+        conn = sqlite3.connect("test.db")
+        try:
+            return sorted(conn.execute("SELECT key, cls FROM objects"))
+        finally:
+            conn.close()
+
+    def test_rows(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        self.assertEqual(sorted([("State." + st.id, "State"),
+                                 ("User." + us.id, "User")]), self.rows())
+
+    def test_save_writes_changed_rows_only(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        st.name = "Texas"
+        with patch.object(User, "to_dict") as to_dict:
+            self.storage.save()
+            to_dict.assert_not_called()
+
+    def test_class_index(self):
+        conn = sqlite3.connect("test.db")
+        try:
+            plan = " ".join(str(row) for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM objects "
+                "WHERE cls = 'State'"))
+        finally:
+            conn.close()
+        self.assertIn("objects_cls", plan)
+
+    def test_foreign_key_index(self):
+        conn = sqlite3.connect("test.db")
+        try:
+            plan = " ".join(str(row) for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT key FROM objects WHERE "
+                "cls = 'City' AND json_extract(data, '$.state_id') = '1'"))
+        finally:
+            conn.close()
+        self.assertIn("objects_state_id", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
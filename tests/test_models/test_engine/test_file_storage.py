@@ -4,13 +4,38 @@
 Unittest classes:
     TestFileStorage_instantiation
     TestFileStorage_methods
+    TestFileStorage_dirty_tracking
+    TestFileStorage_journal
+    TestFileStorage_write_behind
+    TestFileStorage_batch
+    TestFileStorage_shards
+    TestFileStorage_lazy
+    TestFileStorage_codecs
+    TestFileStorage_compression
+    TestFileStorage_refresh
+    TestFileStorage_indexes
+    TestFileStorage_spatial
+    TestFileStorage_search
+    TestFileStorage_children
+    TestFileStorage_locking
+    TestFileStorage_threads
+    TestFileStorage_async
 """
+import asyncio
 import os
+import gzip
 import json
 import models
+import shutil
+import subprocess
+import sys
+import threading
 import unittest
 from datetime import datetime
+from time import sleep
+from unittest.mock import patch
 from models.base_model import BaseModel
+from models.engine.codec import JSONCodec
 from models.engine.file_storage import FileStorage
 from models.user import User
 from models.state import State
@@ -20,6 +45,11 @@ from models.amenity import Amenity
 from models.review import Review
 
 
+def files(path):
+    """Return the names of the files in path, except the lock files."""
+    return [name for name in os.listdir(path) if not name.endswith(".lock")]
+
+
 class TestFileStorage_instantiation(unittest.TestCase):
     """Unittests for testing instantiation of the FileStorage class."""
 
@@ -56,6 +86,10 @@ class TestFileStorage_methods(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -65,9 +99,81 @@ class TestFileStorage_methods(unittest.TestCase):
     def test_all(self):
         self.assertEqual(dict, type(models.storage.all()))
 
-    def test_all_with_arg(self):
-        with self.assertRaises(TypeError):
-            models.storage.all(None)
+    def test_all_with_None(self):
+        self.assertIs(models.storage.all(), models.storage.all(None))
+
+    def test_all_with_cls(self):
+        us = User()
+        st = State()
+        self.assertEqual({"User." + us.id: us}, models.storage.all(User))
+        self.assertEqual({"State." + st.id: st}, models.storage.all("State"))
+        self.assertEqual({}, models.storage.all("MyModel"))
+
+    def test_objects(self):
+        us = User()
+        objs = models.storage.objects()
+        self.assertIsNot(models.storage.all(), objs)
+        self.assertEqual(models.storage.all(), objs)
+        st = State()
+        self.assertNotIn("State." + st.id, objs)
+        self.assertEqual({"User." + us.id: us}, models.storage.objects(User))
+
+    def test_del_from_all(self):
+        us = User()
+        us.email = "a@b.c"
+        st = State()
+        models.storage.save()
+        del models.storage.all()["User." + us.id]
+        self.assertEqual({}, models.storage.all(User))
+        self.assertEqual(0, models.storage.count(User))
+        self.assertEqual([], models.storage.lookup(User, email="a@b.c"))
+        models.storage.save()
+        with open("file.json", "r") as f:
+            self.assertEqual(["State." + st.id], list(json.load(f)))
+
+    def test_del_from_all_in_journal_mode(self):
+        for name in ("file.json.journal", "file.json.journal.old"):
+            self.addCleanup(lambda p: os.path.exists(p) and os.remove(p),
+                            name)
+        self.addCleanup(setattr, models.storage, "journal", False)
+        models.storage.journal = True
+        us = User()
+        models.storage.save()
+        del models.storage.all()["User." + us.id]
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(0, models.storage.count(User))
+
+    def test_insert_into_all(self):
+        us = User(id="123", created_at=datetime.today().isoformat(),
+                  updated_at=datetime.today().isoformat())
+        models.storage.all()["User.123"] = us
+        self.assertEqual({"User.123": us}, models.storage.all(User))
+        self.assertEqual(1, models.storage.count(User))
+        models.storage.save()
+        with open("file.json", "r") as f:
+            self.assertIn("User.123", json.load(f))
+
+    def test_all_with_cls_after_delete(self):
+        us = User()
+        models.storage.delete(us)
+        self.assertEqual({}, models.storage.all(User))
+        self.assertEqual(0, models.storage.count(User))
+
+    def test_all_with_cls_after_reload(self):
+        us = User()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(["User." + us.id],
+                         list(models.storage.all(User).keys()))
+        self.assertEqual(1, models.storage.count(User))
+
+    def test_all_with_cls_after_objects_replaced(self):
+        us = User()
+        FileStorage._FileStorage__objects = {"User." + us.id: us}
+        self.assertEqual({"User." + us.id: us}, models.storage.all(User))
 
     def test_new(self):
         bm = BaseModel()
@@ -164,6 +270,1655 @@ class TestFileStorage_methods(unittest.TestCase):
         with self.assertRaises(TypeError):
             models.storage.reload(None)
 
+    def test_get(self):
+        us = User()
+        self.assertIs(us, models.storage.get(User, us.id))
+        self.assertIs(us, models.storage.get("User", us.id))
+
+    def test_get_missing(self):
+        self.assertIsNone(models.storage.get(User, "1234"))
+        self.assertIsNone(models.storage.get("MyModel", "1234"))
+
+    def test_count(self):
+        User()
+        User()
+        State()
+        self.assertEqual(2, models.storage.count(User))
+        self.assertEqual(1, models.storage.count("State"))
+        self.assertEqual(0, models.storage.count("MyModel"))
+        self.assertEqual(len(models.storage.all()), models.storage.count())
+
+
+class TestFileStorage_dirty_tracking(unittest.TestCase):
+    """Unittests for testing change tracking of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_new_marks_dirty(self):
+        us = User()
+        self.assertIn("User." + us.id, models.storage._FileStorage__dirty)
+
+    def test_save_clears_dirty(self):
+        User()
+        models.storage.save()
+        self.assertEqual(set(), models.storage._FileStorage__dirty)
+
+    def test_attribute_change_marks_dirty(self):
+        us = User()
+        models.storage.save()
+        us.first_name = "Betty"
+        self.assertIn("User." + us.id, models.storage._FileStorage__dirty)
+
+    def test_unstored_object_not_marked(self):
+        us = User(id="123", created_at=datetime.today().isoformat(),
+                  updated_at=datetime.today().isoformat())
+        us.first_name = "Betty"
+        self.assertNotIn("User.123", models.storage._FileStorage__dirty)
+
+    def test_save_reuses_clean_fragments(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        us.first_name = "Betty"
+        with patch.object(BaseModel, "to_dict",
+                          autospec=True,
+                          side_effect=BaseModel.to_dict) as to_dict:
+            models.storage.save()
+        self.assertEqual(1, to_dict.call_count)
+        self.assertIs(us, to_dict.call_args[0][0])
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+        self.assertIn("State." + st.id, objdict)
+
+    def test_save_in_place_changes(self):
+        pl = Place()
+        pl.amenity_ids = []
+        pl.rules = {}
+        models.storage.save()
+        pl = models.storage.get(Place, pl.id)
+        pl.amenity_ids.append("a1")
+        pl.rules["pets"] = False
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual(["a1"], objdict["Place." + pl.id]["amenity_ids"])
+        self.assertEqual({"pets": False}, objdict["Place." + pl.id]["rules"])
+
+    def test_save_in_place_changes_keeps_no_copies(self):
+        pl = Place()
+        pl.amenity_ids = ["a1"]
+        us = User()
+        models.storage.save()
+        lent = models.storage._FileStorage__lent
+        self.assertEqual({}, lent)
+        models.storage.reload()
+        self.assertEqual({}, lent)
+        models.storage.get(User, us.id)
+        self.assertEqual({}, lent)
+        models.storage.get(Place, pl.id)
+        self.assertEqual({"Place." + pl.id: {"amenity_ids": ["a1"]}}, lent)
+        models.storage.save()
+        self.assertEqual({}, models.storage._FileStorage__lent)
+
+    def test_save_in_place_changes_after_reload(self):
+        os.makedirs("test_inplace", exist_ok=True)
+        self.addCleanup(shutil.rmtree, "test_inplace", ignore_errors=True)
+        models.storage.shard_dir = "test_inplace"
+        self.addCleanup(setattr, models.storage, "shard_dir", None)
+        pl = Place()
+        pl.amenity_ids = ["a1"]
+        models.storage.save()
+        models.storage.reload()
+        pl = models.storage.get(Place, pl.id)
+        pl.amenity_ids.append("a2")
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(["a1", "a2"],
+                         models.storage.get(Place, pl.id).amenity_ids)
+
+    def test_delete(self):
+        us = User()
+        models.storage.delete(us)
+        self.assertNotIn("User." + us.id, models.storage.all())
+        self.assertIn("User." + us.id, models.storage._FileStorage__deleted)
+
+    def test_delete_removed_from_file(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        models.storage.delete(us)
+        models.storage.save()
+        with open("file.json", "r") as f:
+            save_text = f.read()
+        self.assertNotIn("User." + us.id, save_text)
+        self.assertIn("State." + st.id, save_text)
+
+    def test_save_after_objects_replaced(self):
+        User()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        st = State()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual(["State." + st.id], list(objdict.keys()))
+
+
+class TestFileStorage_journal(unittest.TestCase):
+    """Unittests for testing journal mode of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        models.storage.journal = True
+
+    @classmethod
+    def tearDown(self):
+        models.storage.journal = False
+        models.storage.journal_limit = 1 << 20
+        models.storage._FileStorage__wait_compaction()
+        for path in ["file.json", "file.json.journal",
+                     "file.json.journal.old", "file.json.lock"]:
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_save_appends_to_journal(self):
+        us = User()
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.json"))
+        with open("file.json.journal", "r") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(1, len(records))
+        self.assertEqual("put", records[0]["op"])
+        self.assertEqual("User." + us.id, records[0]["key"])
+
+    def test_save_appends_only_changes(self):
+        us = User()
+        State()
+        models.storage.save()
+        us.first_name = "Betty"
+        models.storage.save()
+        with open("file.json.journal", "r") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(3, len(records))
+        self.assertEqual("User." + us.id, records[2]["key"])
+        self.assertEqual("Betty", records[2]["value"]["first_name"])
+
+    def test_delete_appends_record(self):
+        us = User()
+        models.storage.save()
+        models.storage.delete(us)
+        models.storage.save()
+        with open("file.json.journal", "r") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual("delete", records[-1]["op"])
+        self.assertEqual("User." + us.id, records[-1]["key"])
+
+    def test_reload_replays_journal(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        us.first_name = "Betty"
+        models.storage.delete(st)
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        objs = models.storage.all()
+        self.assertEqual("Betty", objs["User." + us.id].first_name)
+        self.assertNotIn("State." + st.id, objs)
+
+    def test_reload_ignores_torn_record(self):
+        us = User()
+        models.storage.save()
+        with open("file.json.journal", "a") as f:
+            f.write('{"op": "put", "key": "User.1", "val')
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertIn("User." + us.id, models.storage.all())
+        self.assertNotIn("User.1", models.storage.all())
+
+    def test_compaction_past_limit(self):
+        models.storage.journal_limit = 1
+        us = User()
+        models.storage.save()
+        models.storage._FileStorage__wait_compaction()
+        self.assertFalse(os.path.exists("file.json.journal"))
+        self.assertFalse(os.path.exists("file.json.journal.old"))
+        with open("file.json", "r") as f:
+            self.assertIn("User." + us.id, json.load(f))
+
+    def test_compaction_folds_records_on_disk(self):
+        us = User()
+        models.storage.save()
+        rv = Review(id="1234", created_at=us.created_at.isoformat(),
+                    updated_at=us.updated_at.isoformat())
+        record = {"op": "put", "key": "Review.1234", "value": rv.to_dict()}
+        with open("file.json.journal", "a") as f:
+            f.write(json.dumps(record) + "\n")
+        models.storage.journal_limit = 1
+        us.first_name = "Betty"
+        models.storage.save()
+        models.storage._FileStorage__wait_compaction()
+        self.assertFalse(os.path.exists("file.json.journal.old"))
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+        self.assertIn("Review.1234", objdict)
+        self.assertIsNone(models.storage.get(Review, "1234"))
+        self.assertTrue(models.storage.refresh())
+        self.assertEqual(Review, type(models.storage.get(Review, "1234")))
+
+    def test_save_does_not_wait_for_compaction(self):
+        release = threading.Event()
+        write_snapshot = JSONCodec.write_snapshot
+
+        def blocked(codec, f, entries):
+            release.wait(5)
+            write_snapshot(codec, f, entries)
+        models.storage.journal_limit = 1
+        us = User()
+        with patch.object(JSONCodec, "write_snapshot", blocked):
+            models.storage.save()
+            us.first_name = "Betty"
+            saver = threading.Thread(target=models.storage.save)
+            saver.start()
+            saver.join(2)
+            self.assertFalse(saver.is_alive())
+            release.set()
+            models.storage._FileStorage__wait_compaction()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual("Betty",
+                         models.storage.get(User, us.id).first_name)
+
+    def test_compact(self):
+        us = User()
+        models.storage.save()
+        us.first_name = "Betty"
+        models.storage.save()
+        models.storage.compact()
+        self.assertFalse(os.path.exists("file.json.journal"))
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+
+    def test_full_save_drops_journal(self):
+        User()
+        models.storage.save()
+        models.storage.journal = False
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.json.journal"))
+
+
+class TestFileStorage_write_behind(unittest.TestCase):
+    """Unittests for testing write-behind mode of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        models.storage.write_behind = True
+        models.storage.flush_interval = 0.05
+
+    @classmethod
+    def tearDown(self):
+        models.storage.write_behind = False
+        models.storage.flush_interval = 1.0
+        models.storage.flush()
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_save_is_deferred(self):
+        models.storage.flush_interval = 10
+        User()
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.json"))
+
+    def test_flush(self):
+        models.storage.flush_interval = 10
+        us = User()
+        models.storage.save()
+        models.storage.flush()
+        with open("file.json", "r") as f:
+            self.assertIn("User." + us.id, f.read())
+
+    def test_flush_thread_writes(self):
+        us = User()
+        us.save()
+        sleep(0.3)
+        with open("file.json", "r") as f:
+            self.assertIn("User." + us.id, f.read())
+
+    def test_saves_are_coalesced(self):
+        with patch.object(models.storage, "flush",
+                          wraps=models.storage.flush) as flush:
+            for i in range(20):
+                User().save()
+            sleep(0.3)
+        self.assertEqual(1, flush.call_count)
+
+    def test_flush_with_arg(self):
+        with self.assertRaises(TypeError):
+            models.storage.flush(None)
+
+
+class TestFileStorage_batch(unittest.TestCase):
+    """Unittests for testing batch blocks of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_batch_defers_saves(self):
+        with models.storage.batch():
+            User().save()
+            self.assertFalse(os.path.exists("file.json"))
+        self.assertTrue(os.path.exists("file.json"))
+
+    def test_batch_saves_once(self):
+        with patch.object(models.storage, "flush",
+                          wraps=models.storage.flush) as flush:
+            with models.storage.batch():
+                for i in range(20):
+                    User().save()
+        self.assertEqual(1, flush.call_count)
+        with open("file.json", "r") as f:
+            self.assertEqual(20, len(json.load(f)))
+
+    def test_nested_batch_saves_once(self):
+        with patch.object(models.storage, "flush",
+                          wraps=models.storage.flush) as flush:
+            with models.storage.batch():
+                with models.storage.batch():
+                    User().save()
+                self.assertEqual(0, flush.call_count)
+                Place().save()
+        self.assertEqual(1, flush.call_count)
+
+    def test_batch_saves_on_error(self):
+        us = User()
+        with self.assertRaises(ValueError):
+            with models.storage.batch():
+                us.save()
+                raise ValueError
+        with open("file.json", "r") as f:
+            self.assertIn("User." + us.id, f.read())
+
+    def test_batch_yields_storage(self):
+        with models.storage.batch() as storage:
+            self.assertIs(models.storage, storage)
+
+
+class TestFileStorage_shards(unittest.TestCase):
+    """Unittests for testing per-class files of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        models.storage.shard_dir = "test_shards"
+
+    @classmethod
+    def tearDown(self):
+        models.storage.shard_dir = None
+        models.storage.journal = False
+        shutil.rmtree("test_shards", ignore_errors=True)
+        FileStorage._FileStorage__objects = {}
+
+    def test_save_writes_one_file_per_class(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        self.assertEqual(["State.json", "User.json"],
+                         sorted(files("test_shards")))
+        with open(os.path.join("test_shards", "User.json"), "r") as f:
+            self.assertEqual(["User." + us.id], list(json.load(f).keys()))
+        with open(os.path.join("test_shards", "State.json"), "r") as f:
+            self.assertEqual(["State." + st.id], list(json.load(f).keys()))
+
+    def test_save_rewrites_only_changed_classes(self):
+        User()
+        st = State()
+        models.storage.save()
+        user_path = os.path.join("test_shards", "User.json")
+        os.utime(user_path, (0, 0))
+        st.name = "California"
+        models.storage.save()
+        self.assertEqual(0, os.stat(user_path).st_mtime)
+
+    def test_delete_rewrites_class_file(self):
+        us = User()
+        models.storage.save()
+        models.storage.delete(us)
+        models.storage.save()
+        with open(os.path.join("test_shards", "User.json"), "r") as f:
+            self.assertEqual({}, json.load(f))
+
+    def test_reload_all_classes(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertIn("User." + us.id, models.storage.all())
+        self.assertIn("State." + st.id, models.storage.all())
+
+    def test_reload_subset_of_classes(self):
+        us = User()
+        st = State()
+        rv = Review()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload(classes=[User, "State"])
+        self.assertIn("User." + us.id, models.storage.all())
+        self.assertIn("State." + st.id, models.storage.all())
+        self.assertNotIn("Review." + rv.id, models.storage.all())
+
+    def test_journal_per_class(self):
+        models.storage.journal = True
+        us = User()
+        models.storage.save()
+        self.assertEqual(["User.json.journal"], files("test_shards"))
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertIn("User." + us.id, models.storage.all())
+
+
+class TestFileStorage_lazy(unittest.TestCase):
+    """Unittests for testing lazy mode of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        models.storage.lazy = True
+
+    @classmethod
+    def tearDown(self):
+        models.storage.lazy = False
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def reload_fresh(self):
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+
+    def test_reload_builds_nothing(self):
+        User()
+        models.storage.save()
+        self.reload_fresh()
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+
+    def test_get_builds_one(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        self.reload_fresh()
+        obj = models.storage.get(User, us.id)
+        self.assertEqual(User, type(obj))
+        self.assertEqual(us.id, obj.id)
+        self.assertEqual(us.created_at, obj.created_at)
+        self.assertIs(obj, models.storage.get(User, us.id))
+        self.assertEqual(["User." + us.id],
+                         list(FileStorage._FileStorage__objects.keys()))
+
+    def test_count_builds_nothing(self):
+        User()
+        User()
+        State()
+        models.storage.save()
+        self.reload_fresh()
+        self.assertEqual(2, models.storage.count(User))
+        self.assertEqual(3, models.storage.count())
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+
+    def test_all_builds_everything(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        self.reload_fresh()
+        objs = models.storage.all()
+        self.assertEqual(User, type(objs["User." + us.id]))
+        self.assertEqual(State, type(objs["State." + st.id]))
+
+    def test_all_with_cls_builds_that_class(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        self.reload_fresh()
+        objs = models.storage.all(User)
+        self.assertEqual(User, type(objs["User." + us.id]))
+        self.assertEqual(["User." + us.id],
+                         list(FileStorage._FileStorage__objects.keys()))
+
+    def test_save_keeps_unbuilt_records(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        self.reload_fresh()
+        models.storage.get(State, st.id).name = "California"
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertIn("User." + us.id, objdict)
+        self.assertEqual("California", objdict["State." + st.id]["name"])
+
+    def test_save_reuses_unbuilt_fragments(self):
+        us = User()
+        User()
+        models.storage.save()
+        self.reload_fresh()
+        models.storage.save()
+        with patch.object(JSONCodec, "encode", autospec=True,
+                          side_effect=JSONCodec.encode) as encode:
+            models.storage.save()
+            self.assertEqual(0, encode.call_count)
+            models.storage.get(User, us.id).first_name = "Betty"
+            models.storage.save()
+            self.assertEqual(1, encode.call_count)
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual(2, len(objdict))
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+
+
+class TestFileStorage_codecs(unittest.TestCase):
+    """Unittests for testing the codecs of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        models.storage.codec = None
+        models.storage.journal = False
+        FileStorage._FileStorage__file_path = "file.json"
+        for path in ["file.marshal", "file.pickle", "file.marshal.journal",
+                     "file.marshal.lock", "file.pickle.lock"]:
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        FileStorage._FileStorage__objects = {}
+
+    def reload_fresh(self):
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+
+    def test_codec_from_extension(self):
+        FileStorage._FileStorage__file_path = "file.marshal"
+        us = User()
+        us.first_name = "Betty"
+        models.storage.save()
+        with open("file.marshal", "rb") as f:
+            self.assertNotEqual(b"{", f.read(1))
+        self.reload_fresh()
+        obj = models.storage.get(User, us.id)
+        self.assertEqual("Betty", obj.first_name)
+        self.assertEqual(us.updated_at, obj.updated_at)
+
+    def test_codec_setting(self):
+        FileStorage._FileStorage__file_path = "file.pickle"
+        models.storage.codec = "pickle"
+        us = User()
+        models.storage.save()
+        self.reload_fresh()
+        self.assertIn("User." + us.id, models.storage.all())
+
+    def test_codec_journal(self):
+        FileStorage._FileStorage__file_path = "file.marshal"
+        models.storage.journal = True
+        us = User()
+        st = State()
+        models.storage.save()
+        us.first_name = "Betty"
+        models.storage.delete(st)
+        models.storage.save()
+        self.reload_fresh()
+        self.assertEqual("Betty", models.storage.get(User, us.id).first_name)
+        self.assertIsNone(models.storage.get(State, st.id))
+
+    def test_codec_change_drops_fragments(self):
+        FileStorage._FileStorage__file_path = "file.marshal"
+        us = User()
+        models.storage.save()
+        models.storage.codec = "pickle"
+        models.storage.save()
+        models.storage.codec = None
+        FileStorage._FileStorage__file_path = "file.pickle"
+        os.rename("file.marshal", "file.pickle")
+        self.reload_fresh()
+        self.assertIn("User." + us.id, models.storage.all())
+
+
+class TestFileStorage_compression(unittest.TestCase):
+    """Unittests for testing compressed files of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        models.storage.compression = None
+        models.storage.compression_level = None
+        models.storage.shard_dir = None
+        models.storage.journal = False
+        FileStorage._FileStorage__file_path = "file.json"
+        for path in ["file.json.gz", "file.json.gz.journal",
+                     "file.json.gz.lock"]:
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        shutil.rmtree("test_shards", ignore_errors=True)
+        FileStorage._FileStorage__objects = {}
+
+    def reload_fresh(self):
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+
+    def test_compression_from_extension(self):
+        FileStorage._FileStorage__file_path = "file.json.gz"
+        us = User()
+        models.storage.save()
+        with gzip.open("file.json.gz", "rt") as f:
+            self.assertIn("User." + us.id, json.load(f))
+        self.reload_fresh()
+        self.assertIn("User." + us.id, models.storage.all())
+
+    def test_compression_level(self):
+        FileStorage._FileStorage__file_path = "file.json.gz"
+        models.storage.compression_level = 1
+        us = User()
+        models.storage.save()
+        self.reload_fresh()
+        self.assertIn("User." + us.id, models.storage.all())
+
+    def test_compressed_shards(self):
+        models.storage.shard_dir = "test_shards"
+        models.storage.compression = "lzma"
+        us = User()
+        models.storage.save()
+        self.assertEqual(["User.json.xz"], files("test_shards"))
+        self.reload_fresh()
+        self.assertIn("User." + us.id, models.storage.all())
+
+    def test_journal_is_not_compressed(self):
+        FileStorage._FileStorage__file_path = "file.json.gz"
+        models.storage.journal = True
+        us = User()
+        models.storage.save()
+        with open("file.json.gz.journal", "r") as f:
+            self.assertIn("User." + us.id, f.read())
+        models.storage.compact()
+        self.reload_fresh()
+        self.assertIn("User." + us.id, models.storage.all())
+
+
+class TestFileStorage_refresh(unittest.TestCase):
+    """Unittests for testing refresh of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        models.storage.journal = False
+        for path in ["file.json", "file.json.journal"]:
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def write_elsewhere(self, objdict):
+        with open("file.json", "w") as f:
+            json.dump(objdict, f)
+
+    def test_refresh_unchanged(self):
+        us = User()
+        models.storage.save()
+        self.assertFalse(models.storage.refresh())
+        self.assertIs(us, models.storage.get(User, us.id))
+
+    def test_refresh_after_own_save(self):
+        us = User()
+        models.storage.save()
+        models.storage.refresh()
+        us.first_name = "Betty"
+        models.storage.save()
+        self.assertFalse(models.storage.refresh())
+
+    def test_refresh_rewritten_file(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        objdict["User." + us.id]["first_name"] = "Betty"
+        del objdict["State." + st.id]
+        self.write_elsewhere(objdict)
+        self.assertTrue(models.storage.refresh())
+        self.assertEqual("Betty", models.storage.get(User, us.id).first_name)
+        self.assertIsNone(models.storage.get(State, st.id))
+        self.assertFalse(models.storage.refresh())
+
+    def test_refresh_keeps_unsaved_changes(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        objdict["User." + us.id]["first_name"] = "Betty"
+        self.write_elsewhere(objdict)
+        us.first_name = "Holberton"
+        cy = City()
+        models.storage.refresh()
+        self.assertEqual("Holberton",
+                         models.storage.get(User, us.id).first_name)
+        self.assertIs(cy, models.storage.get(City, cy.id))
+        self.assertIs(st, models.storage.get(State, st.id))
+
+    def test_refresh_applies_only_new_records(self):
+        models.storage.journal = True
+        us = User()
+        st = State()
+        models.storage.save()
+        rv = Review(id="1234", created_at=us.created_at.isoformat(),
+                    updated_at=us.updated_at.isoformat())
+        record = {"op": "put", "key": "Review.1234", "value": rv.to_dict()}
+        with open("file.json.journal", "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.write(json.dumps({"op": "delete",
+                                "key": "State." + st.id}) + "\n")
+        self.assertTrue(models.storage.refresh())
+        self.assertEqual(Review, type(models.storage.get(Review, "1234")))
+        self.assertIsNone(models.storage.get(State, st.id))
+        self.assertIs(us, models.storage.get(User, us.id))
+        self.assertFalse(models.storage.refresh())
+
+    def test_refresh_updates_instances_in_place(self):
+        us = User()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        objdict["User." + us.id]["first_name"] = "Betty"
+        self.write_elsewhere(objdict)
+        self.assertTrue(models.storage.refresh())
+        self.assertIs(us, models.storage.get(User, us.id))
+        self.assertEqual("Betty", us.first_name)
+
+    def test_save_merge_keeps_held_instances(self):
+        bm = BaseModel()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        objdict["BaseModel." + bm.id]["name"] = "Betty"
+        self.write_elsewhere(objdict)
+        User()
+        models.storage.save()
+        bm.color = "red"
+        bm.save()
+        with open("file.json", "r") as f:
+            saved = json.load(f)["BaseModel." + bm.id]
+        self.assertEqual("Betty", saved["name"])
+        self.assertEqual("red", saved["color"])
+
+    def test_merge_keeps_changes_in_place(self):
+        bm = BaseModel()
+        bm.tags = {}
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        objdict["BaseModel." + bm.id]["name"] = "Betty"
+        self.write_elsewhere(objdict)
+        bm = models.storage.get(BaseModel, bm.id)
+        bm.tags["x"] = 1
+        models.storage.refresh()
+        self.assertEqual({"x": 1}, bm.tags)
+        models.storage.save()
+        with open("file.json", "r") as f:
+            self.assertEqual({"x": 1},
+                             json.load(f)["BaseModel." + bm.id]["tags"])
+
+    def test_refresh_with_arg(self):
+        with self.assertRaises(TypeError):
+            models.storage.refresh(None)
+
+
+class TestFileStorage_indexes(unittest.TestCase):
+    """Unittests for testing hash indexes of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        models.storage._FileStorage__indexes.clear()
+
+    @classmethod
+    def tearDown(self):
+        models.storage.lazy = False
+        models.storage._FileStorage__indexes.pop("State", None)
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def indexes(self, cls):
+        models.storage.all()
+        return models.storage._FileStorage__indexes.get(cls, {})
+
+    def test_declared_indexes(self):
+        User()
+        City()
+        self.assertEqual({}, self.indexes("User"))
+        models.storage.lookup(User, email="a")
+        self.assertEqual(["email"], list(self.indexes("User")))
+        models.storage.children(State(), City)
+        self.assertEqual(["state_id"], list(self.indexes("City")))
+
+    def test_declared_indexes_not_built_on_reload(self):
+        pl = Place()
+        pl.description = "sea view"
+        models.storage.save()
+        models.storage.reload()
+        self.assertEqual({}, self.indexes("Place"))
+        self.assertEqual([pl.id], [p.id for p in
+                                   models.storage.search(Place, "sea")])
+        self.assertEqual([("name", "description")],
+                         list(self.indexes("Place")))
+
+    def test_lookup(self):
+        us = User()
+        us.email = "betty@holberton.io"
+        User().email = "bob@holberton.io"
+        self.assertEqual([us], models.storage.lookup(User,
+                                                     email=us.email))
+        self.assertEqual([us], models.storage.lookup("User",
+                                                     email=us.email))
+        self.assertEqual([], models.storage.lookup(User, email="x"))
+
+    def test_lookup_default_value(self):
+        us = User()
+        User().email = "bob@holberton.io"
+        self.assertEqual([us], models.storage.lookup(User, email=""))
+
+    def test_lookup_uses_index(self):
+        cities = [City() for i in range(20)]
+        cities[3].state_id = "1234"
+        with patch("models.engine.query.value_of",
+                   wraps=models.engine.query.value_of) as value_of:
+            found = models.storage.lookup(City, state_id="1234")
+        self.assertEqual([cities[3]], found)
+        self.assertEqual(1, value_of.call_count)
+
+    def test_lookup_several_attributes(self):
+        us = User()
+        us.email = "betty@holberton.io"
+        us.first_name = "Betty"
+        self.assertEqual([us], models.storage.lookup(
+            User, email=us.email, first_name="Betty"))
+        self.assertEqual([], models.storage.lookup(
+            User, email=us.email, first_name="Bob"))
+
+    def test_lookup_without_index(self):
+        st = State()
+        st.name = "Texas"
+        State()
+        self.assertEqual([st], models.storage.lookup(State, name="Texas"))
+
+    def test_create_index(self):
+        st = State()
+        st.name = "Texas"
+        models.storage.create_index(State, "name")
+        self.assertEqual(1, len(self.indexes("State")["name"]))
+        other = State()
+        other.name = "Texas"
+        self.assertEqual([st, other],
+                         models.storage.lookup(State, name="Texas"))
+
+    def test_update(self):
+        us = User()
+        us.email = "betty@holberton.io"
+        us.email = "bob@holberton.io"
+        self.assertEqual([], models.storage.lookup(
+            User, email="betty@holberton.io"))
+        self.assertEqual([us], models.storage.lookup(
+            User, email="bob@holberton.io"))
+
+    def test_delete(self):
+        us = User()
+        us.email = "betty@holberton.io"
+        models.storage.delete(us)
+        self.assertEqual([], models.storage.lookup(User, email=us.email))
+        self.assertEqual(0, len(self.indexes("User")["email"]))
+
+    def test_unhashable_values(self):
+        pl = Place()
+        pl.city_id = ["1234"]
+        self.assertEqual([pl], models.storage.lookup(Place,
+                                                     city_id=["1234"]))
+
+    def test_reload(self):
+        us = User()
+        us.email = "betty@holberton.io"
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        found = models.storage.lookup(User, email="betty@holberton.io")
+        self.assertEqual([us.id], [obj.id for obj in found])
+
+    def test_reload_lazy_builds_matches_only(self):
+        us = User()
+        us.email = "betty@holberton.io"
+        User()
+        models.storage.save()
+        models.storage.lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        found = models.storage.lookup(User, email="betty@holberton.io")
+        self.assertEqual([us.id], [obj.id for obj in found])
+        self.assertEqual(["User." + us.id],
+                         list(FileStorage._FileStorage__objects.keys()))
+
+    def test_refresh(self):
+        us = User()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objs = json.load(f)
+        objs["User." + us.id]["email"] = "betty@holberton.io"
+        sleep(0.01)
+        with open("file.json", "w") as f:
+            json.dump(objs, f)
+        models.storage.refresh()
+        found = models.storage.lookup(User, email="betty@holberton.io")
+        self.assertEqual([us.id], [obj.id for obj in found])
+
+
+class TestFileStorage_spatial(unittest.TestCase):
+    """Unittests for testing spatial searches of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        models.storage.lazy = False
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def place(self, lat, lon):
+        pl = Place()
+        pl.latitude = lat
+        pl.longitude = lon
+        return pl
+
+    def test_near(self):
+        oakland = self.place(37.8044, -122.2712)
+        sf = self.place(37.7749, -122.4194)
+        self.place(34.0522, -118.2437)
+        self.assertEqual([sf, oakland], models.storage.near(
+            Place, 37.7749, -122.4194, 20))
+        self.assertEqual([oakland, sf], models.storage.near(
+            "Place", 37.8, -122.27, 20))
+
+    def test_within(self):
+        sf = self.place(37.7749, -122.4194)
+        self.place(34.0522, -118.2437)
+        self.assertEqual([sf], models.storage.within(
+            Place, 37, -123, 38, -122))
+
+    def test_update_and_delete(self):
+        sf = self.place(37.7749, -122.4194)
+        sf.latitude = 34.05
+        sf.longitude = -118.24
+        self.assertEqual([], models.storage.within(
+            Place, 37, -123, 38, -122))
+        self.assertEqual([sf], models.storage.near(Place, 34.05, -118.24, 1))
+        models.storage.delete(sf)
+        self.assertEqual([], models.storage.near(Place, 34.05, -118.24, 1))
+
+    def test_reload_lazy(self):
+        sf = self.place(37.7749, -122.4194)
+        self.place(34.0522, -118.2437)
+        models.storage.save()
+        models.storage.lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        found = models.storage.near(Place, 37.7749, -122.4194, 20)
+        self.assertEqual([sf.id], [pl.id for pl in found])
+        self.assertEqual(["Place." + sf.id],
+                         list(FileStorage._FileStorage__objects.keys()))
+
+    def test_unlocated_places_not_indexed(self):
+        Place()
+        pl = Place()
+        pl.latitude = 1.0
+        zero = self.place(0.0, 0.0)
+        self.assertEqual([zero], models.storage.near(Place, 0, 0, 1))
+        models.storage.save()
+        models.storage.lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual([zero.id], [p.id for p in
+                                     models.storage.near(Place, 0, 0, 1)])
+
+    def test_no_spatial_index(self):
+        with self.assertRaises(ValueError):
+            models.storage.near(User, 0, 0, 10)
+
+    def test_create_grid_index(self):
+        us = User()
+        us.lat = 1.0
+        us.lon = 2.0
+        models.storage.create_index(User, ("lat", "lon"), "grid")
+        self.addCleanup(models.storage._FileStorage__indexes.pop, "User")
+        self.assertEqual([us], models.storage.near(User, 1, 2, 1))
+        with self.assertRaises(ValueError):
+            models.storage.create_index(User, "lat", "grid")
+        with self.assertRaises(ValueError):
+            models.storage.create_index(User, ("lat", "lon"))
+
+
+class TestFileStorage_search(unittest.TestCase):
+    """Unittests for testing text searches of the FileStorage class."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        models.storage.lazy = False
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def review(self, text):
+        rv = Review()
+        rv.text = text
+        return rv
+
+    def test_search(self):
+        rv1 = self.review("Great place, great host")
+        rv2 = self.review("Great view")
+        self.review("Dirty room")
+        self.assertEqual([rv1, rv2], models.storage.search(Review, "great"))
+        self.assertEqual([rv2], models.storage.search("Review",
+                                                      '"great view"'))
+        self.assertEqual([rv1], models.storage.search(Review, "great",
+                                                      limit=1))
+
+    def test_search_place_name_and_description(self):
+        pl = Place()
+        pl.name = "Beach house"
+        pl.description = "Steps from the ocean"
+        other = Place()
+        other.name = "City loft"
+        self.assertEqual([pl], models.storage.search(Place, "ocean"))
+        self.assertEqual([pl], models.storage.search(Place, "beach"))
+
+    def test_update_and_delete(self):
+        rv = self.review("Great place")
+        rv.text = "Terrible place"
+        self.assertEqual([], models.storage.search(Review, "great"))
+        self.assertEqual([rv], models.storage.search(Review, "terrible"))
+        models.storage.delete(rv)
+        self.assertEqual([], models.storage.search(Review, "terrible"))
+
+    def test_reload_lazy(self):
+        rv = self.review("Great place")
+        self.review("Dirty room")
+        models.storage.save()
+        models.storage.lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        found = models.storage.search(Review, "great")
+        self.assertEqual([rv.id], [obj.id for obj in found])
+        self.assertEqual(["Review." + rv.id],
+                         list(FileStorage._FileStorage__objects.keys()))
+
+    def test_no_text_index(self):
+        with self.assertRaises(ValueError):
+            models.storage.search(User, "betty")
+
+    def test_create_text_index(self):
+        us = User()
+        us.first_name = "Betty"
+        models.storage.create_index(User, ("first_name", "last_name"),
+                                    "text")
+        self.addCleanup(models.storage._FileStorage__indexes.pop, "User")
+        self.assertEqual([us], models.storage.search(User, "betty"))
+
+
+class TestFileStorage_children(unittest.TestCase):
+    """Unittests for testing the relationship indexes of FileStorage."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        models.storage.lazy = False
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_children(self):
+        st = State()
+        cities = [City() for i in range(3)]
+        cities[0].state_id = st.id
+        cities[2].state_id = st.id
+        self.assertEqual([cities[0], cities[2]],
+                         models.storage.children(st, City))
+        self.assertEqual([cities[0], cities[2]],
+                         models.storage.children(st, "City"))
+        self.assertEqual([], models.storage.children(State(), City))
+
+    def test_children_use_index(self):
+        pl = Place()
+        reviews = [Review() for i in range(10)]
+        reviews[3].place_id = pl.id
+        with patch("models.engine.query.value_of",
+                   wraps=models.engine.query.value_of) as value_of:
+            self.assertEqual([reviews[3]], pl.reviews)
+        self.assertEqual(1, value_of.call_count)
+
+    def test_children_no_foreign_key(self):
+        with self.assertRaises(ValueError):
+            models.storage.children(State(), Review)
+
+    def test_children_reload_lazy(self):
+        us = User()
+        places = [Place() for i in range(3)]
+        places[1].user_id = us.id
+        models.storage.save()
+        models.storage.lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        us = models.storage.get(User, us.id)
+        self.assertEqual([places[1].id], [pl.id for pl in us.places])
+        self.assertEqual(sorted(["User." + us.id, "Place." + places[1].id]),
+                         sorted(FileStorage._FileStorage__objects.keys()))
+
+    def test_destroy_cascades(self):
+        us = User()
+        st = State()
+        cy = City()
+        cy.state_id = st.id
+        pl = Place()
+        pl.city_id = cy.id
+        pl.user_id = us.id
+        rv1 = Review()
+        rv1.place_id = pl.id
+        rv2 = Review()
+        rv2.place_id = pl.id
+        rv2.user_id = us.id
+        other = City()
+        models.storage.save()
+        with patch.object(FileStorage, "flush",
+                          wraps=models.storage.flush) as flush:
+            models.storage.destroy(st)
+        self.assertEqual(1, flush.call_count)
+        self.assertEqual(["City." + other.id, "User." + us.id],
+                         sorted(models.storage.all()))
+        self.assertEqual([], us.places)
+        self.assertEqual([], us.reviews)
+        models.storage.reload()
+        self.assertEqual(["City." + other.id, "User." + us.id],
+                         sorted(models.storage.all()))
+
+    def test_destroy_shared_dependent(self):
+        us = User()
+        pl = Place()
+        pl.user_id = us.id
+        rv = Review()
+        rv.place_id = pl.id
+        rv.user_id = us.id
+        models.storage.destroy(us)
+        self.assertEqual({}, models.storage.all())
+
+    def test_destroy_without_cascade(self):
+        am = Amenity()
+        pl = Place()
+        models.storage.destroy(am)
+        self.assertEqual(["Place." + pl.id], list(models.storage.all()))
+
+
+class TestFileStorage_locking(unittest.TestCase):
+    """Unittests for testing FileStorage with several processes."""
+
+    script = ("import sys\n"
+              "import models\n"
+              "from models.user import User\n"
+              "models.storage.journal = sys.argv[2] == '1'\n"
+              "models.storage.journal_limit = 4096\n"
+              "for i in range(int(sys.argv[1])):\n"
+              "    User()\n"
+              "    models.storage.save()\n")
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def spawn(self, saves, journal=False):
+        """Start a process creating and saving saves users."""
+        env = dict(os.environ)
+        env.pop("HBNB_TYPE_STORAGE", None)
+        return subprocess.Popen([sys.executable, "-c", self.script,
+                                 str(saves), str(int(journal))], env=env)
+
+    def saved(self, cls):
+        """Return the number of instances of cls in file.json."""
+        with open("file.json", "r") as f:
+            return sum(1 for key in json.load(f) if key.startswith(cls))
+
+    def test_save_merges_changes_on_disk(self):
+        st = State()
+        models.storage.save()
+        self.assertEqual(0, self.spawn(2).wait())
+        st.name = "California"
+        pl = Place()
+        models.storage.save()
+        self.assertEqual(2, self.saved("User."))
+        self.assertEqual(1, self.saved("Place."))
+        self.assertEqual(2, models.storage.count(User))
+        with open("file.json", "r") as f:
+            self.assertEqual("California",
+                             json.load(f)["State." + st.id]["name"])
+
+    def test_save_keeps_local_deletes(self):
+        us = User()
+        models.storage.save()
+        self.assertEqual(0, self.spawn(1).wait())
+        models.storage.delete(us)
+        models.storage.save()
+        self.assertEqual(1, self.saved("User."))
+        self.assertNotIn("User." + us.id, models.storage.all())
+
+    def test_concurrent_writers(self):
+        procs = [self.spawn(10) for i in range(4)]
+        for i in range(10):
+            State()
+            models.storage.save()
+        self.assertEqual([0] * 4, [proc.wait() for proc in procs])
+        self.assertEqual(40, self.saved("User."))
+        self.assertEqual(10, self.saved("State."))
+
+    def test_concurrent_journal_writers(self):
+        for name in ("file.json.journal", "file.json.journal.old"):
+            self.addCleanup(lambda p: os.path.exists(p) and os.remove(p),
+                            name)
+        self.addCleanup(setattr, models.storage, "journal", False)
+        procs = [self.spawn(20, True) for i in range(4)]
+        self.assertEqual([0] * 4, [proc.wait() for proc in procs])
+        models.storage.journal = True
+        models.storage.reload()
+        self.assertEqual(80, models.storage.count(User))
+
+    @unittest.skipIf(sys.platform == "win32", "needs fcntl")
+    def test_save_waits_for_exclusive_lock(self):
+        import fcntl
+        with open("file.json.lock", "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            proc = self.spawn(1)
+            sleep(0.5)
+            self.assertIsNone(proc.poll())
+            fcntl.flock(f, fcntl.LOCK_UN)
+            self.assertEqual(0, proc.wait())
+        self.assertEqual(1, self.saved("User."))
+
+    def test_reload_without_file_creates_no_lock(self):
+        models.storage.reload()
+        models.storage.refresh()
+        self.assertFalse(os.path.exists("file.json.lock"))
+        User()
+        models.storage.save()
+        self.assertTrue(os.path.exists("file.json.lock"))
+
+    def test_without_fcntl(self):
+        os.makedirs("test_nolock", exist_ok=True)
+        self.addCleanup(shutil.rmtree, "test_nolock", ignore_errors=True)
+        models.storage.shard_dir = "test_nolock"
+        self.addCleanup(setattr, models.storage, "shard_dir", None)
+        with patch("models.engine.file_storage.fcntl", None):
+            us = User()
+            models.storage.save()
+            FileStorage._FileStorage__objects = {}
+            models.storage.reload()
+        self.assertIn("User." + us.id, models.storage.all())
+        self.assertEqual(["User.json"], os.listdir("test_nolock"))
+
+
+class TestFileStorage_threads(unittest.TestCase):
+    """Unittests for testing FileStorage with several threads."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_concurrent_writers_and_readers(self):
+        errors = []
+
+        def write():
+            try:
+                for i in range(25):
+                    us = User()
+                    us.email = "{}@mail.com".format(i)
+                    models.storage.save()
+            except Exception as e:
+                errors.append(e)
+
+        def read():
+            try:
+                for i in range(50):
+                    models.storage.all(User)
+                    models.storage.count(User)
+                    models.storage.lookup(User, email="1@mail.com")
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=f) for f in [write] * 4 + [read]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(100, models.storage.count(User))
+        self.assertEqual(4, len(models.storage.lookup(User,
+                                                      email="1@mail.com")))
+        with open("file.json", "r") as f:
+            self.assertEqual(100, len(json.load(f)))
+
+    def test_iterate_objects_while_creating(self):
+        errors = []
+        done = threading.Event()
+
+        def create():
+            for i in range(2000):
+                User()
+            done.set()
+
+        def iterate():
+            try:
+                while not done.is_set():
+                    for obj in models.storage.objects().values():
+                        pass
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=f) for f in (iterate, create)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(2000, len(models.storage.objects(User)))
+
+    def test_save_writes_outside_write_lock(self):
+        write = FileStorage._FileStorage__write_snapshot
+        created = []
+
+        def create():
+            created.append(User())
+
+        def write_snapshot(self, *args):
+            thread = threading.Thread(target=create)
+            thread.start()
+            thread.join(5)
+            write(self, *args)
+        User()
+        with patch.object(FileStorage, "_FileStorage__write_snapshot",
+                          write_snapshot):
+            models.storage.save()
+        self.assertEqual(1, len(created))
+        self.assertEqual(2, models.storage.count(User))
+        models.storage.save()
+        with open("file.json", "r") as f:
+            self.assertEqual(2, len(json.load(f)))
+
+
+class TestFileStorage_async(unittest.TestCase):
+    """Unittests for testing the asyncio API of FileStorage."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_asave(self):
+        us = User()
+        asyncio.run(models.storage.asave())
+        with open("file.json", "r") as f:
+            self.assertIn("User." + us.id, json.load(f))
+
+    def test_asave_runs_in_executor(self):
+        threads = []
+        with patch.object(models.storage, "save",
+                          lambda: threads.append(threading.current_thread())):
+            asyncio.run(models.storage.asave())
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.main_thread(), threads[0])
+
+    def test_areload(self):
+        us = User()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        asyncio.run(models.storage.areload())
+        self.assertIn("User." + us.id, models.storage.all())
+
+    def test_areload_with_classes(self):
+        with patch.object(models.storage, "reload") as reload:
+            asyncio.run(models.storage.areload(classes=[User]))
+        reload.assert_called_once_with(classes=[User])
+
 
 if __name__ == "__main__":
     unittest.main()
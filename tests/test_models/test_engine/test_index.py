@@ -0,0 +1,332 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/index.py.
+
+Unittest classes:
+    TestHashIndex
+    TestSortedIndex
+    TestSetIndex
+    TestGridIndex
+    TestTextIndex
+"""
+import unittest
+from models.engine.index import GridIndex
+from models.engine.index import HashIndex
+from models.engine.index import SetIndex
+from models.engine.index import SortedIndex
+from models.engine.index import TextIndex
+from models.engine.index import distance
+from models.engine.index import tokenize
+from models.engine.index import value_of
+from models.user import User
+
+
+class TestHashIndex(unittest.TestCase):
+    """Unittests for testing the HashIndex class."""
+
+    def test_value_of(self):
+        self.assertEqual("a", value_of({"email": "a"}, "email"))
+        self.assertEqual("", value_of({}, "email", ""))
+        us = User(email="a")
+        self.assertEqual("a", value_of(us, "email"))
+        self.assertEqual("", value_of(User(), "email"))
+
+    def test_add_and_find(self):
+        index = HashIndex("email", "")
+        index.add("User.1", {"email": "a"})
+        index.add("User.2", {"email": "b"})
+        index.add("User.3", {"email": "a"})
+        index.add("User.4", {})
+        self.assertEqual(["User.1", "User.3"], index.find("a"))
+        self.assertEqual(["User.4"], index.find(""))
+        self.assertEqual([], index.find("c"))
+        self.assertEqual(4, len(index))
+
+    def test_add_again_moves_key(self):
+        index = HashIndex("email")
+        index.add("User.1", {"email": "a"})
+        index.add("User.1", {"email": "b"})
+        self.assertEqual([], index.find("a"))
+        self.assertEqual(["User.1"], index.find("b"))
+
+    def test_add_keeps_type(self):
+        index = HashIndex("number_rooms")
+        index.add("Place.1", {"number_rooms": 1})
+        index.add("Place.1", {"number_rooms": 1.0})
+        self.assertEqual(float, type(list(
+            index._HashIndex__values.values())[0]))
+
+    def test_remove(self):
+        index = HashIndex("email")
+        index.add("User.1", {"email": "a"})
+        index.remove("User.1")
+        index.remove("User.2")
+        self.assertEqual([], index.find("a"))
+        self.assertEqual(0, len(index))
+
+    def test_unhashable(self):
+        index = HashIndex("amenity_ids")
+        index.add("Place.1", {"amenity_ids": ["1"]})
+        self.assertEqual(0, len(index))
+        with self.assertRaises(TypeError):
+            index.find(["1"])
+
+    def test_clear(self):
+        index = HashIndex("email")
+        index.add("User.1", {"email": "a"})
+        index.clear()
+        self.assertEqual([], index.find("a"))
+
+
+class TestSortedIndex(unittest.TestCase):
+    """Unittests for testing the SortedIndex class."""
+
+    def setUp(self):
+        self.index = SortedIndex("price_by_night", 0)
+        for i, price in enumerate([30, 10, 20, 40, 20]):
+            self.index.add("Place.{}".format(i), {"price_by_night": price})
+
+    def test_range(self):
+        self.assertEqual(["Place.1", "Place.2", "Place.4", "Place.0",
+                          "Place.3"], self.index.range())
+        self.assertEqual(["Place.2", "Place.4", "Place.0"],
+                         self.index.range(20, 30))
+        self.assertEqual(["Place.0"], self.index.range(20, 30, False))
+        self.assertEqual(["Place.2", "Place.4"],
+                         self.index.range(20, 30, True, False))
+        self.assertEqual(["Place.0", "Place.3"], self.index.range(low=25))
+        self.assertEqual(["Place.1"], self.index.range(high=15))
+        self.assertEqual([], self.index.range(50, 60))
+
+    def test_find(self):
+        self.assertEqual(["Place.2", "Place.4"], self.index.find(20))
+        self.assertEqual([], self.index.find(25))
+
+    def test_add_again_moves_key(self):
+        self.index.add("Place.1", {"price_by_night": 50})
+        self.assertEqual(["Place.1"], self.index.range(low=45))
+        self.assertEqual([], self.index.find(10))
+        self.assertEqual(5, len(self.index))
+
+    def test_remove(self):
+        self.index.remove("Place.4")
+        self.index.remove("Place.9")
+        self.assertEqual(["Place.2"], self.index.find(20))
+        self.assertEqual(4, len(self.index))
+
+    def test_default(self):
+        self.index.add("Place.5", {})
+        self.assertEqual(["Place.5"], self.index.find(0))
+
+    def test_mixed_numbers(self):
+        self.index.add("Place.5", {"price_by_night": 25.5})
+        self.assertEqual(["Place.5", "Place.0"], self.index.range(25, 30))
+
+    def test_other_types_are_skipped(self):
+        self.index.add("Place.5", {"price_by_night": "cheap"})
+        self.index.add("Place.0", {"price_by_night": None})
+        self.assertEqual(4, len(self.index))
+        self.assertFalse(self.index.accepts("cheap"))
+
+    def test_string_index(self):
+        index = SortedIndex("name", "")
+        index.add("State.1", {"name": "Texas"})
+        index.add("State.2", {"name": "Ohio"})
+        index.add("State.3", {"name": 5})
+        self.assertEqual(["State.2"], index.range("N", "P"))
+        self.assertEqual(2, len(index))
+
+
+class TestSetIndex(unittest.TestCase):
+    """Unittests for testing the SetIndex class."""
+
+    def setUp(self):
+        self.index = SetIndex("amenity_ids", [])
+        self.index.add("Place.1", {"amenity_ids": ["wifi", "pool"]})
+        self.index.add("Place.2", {"amenity_ids": ["wifi"]})
+        self.index.add("Place.3", {"amenity_ids": ["pool", "wifi", "gym"]})
+        self.index.add("Place.4", {})
+
+    def test_find(self):
+        self.assertEqual(["Place.1", "Place.2", "Place.3"],
+                         self.index.find("wifi"))
+        self.assertEqual([], self.index.find("spa"))
+        self.assertEqual(4, len(self.index))
+
+    def test_find_all(self):
+        self.assertEqual(["Place.1", "Place.3"],
+                         self.index.find_all(["wifi", "pool"]))
+        self.assertEqual(["Place.3"],
+                         self.index.find_all(["wifi", "gym", "pool"]))
+        self.assertEqual([], self.index.find_all(["wifi", "spa"]))
+
+    def test_find_all_duplicates(self):
+        self.assertEqual(["Place.3"],
+                         self.index.find_all(["gym", "gym", "wifi"]))
+
+    def test_add_again_reindexes(self):
+        self.index.add("Place.2", {"amenity_ids": ["gym"]})
+        self.assertEqual(["Place.1", "Place.3"], self.index.find("wifi"))
+        self.assertEqual(["Place.3", "Place.2"], self.index.find("gym"))
+
+    def test_remove(self):
+        self.index.remove("Place.3")
+        self.index.remove("Place.9")
+        self.assertEqual([], self.index.find("gym"))
+        self.assertEqual(["Place.1"], self.index.find_all(["pool"]))
+
+    def test_not_a_list(self):
+        self.index.add("Place.1", {"amenity_ids": "wifi"})
+        self.index.add("Place.5", {"amenity_ids": [["wifi"], "spa"]})
+        self.assertEqual(["Place.2", "Place.3"], self.index.find("wifi"))
+        self.assertEqual(["Place.5"], self.index.find("spa"))
+
+
+class TestGridIndex(unittest.TestCase):
+    """Unittests for testing the GridIndex class."""
+
+    points = {
+        "Place.sf": (37.7749, -122.4194),
+        "Place.oakland": (37.8044, -122.2712),
+        "Place.la": (34.0522, -118.2437),
+        "Place.fiji": (-17.7134, 178.0650),
+        "Place.samoa": (-13.7590, -172.1046),
+        "Place.pole": (89.99, 10.0)
+    }
+
+    def setUp(self):
+        self.index = GridIndex(("latitude", "longitude"), (0.0, 0.0))
+        for key, (lat, lon) in self.points.items():
+            self.index.add(key, {"latitude": lat, "longitude": lon})
+
+    def test_distance(self):
+        self.assertAlmostEqual(559, distance(37.7749, -122.4194,
+                                             34.0522, -118.2437), 0)
+        self.assertEqual(0, distance(1, 2, 1, 2))
+
+    def test_near(self):
+        found = self.index.near(37.7749, -122.4194, 20)
+        self.assertEqual(["Place.sf", "Place.oakland"],
+                         [key for d, key in found])
+        self.assertAlmostEqual(13.3, found[1][0], 0)
+        found = self.index.near(37.7749, -122.4194, 600)
+        self.assertEqual(["Place.sf", "Place.oakland", "Place.la"],
+                         [key for d, key in found])
+        self.assertEqual([], self.index.near(0, 0, 100))
+
+    def test_near_antimeridian(self):
+        found = self.index.near(-16, 179.9, 1200)
+        self.assertEqual(["Place.fiji", "Place.samoa"],
+                         [key for d, key in found])
+
+    def test_near_pole(self):
+        found = self.index.near(89.9, -170, 50)
+        self.assertEqual(["Place.pole"], [key for d, key in found])
+
+    def test_box(self):
+        self.assertEqual(["Place.sf", "Place.oakland"],
+                         self.index.box(37, -123, 38, -122))
+        self.assertEqual(["Place.la"], self.index.box(30, -120, 35, -110))
+        self.assertEqual([], self.index.box(0, 0, 1, 1))
+
+    def test_box_antimeridian(self):
+        self.assertEqual(["Place.fiji", "Place.samoa"],
+                         self.index.box(-20, 170, -10, -170))
+
+    def test_add_again_moves_key(self):
+        self.index.add("Place.sf", {"latitude": 0.5, "longitude": 0.5})
+        self.assertEqual(["Place.sf"], self.index.box(0, 0, 1, 1))
+        self.assertEqual(["Place.oakland"],
+                         self.index.box(37, -123, 38, -122))
+        self.assertEqual(6, len(self.index))
+
+    def test_remove(self):
+        self.index.remove("Place.la")
+        self.index.remove("Place.paris")
+        self.assertEqual([], self.index.box(30, -120, 35, -110))
+        self.assertEqual(5, len(self.index))
+
+    def test_default_and_invalid(self):
+        self.index.add("Place.null", {})
+        self.index.add("Place.bad", {"latitude": "north"})
+        self.assertEqual(["Place.null"], self.index.box(-1, -1, 1, 1))
+        self.assertEqual(7, len(self.index))
+
+
+class TestTextIndex(unittest.TestCase):
+    """Unittests for testing the TextIndex class."""
+
+    texts = {
+        "Review.1": "Great place, great host. Would stay again!",
+        "Review.2": "The host was rude and the place was dirty.",
+        "Review.3": "A quiet place near the beach.",
+        "Review.4": "Beach house with a great view of the beach."
+    }
+
+    def setUp(self):
+        self.index = TextIndex(("text",), ("",))
+        for key, text in self.texts.items():
+            self.index.add(key, {"text": text})
+
+    def keys(self, text):
+        return [key for score, key in self.index.search(text)]
+
+    def test_tokenize(self):
+        self.assertEqual(["great", "place", "s\u00e3o", "paulo", "42"],
+                         tokenize("Great place! S\u00c3O-Paulo, 42"))
+
+    def test_term(self):
+        self.assertEqual(["Review.2"], self.keys("rude"))
+        self.assertEqual(["Review.2"], self.keys("RUDE"))
+        self.assertEqual([], self.keys("pool"))
+        self.assertEqual([], self.keys(""))
+
+    def test_ranking(self):
+        self.assertEqual(["Review.1", "Review.4"], self.keys("great"))
+        self.assertEqual(["Review.4", "Review.3"], self.keys("beach"))
+        self.assertEqual("Review.3", self.keys("quiet beach")[0])
+        scores = [score for score, key in self.index.search("great")]
+        self.assertGreater(scores[0], scores[1])
+
+    def test_phrase(self):
+        self.assertEqual(["Review.1"], self.keys('"great host"'))
+        self.assertEqual(["Review.4"], self.keys('"great view"'))
+        self.assertEqual([], self.keys('"host great"'))
+        self.assertEqual([], self.keys('"great pool"'))
+        self.assertEqual(["Review.3"], self.keys('"near the beach"'))
+
+    def test_phrase_and_terms(self):
+        self.assertEqual(["Review.4", "Review.3"],
+                         self.keys('"the beach" view'))
+        self.assertEqual(["Review.3", "Review.4"],
+                         self.keys('"the beach" quiet'))
+        self.assertEqual([], self.keys('"host beach" beach'))
+
+    def test_phrase_across_attributes(self):
+        index = TextIndex(("name", "description"), ("", ""))
+        index.add("Place.1", {"name": "Sea view",
+                              "description": "Cottage by the sea"})
+        self.assertEqual([], index.search('"view cottage"'))
+        self.assertEqual(1, len(index.search('"view" cottage')))
+
+    def test_add_again_reindexes(self):
+        self.index.add("Review.2", {"text": "Lovely and clean"})
+        self.assertEqual([], self.keys("rude"))
+        self.assertEqual(["Review.2"], self.keys("clean"))
+        self.assertEqual(4, len(self.index))
+
+    def test_remove(self):
+        self.index.remove("Review.1")
+        self.index.remove("Review.9")
+        self.assertEqual(["Review.4"], self.keys("great"))
+        self.assertEqual(3, len(self.index))
+        self.assertNotIn("would", self.index._TextIndex__postings)
+
+    def test_not_text(self):
+        self.index.add("Review.5", {"text": 5})
+        self.index.add("Review.6", {})
+        self.assertEqual(6, len(self.index))
+        self.assertEqual(["Review.1", "Review.4"], self.keys("great"))
+
+
+if __name__ == "__main__":
+    unittest.main()
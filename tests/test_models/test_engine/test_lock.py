@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/lock.py.
+
+Unittest classes:
+    TestRWLock
+"""
+import threading
+import unittest
+from time import sleep
+from models.engine.lock import RWLock
+
+
+class TestRWLock(unittest.TestCase):
+    """Unittests for testing the RWLock class."""
+
+    def start(self, target):
+        """Start a daemon thread running target."""
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return thread
+
+    def test_concurrent_readers(self):
+        lock = RWLock()
+        barrier = threading.Barrier(3, timeout=5)
+
+        def read():
+            with lock.read():
+                barrier.wait()
+        threads = [self.start(read) for i in range(2)]
+        with lock.read():
+            barrier.wait()
+        for thread in threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+    def test_writer_excludes_readers(self):
+        lock = RWLock()
+        events = []
+
+        def read():
+            with lock.read():
+                events.append("read")
+        with lock.write():
+            thread = self.start(read)
+            sleep(0.1)
+            events.append("write")
+        thread.join(5)
+        self.assertEqual(["write", "read"], events)
+
+    def test_readers_exclude_writer(self):
+        lock = RWLock()
+        events = []
+
+        def write():
+            with lock.write():
+                events.append("write")
+        with lock.read():
+            thread = self.start(write)
+            sleep(0.1)
+            events.append("read")
+        thread.join(5)
+        self.assertEqual(["read", "write"], events)
+
+    def test_writer_preference(self):
+        lock = RWLock()
+        events = []
+
+        def write():
+            with lock.write():
+                events.append("write")
+
+        def read():
+            with lock.read():
+                events.append("read")
+        with lock.read():
+            writer = self.start(write)
+            sleep(0.1)
+            reader = self.start(read)
+            sleep(0.1)
+            self.assertEqual([], events)
+        writer.join(5)
+        reader.join(5)
+        self.assertEqual(["write", "read"], events)
+
+    def test_reentrant(self):
+        lock = RWLock()
+        with lock.read():
+            with lock.read():
+                pass
+        with lock.write():
+            with lock.write():
+                with lock.read():
+                    pass
+        with lock.write():
+            pass
+
+    def test_upgrade(self):
+        lock = RWLock()
+        with lock.read():
+            with self.assertRaises(RuntimeError):
+                lock.acquire_write()
+        with lock.write():
+            pass
+
+    def test_release_not_held(self):
+        lock = RWLock()
+        with self.assertRaises(RuntimeError):
+            lock.release_read()
+        with self.assertRaises(RuntimeError):
+            lock.release_write()
+        with lock.read():
+            with self.assertRaises(RuntimeError):
+                lock.release_write()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,344 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/mmap_storage.py.
+
+Unittest classes:
+    TestMmapStorage_instantiation
+    TestMmapStorage_methods
+    TestMmapStorage_records
+"""
+import asyncio
+import os
+import models
+import unittest
+from unittest.mock import patch
+from models.base_model import BaseModel
+from models.engine.mmap_storage import MmapStorage
+from models.user import User
+from models.state import State
+from models.place import Place
+from models.review import Review
+
+
+class TestMmapStorage_instantiation(unittest.TestCase):
+    """Unittests for testing instantiation of the MmapStorage class."""
+
+    def tearDown(self):
+        try:
+            os.remove("test.mmap")
+        except IOError:
+            pass
+
+    def test_MmapStorage_instantiation_no_args(self):
+        with patch.dict(os.environ, {"HBNB_MMAP_PATH": "test.mmap"}):
+            storage = MmapStorage()
+        self.assertEqual(type(storage), MmapStorage)
+        storage.close()
+
+    def test_MmapStorage_instantiation_with_arg(self):
+        with self.assertRaises(TypeError):
+            MmapStorage(None)
+
+    def test_creates_file(self):
+        with patch.dict(os.environ, {"HBNB_MMAP_PATH": "test.mmap"}):
+            MmapStorage().close()
+        with open("test.mmap", "rb") as f:
+            self.assertEqual(b"HBNM", f.read(4))
+
+    def test_not_a_record_file(self):
+        with open("test.mmap", "w") as f:
+            f.write("{}" * 100)
+        with patch.dict(os.environ, {"HBNB_MMAP_PATH": "test.mmap"}):
+            with self.assertRaises(ValueError):
+                MmapStorage()
+
+
+class TestMmapStorage_methods(unittest.TestCase):
+    """Unittests for testing methods of the MmapStorage class."""
+
+    def setUp(self):
+        self.storage = self.open()
+        self.patcher = patch("models.storage", self.storage)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        try:
+            os.remove("test.mmap")
+        except IOError:
+            pass
+
+    def open(self):
+        """Return a new MmapStorage on the test file."""
+        with patch.dict(os.environ, {"HBNB_MMAP_PATH": "test.mmap"}):
+            storage = MmapStorage()
+        self.addCleanup(storage.close)
+        return storage
+
+    def test_all(self):
+        self.assertEqual(dict, type(self.storage.all()))
+
+    def test_objects(self):
+        us = User()
+        objs = self.storage.objects()
+        self.assertIsNot(self.storage.all(), objs)
+        self.assertEqual(self.storage.all(), objs)
+        st = State()
+        self.assertNotIn("State." + st.id, objs)
+        self.assertEqual({"User." + us.id: us}, self.storage.objects(User))
+
+    def test_all_with_cls(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        new = State()
+        self.assertEqual({"State." + st.id: st, "State." + new.id: new},
+                         self.storage.all(State))
+        storage = self.open()
+        self.assertEqual(["State." + st.id], list(storage.all("State")))
+        self.assertNotIn("User." + us.id, storage._MmapStorage__objects)
+
+    def test_children(self):
+        pl = Place()
+        rv1 = Review()
+        rv1.place_id = pl.id
+        rv2 = Review()
+        rv2.place_id = pl.id
+        Review()
+        self.storage.save()
+        rv1.place_id = "other"
+        self.assertEqual([rv2], self.storage.children(pl, Review))
+        storage = self.open()
+        self.assertEqual(sorted([rv1.id, rv2.id]), sorted(
+            rv.id for rv in storage.children(pl, "Review")))
+
+    def test_children_builds_only_children(self):
+        pl = Place()
+        rv1 = Review()
+        rv1.place_id = pl.id
+        for i in range(5):
+            Review()
+        self.storage.save()
+        storage = self.open()
+        self.assertEqual([rv1.id],
+                         [rv.id for rv in storage.children(pl, Review)])
+        self.assertEqual(["Review." + rv1.id],
+                         list(storage._MmapStorage__objects))
+        with patch("models.storage", storage):
+            rv2 = Review()
+            rv2.place_id = pl.id
+            self.assertEqual([rv1.id, rv2.id],
+                             [rv.id for rv in storage.children(pl, Review)])
+            storage.save()
+            storage.get(Review, rv1.id).place_id = "other"
+            storage.save()
+            self.assertEqual([rv2.id],
+                             [rv.id for rv in storage.children(pl, Review)])
+
+    def test_destroy(self):
+        pl = Place()
+        rv = Review()
+        rv.place_id = pl.id
+        us = User()
+        self.storage.save()
+        with patch.object(MmapStorage, "flush",
+                          wraps=self.storage.flush) as flush:
+            self.storage.destroy(pl)
+        self.assertEqual(1, flush.call_count)
+        storage = self.open()
+        self.assertEqual(["User." + us.id], list(storage.all()))
+
+    def test_new(self):
+        bm = BaseModel()
+        us = User()
+        self.assertIn("BaseModel." + bm.id, self.storage.all().keys())
+        self.assertIn(us, self.storage.all().values())
+
+    def test_new_with_None(self):
+        with self.assertRaises(AttributeError):
+            self.storage.new(None)
+
+    def test_new_key_too_long(self):
+        bm = BaseModel()
+        bm.id = "x" * 64
+        with self.assertRaises(ValueError):
+            self.storage.new(bm)
+
+    def test_save_and_reopen(self):
+        bm = BaseModel()
+        st = State()
+        st.name = "California"
+        self.storage.save()
+        objs = self.open().all()
+        self.assertIn("BaseModel." + bm.id, objs)
+        self.assertEqual(st.to_dict(), objs["State." + st.id].to_dict())
+
+    def test_get(self):
+        st = State()
+        self.storage.save()
+        self.assertIs(st, self.storage.get(State, st.id))
+        storage = self.open()
+        self.assertEqual(st.id, storage.get("State", st.id).id)
+        self.assertIs(storage.get("State", st.id),
+                      storage.get("State", st.id))
+        self.assertIsNone(storage.get("User", st.id))
+
+    def test_get_reads_only_its_record(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        storage = self.open()
+        storage.get(State, st.id)
+        self.assertEqual(1, len(storage._MmapStorage__objects))
+
+    def test_count(self):
+        State()
+        State()
+        User()
+        self.assertEqual(3, self.storage.count())
+        self.assertEqual(2, self.storage.count(State))
+        self.storage.save()
+        self.assertEqual(2, self.open().count("State"))
+        self.assertEqual(0, self.storage.count(Place))
+
+    def test_delete(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        self.storage.delete(st)
+        self.assertIsNone(self.storage.get(State, st.id))
+        self.assertEqual(1, self.storage.count())
+        self.storage.save()
+        storage = self.open()
+        self.assertIsNone(storage.get(State, st.id))
+        self.assertIsNotNone(storage.get(User, us.id))
+
+    def test_reload_sees_other_writer(self):
+        reader = self.open()
+        st = State()
+        st.name = "Texas"
+        self.storage.save()
+        self.assertIsNone(reader.get(State, st.id))
+        reader.reload()
+        self.assertEqual("Texas", reader.get(State, st.id).name)
+
+    def test_asave_and_areload(self):
+        reader = self.open()
+        st = State()
+        st.name = "Texas"
+        asyncio.run(self.storage.asave())
+        self.assertIsNone(reader.get(State, st.id))
+        asyncio.run(reader.areload())
+        self.assertEqual("Texas", reader.get(State, st.id).name)
+
+    def test_batch(self):
+        with self.storage.batch():
+            rv = Review()
+            rv.text = "Great"
+            rv.save()
+            self.assertEqual(0, self.open().count())
+        self.assertEqual("Great", self.open().get(Review, rv.id).text)
+
+
+class TestMmapStorage_records(unittest.TestCase):
+    """Unittests for testing the record layout of MmapStorage."""
+
+    def setUp(self):
+        with patch.dict(os.environ, {"HBNB_MMAP_PATH": "test.mmap"}):
+            self.storage = MmapStorage()
+        self.patcher = patch("models.storage", self.storage)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.storage.close()
+        try:
+            os.remove("test.mmap")
+        except IOError:
+            pass
+
+    def reopen(self):
+        """Return a new MmapStorage on the test file."""
+        with patch.dict(os.environ, {"HBNB_MMAP_PATH": "test.mmap"}):
+            storage = MmapStorage()
+        self.addCleanup(storage.close)
+        return storage
+
+    def test_update_in_place(self):
+        st = State()
+        st.name = "California"
+        self.storage.save()
+        end = self.storage._MmapStorage__end
+        st.name = "Texas"
+        self.storage.save()
+        self.assertEqual(end, self.storage._MmapStorage__end)
+        self.assertEqual("Texas", self.reopen().get(State, st.id).name)
+
+    def test_update_grows_record(self):
+        st = State()
+        self.storage.save()
+        st.name = "x" * 1000
+        self.storage.save()
+        self.assertEqual("x" * 1000, self.reopen().get(State, st.id).name)
+
+    def test_only_changed_records_are_encoded(self):
+        st = State()
+        us = User()
+        self.storage.save()
+        st.name = "Texas"
+        with patch.object(User, "to_dict") as to_dict:
+            self.storage.save()
+            to_dict.assert_not_called()
+
+    def test_deleted_slot_is_reused(self):
+        st = State()
+        self.storage.save()
+        i = self.storage._MmapStorage__slots["State." + st.id]
+        self.storage.delete(st)
+        self.storage.save()
+        us = User()
+        self.storage.save()
+        self.assertEqual(i, self.storage._MmapStorage__slots["User." + us.id])
+
+    def test_slot_table_grows(self):
+        with patch.object(MmapStorage, "capacity", 4):
+            with patch.dict(os.environ, {"HBNB_MMAP_PATH": "grow.mmap"}):
+                storage = MmapStorage()
+        self.addCleanup(os.remove, "grow.mmap")
+        self.addCleanup(storage.close)
+        with patch("models.storage", storage):
+            states = [State() for i in range(10)]
+            storage.save()
+        self.assertGreaterEqual(storage._MmapStorage__capacity, 10)
+        with patch.dict(os.environ, {"HBNB_MMAP_PATH": "grow.mmap"}):
+            other = MmapStorage()
+        self.addCleanup(other.close)
+        self.assertEqual(10, other.count(State))
+
+    def test_payload_area_grows(self):
+        with patch.object(MmapStorage, "reserve", 64):
+            with patch.dict(os.environ, {"HBNB_MMAP_PATH": "grow.mmap"}):
+                storage = MmapStorage()
+        self.addCleanup(os.remove, "grow.mmap")
+        self.addCleanup(storage.close)
+        with patch("models.storage", storage):
+            rv = Review()
+            rv.text = "Great place " * 100
+            storage.save()
+        self.assertEqual(rv.text, storage.get(Review, rv.id).text)
+        self.assertGreater(os.path.getsize("grow.mmap"), 1200)
+
+    def test_compact(self):
+        st = State()
+        st.name = "x" * 1000
+        self.storage.save()
+        self.storage.delete(st)
+        us = User()
+        self.storage.save()
+        size = self.storage._MmapStorage__end
+        self.storage.compact()
+        self.assertLess(self.storage._MmapStorage__end, size)
+        self.assertEqual(us.id, self.reopen().get(User, us.id).id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,354 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/query.py.
+
+Unittest classes:
+    TestQuery_parse_condition
+    TestQuery_results
+    TestQuery_planner
+"""
+import asyncio
+import os
+import models
+import unittest
+from unittest.mock import patch
+from models.engine.file_storage import FileStorage
+from models.engine.query import Query
+from models.engine.query import parse_condition
+from models.city import City
+from models.place import Place
+from models.user import User
+
+
+class TestQuery_parse_condition(unittest.TestCase):
+    """Unittests for testing the parsing of query conditions."""
+
+    def test_equality(self):
+        self.assertEqual(("name", "eq", "a"), parse_condition("name", "a"))
+        self.assertEqual(("city_id", "eq", "1"),
+                         parse_condition("city_id", "1"))
+
+    def test_operators(self):
+        self.assertEqual(("price_by_night", "lt", 10),
+                         parse_condition("price_by_night__lt", 10))
+        self.assertEqual(("name", "in", ["a"]),
+                         parse_condition("name__in", ["a"]))
+
+    def test_unknown_operator(self):
+        with self.assertRaises(ValueError):
+            parse_condition("name__like", "a")
+
+
+class TestQuery_results(unittest.TestCase):
+    """Unittests for testing the results of queries."""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        self.places = []
+        for i, (name, price) in enumerate([("b", 30), ("a", 10),
+                                           ("c", 20), ("a", 40)]):
+            pl = Place()
+            pl.name = name
+            pl.price_by_night = price
+            pl.city_id = str(i % 2)
+            self.places.append(pl)
+
+    @classmethod
+    def tearDown(self):
+        models.storage.lazy = False
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_query(self):
+        query = models.storage.query(Place)
+        self.assertEqual(Query, type(query))
+        self.assertEqual(self.places, list(query))
+        self.assertEqual([], list(models.storage.query("MyModel")))
+
+    def test_where(self):
+        pl = self.places
+        query = models.storage.query(Place)
+        self.assertEqual([pl[1], pl[3]], list(query.where(name="a")))
+        self.assertEqual([pl[0], pl[3]],
+                         list(query.where(price_by_night__gt=20)))
+        self.assertEqual([pl[2], pl[0]],
+                         list(query.where(price_by_night__ge=20,
+                                          price_by_night__le=30)))
+        self.assertEqual([pl[1], pl[2]],
+                         list(query.where(name__in=["a", "c"],
+                                          price_by_night__lt=40)))
+        self.assertEqual([pl[0], pl[2]], list(query.where(name__ne="a")))
+
+    def test_where_chained(self):
+        query = models.storage.query(Place).where(name="a")
+        self.assertEqual([self.places[3]],
+                         list(query.where(price_by_night=40)))
+        self.assertEqual(2, len(list(query)))
+
+    def test_where_predicate(self):
+        query = models.storage.query(Place)
+        self.assertEqual([self.places[2]], list(query.where(
+            lambda pl: pl.price_by_night % 20 == 0, name="c")))
+
+    def test_where_contains(self):
+        self.places[0].amenity_ids = ["1", "2"]
+        query = models.storage.query(Place).where(amenity_ids__contains="2")
+        self.assertEqual([self.places[0]], list(query))
+        query = models.storage.query(Place).where(amenity_ids__all=["2", "1"])
+        self.assertEqual([self.places[0]], list(query))
+
+    def test_where_mismatched_types(self):
+        query = models.storage.query(Place).where(name__lt=3)
+        self.assertEqual([], list(query))
+
+    def test_order_by(self):
+        pl = self.places
+        query = models.storage.query(Place)
+        self.assertEqual([pl[1], pl[2], pl[0], pl[3]],
+                         list(query.order_by("price_by_night")))
+        self.assertEqual([pl[3], pl[0], pl[2], pl[1]],
+                         list(query.order_by("-price_by_night")))
+        self.assertEqual([pl[3], pl[1], pl[0], pl[2]],
+                         list(query.order_by("name", "-price_by_night")))
+
+    def test_order_by_mismatched_types(self):
+        pl = self.places
+        pl[2].name = 3
+        query = models.storage.query(Place).order_by("name")
+        self.assertEqual([pl[1], pl[3], pl[0], pl[2]], list(query))
+        query = models.storage.query(Place).order_by("-name")
+        self.assertEqual([pl[0], pl[1], pl[3], pl[2]], list(query))
+        pl[0].rank = 1
+        pl[1].rank = 2
+        query = models.storage.query(Place).order_by("-rank")
+        self.assertEqual([pl[1], pl[0], pl[2], pl[3]], list(query))
+
+    def test_order_by_keeps_every_record(self):
+        pl = self.places
+        pl[1].name = None
+        pl[2].price_by_night = "12"
+        query = models.storage.query(Place)
+        self.assertEqual(4, len(list(query)))
+        self.assertEqual(pl[1], list(query.order_by("name"))[-1])
+        self.assertEqual(pl[2], list(query.order_by("price_by_night"))[-1])
+        self.assertEqual(pl[2], list(query.order_by("-price_by_night"))[-1])
+
+    def test_where_in_not_iterable(self):
+        models.storage.create_index(Place, "price_by_night")
+        query = models.storage.query(Place).where(price_by_night__in=5)
+        self.assertEqual([], list(query))
+        query = models.storage.query(Place).where(name__in=5)
+        self.assertEqual([], list(query))
+
+    def test_limit(self):
+        query = models.storage.query(Place).order_by("price_by_night")
+        self.assertEqual([self.places[1], self.places[2]],
+                         list(query.limit(2)))
+        self.assertEqual([], list(query.limit(0)))
+
+    def test_first(self):
+        query = models.storage.query(Place).order_by("-price_by_night")
+        self.assertIs(self.places[3], query.first())
+        self.assertIsNone(query.where(name="z").first())
+
+    def test_async_iteration(self):
+        async def collect(query):
+            return [obj async for obj in query]
+        query = models.storage.query(Place)
+        self.assertEqual(self.places, asyncio.run(collect(query)))
+        query = query.where(name="a").order_by("-price_by_night")
+        self.assertEqual([self.places[3], self.places[1]],
+                         asyncio.run(collect(query)))
+        with patch("models.engine.query.chunk_size", 3):
+            self.assertEqual(self.places,
+                             asyncio.run(collect(models.storage.query(Place))))
+            self.assertEqual(self.places[:3], asyncio.run(
+                collect(models.storage.query(Place).limit(3))))
+
+    def test_lazy_iterator(self):
+        results = iter(models.storage.query(Place))
+        self.assertIs(self.places[0], next(results))
+        models.storage.delete(self.places[1])
+        self.assertEqual(self.places[2:], list(results))
+
+    def test_builds_matches_only(self):
+        models.storage.save()
+        models.storage.lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        query = models.storage.query(Place).where(name="c")
+        self.assertEqual([self.places[2].id], [pl.id for pl in query])
+        self.assertEqual(["Place." + self.places[2].id],
+                         list(FileStorage._FileStorage__objects.keys()))
+
+    def test_order_by_date_across_built_and_raw(self):
+        models.storage.save()
+        models.storage.lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        models.storage.get(Place, self.places[2].id)
+        query = models.storage.query(Place).order_by("created_at")
+        self.assertEqual([pl.id for pl in self.places],
+                         [pl.id for pl in query])
+
+
+class TestQuery_planner(unittest.TestCase):
+    """Unittests for testing the use of indexes by queries."""
+
+    @classmethod
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+
+    @classmethod
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_candidates_scan(self):
+        cities = [City() for i in range(3)]
+        keys = [key for key, record in
+                models.storage.candidates("City", [("name", "eq", "a")])]
+        self.assertEqual(["City." + cy.id for cy in cities], keys)
+
+    def test_candidates_index(self):
+        cities = [City() for i in range(3)]
+        cities[1].state_id = "1234"
+        keys = [key for key, record in models.storage.candidates(
+            "City", [("name", "eq", "a"), ("state_id", "eq", "1234")])]
+        self.assertEqual(["City." + cities[1].id], keys)
+
+    def test_candidates_index_in(self):
+        cities = [City() for i in range(4)]
+        cities[1].state_id = "1"
+        cities[3].state_id = "2"
+        keys = [key for key, record in models.storage.candidates(
+            "City", [("state_id", "in", ["1", "2"])])]
+        self.assertEqual(["City." + cities[1].id, "City." + cities[3].id],
+                         keys)
+
+    def test_candidates_range_scans(self):
+        cities = [City() for i in range(2)]
+        keys = [key for key, record in models.storage.candidates(
+            "City", [("state_id", "gt", "1")])]
+        self.assertEqual(2, len(keys))
+
+    def test_candidates_sorted_index(self):
+        places = [Place() for i in range(10)]
+        for i, pl in enumerate(places):
+            pl.price_by_night = i * 10
+            pl.max_guest = i % 4
+        keys = [key for key, record in models.storage.candidates(
+            "Place", [("price_by_night", "ge", 20),
+                      ("price_by_night", "lt", 50),
+                      ("price_by_night", "gt", 20)])]
+        self.assertEqual(["Place." + pl.id for pl in places[3:5]], keys)
+
+    def test_candidates_sorted_index_mismatched_type(self):
+        places = [Place() for i in range(3)]
+        keys = [key for key, record in models.storage.candidates(
+            "Place", [("price_by_night", "ge", "cheap")])]
+        self.assertEqual(3, len(keys))
+
+    def test_price_band_with_guests(self):
+        places = [Place() for i in range(10)]
+        for i, pl in enumerate(places):
+            pl.price_by_night = i * 10
+            pl.max_guest = i % 4
+        query = models.storage.query(Place).where(
+            price_by_night__ge=20, price_by_night__le=70, max_guest__ge=3)
+        self.assertEqual([places[3], places[7]], list(query))
+        places[3].price_by_night = 100
+        self.assertEqual([places[7]], list(query))
+
+    def test_create_sorted_index(self):
+        cities = [City() for i in range(3)]
+        for i, cy in enumerate(cities):
+            cy.name = "abc"[i]
+        models.storage.create_index(City, "name", "sorted")
+        self.addCleanup(models.storage._FileStorage__indexes.pop, "City")
+        keys = [key for key, record in models.storage.candidates(
+            "City", [("name", "gt", "a")])]
+        self.assertEqual(["City." + cy.id for cy in cities[1:]], keys)
+        models.storage.create_index(City, "name")
+        self.assertEqual(2, len(models.storage.candidates(
+            "City", [("name", "gt", "a")])))
+
+    def test_amenities(self):
+        places = [Place() for i in range(6)]
+        for i, pl in enumerate(places):
+            pl.amenity_ids = ["wifi"] + (["pool"] if i % 2 else []) + \
+                (["gym"] if i % 3 == 0 else [])
+        query = models.storage.query(Place)
+        self.assertEqual([places[3]], list(query.where(
+            amenity_ids__all=["wifi", "pool", "gym"])))
+        self.assertEqual([places[3]], list(query.where(
+            amenity_ids__contains="pool").where(amenity_ids__contains="gym")))
+        self.assertEqual(places, list(query.where(amenity_ids__all=[])))
+        places[3].amenity_ids = ["wifi"]
+        self.assertEqual([], list(query.where(
+            amenity_ids__all=["pool", "gym"])))
+
+    def test_amenities_appended(self):
+        pl = Place()
+        pl.amenity_ids = ["wifi"]
+        query = models.storage.query(Place)
+        self.assertEqual([pl], list(query.where(amenity_ids__contains="wifi")))
+        pl.amenity_ids.append("pool")
+        self.assertEqual([pl], list(query.where(amenity_ids__contains="pool")))
+        models.storage.save()
+        self.addCleanup(os.remove, "file.json.lock")
+        self.addCleanup(os.remove, "file.json")
+        self.assertEqual([pl], list(query.where(amenity_ids__contains="pool")))
+        pl = models.storage.get(Place, pl.id)
+        pl.amenity_ids.remove("wifi")
+        self.assertEqual([], list(query.where(amenity_ids__contains="wifi")))
+
+    def test_candidates_set_index(self):
+        places = [Place() for i in range(10)]
+        for i, pl in enumerate(places):
+            pl.amenity_ids = ["wifi", "pool"] if i < 8 else ["gym"]
+        places[2].amenity_ids = ["wifi", "gym"]
+        with patch("models.engine.query.value_of",
+                   wraps=models.engine.query.value_of) as value_of:
+            query = models.storage.query(Place).where(
+                amenity_ids__all=["gym", "wifi"])
+            self.assertEqual([places[2]], list(query))
+        self.assertEqual(1, value_of.call_count)
+        keys = [key for key, record in models.storage.candidates(
+            "Place", [("amenity_ids", "contains", "gym"),
+                      ("amenity_ids", "contains", "wifi")])]
+        self.assertEqual(["Place." + places[2].id], keys)
+        self.assertEqual(10, len(models.storage.candidates(
+            "Place", [("amenity_ids", "contains", ["gym"])])))
+
+    def test_create_index_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            models.storage.create_index(City, "name", "btree")
+
+    def test_query_uses_index(self):
+        users = [User() for i in range(10)]
+        users[4].email = "betty@holberton.io"
+        with patch("models.engine.query.value_of",
+                   wraps=models.engine.query.value_of) as value_of:
+            query = models.storage.query(User).where(
+                email="betty@holberton.io")
+            self.assertEqual([users[4]], list(query))
+        self.assertEqual(1, value_of.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
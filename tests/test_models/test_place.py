@@ -5,13 +5,16 @@ Unittest classes:
     TestPlace_instantiation
     TestPlace_save
     TestPlace_to_dict
+    TestPlace_relationships
 """
 import os
 import models
 import unittest
 from datetime import datetime
 from time import sleep
+from models.engine.file_storage import FileStorage
 from models.place import Place
+from models.review import Review
 
 
 class TestPlace_instantiation(unittest.TestCase):
@@ -159,6 +162,10 @@ class TestPlace_save(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -245,5 +252,29 @@ class TestPlace_to_dict(unittest.TestCase):
             pl.to_dict(None)
 
 
+class TestPlace_relationships(unittest.TestCase):
+    """Unittests for testing the relationships of the Place class."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_reviews(self):
+        pl = Place()
+        other = Place()
+        rv1 = Review()
+        rv1.place_id = pl.id
+        rv2 = Review()
+        rv2.place_id = pl.id
+        Review().place_id = other.id
+        self.assertEqual([rv1, rv2], pl.reviews)
+        rv2.place_id = other.id
+        self.assertEqual([rv1], pl.reviews)
+        models.storage.delete(rv1)
+        self.assertEqual([], pl.reviews)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -5,13 +5,16 @@ Unittest classes:
     TestState_instantiation
     TestState_save
     TestState_to_dict
+    TestState_relationships
 """
 import os
 import models
 import unittest
 from datetime import datetime
 from time import sleep
+from models.engine.file_storage import FileStorage
 from models.state import State
+from models.city import City
 
 
 class TestState_instantiation(unittest.TestCase):
@@ -99,6 +102,10 @@ class TestState_save(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -185,5 +192,29 @@ class TestState_to_dict(unittest.TestCase):
             st.to_dict(None)
 
 
+class TestState_relationships(unittest.TestCase):
+    """Unittests for testing the relationships of the State class."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_cities(self):
+        st = State()
+        other = State()
+        ci1 = City()
+        ci1.state_id = st.id
+        ci2 = City()
+        ci2.state_id = st.id
+        City().state_id = other.id
+        self.assertEqual([ci1, ci2], st.cities)
+        ci2.state_id = other.id
+        self.assertEqual([ci1], st.cities)
+        models.storage.delete(ci1)
+        self.assertEqual([], st.cities)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -5,13 +5,17 @@ Unittest classes:
     TestUser_instantiation
     TestUser_save
     TestUser_to_dict
+    TestUser_relationships
 """
 import os
 import models
 import unittest
 from datetime import datetime
 from time import sleep
+from models.engine.file_storage import FileStorage
 from models.user import User
+from models.place import Place
+from models.review import Review
 
 
 class TestUser_instantiation(unittest.TestCase):
@@ -105,6 +109,10 @@ class TestUser_save(unittest.TestCase):
             os.remove("file.json")
         except IOError:
             pass
+        try:
+            os.remove("file.json.lock")
+        except IOError:
+            pass
         try:
             os.rename("tmp", "file.json")
         except IOError:
@@ -191,5 +199,43 @@ class TestUser_to_dict(unittest.TestCase):
             us.to_dict(None)
 
 
+class TestUser_relationships(unittest.TestCase):
+    """Unittests for testing the relationships of the User class."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_places(self):
+        us = User()
+        other = User()
+        pl1 = Place()
+        pl1.user_id = us.id
+        pl2 = Place()
+        pl2.user_id = us.id
+        Place().user_id = other.id
+        self.assertEqual([pl1, pl2], us.places)
+        pl2.user_id = other.id
+        self.assertEqual([pl1], us.places)
+        models.storage.delete(pl1)
+        self.assertEqual([], us.places)
+
+    def test_reviews(self):
+        us = User()
+        other = User()
+        rv1 = Review()
+        rv1.user_id = us.id
+        rv2 = Review()
+        rv2.user_id = us.id
+        Review().user_id = other.id
+        self.assertEqual([rv1, rv2], us.reviews)
+        rv2.user_id = other.id
+        self.assertEqual([rv1], us.reviews)
+        models.storage.delete(rv1)
+        self.assertEqual([], us.reviews)
+
+
 if __name__ == "__main__":
     unittest.main()